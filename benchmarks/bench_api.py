@@ -0,0 +1,24 @@
+"""
+API 请求与解析
+"""
+
+
+def test_unsplash_fetch_random(benchmark, apis):
+    images = benchmark(apis['unsplash'].fetch_random, query='nature', count=30)
+    assert len(images) == 30
+
+
+def test_unsplash_search(benchmark, apis):
+    images = benchmark(apis['unsplash'].search, 'mountain', count=30)
+    assert len(images) == 30
+
+
+def test_wallhaven_fetch_random(benchmark, apis):
+    images = benchmark(apis['wallhaven'].fetch_random, count=24)
+    assert len(images) == 24
+
+
+def test_unsplash_fetch_random_with_latency(benchmark, server, apis):
+    server.config.latency = 0.05
+    images = benchmark.pedantic(apis['unsplash'].fetch_random, kwargs={'count': 1}, rounds=10)
+    assert images
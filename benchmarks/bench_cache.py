@@ -0,0 +1,149 @@
+"""
+缓存索引与清理
+"""
+
+from pathlib import Path
+
+import pytest
+
+from core.cache_index import CacheIndex
+from core.wallpaper_downloader import WallpaperDownloader
+
+
+def _fill(cache_dir, n):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(n):
+        (cache_dir / f"{i:08x}.jpg").write_bytes(b'x' * 1024)
+
+
+@pytest.mark.parametrize('n', [1_000, 10_000])
+def test_index_build(benchmark, tmp_path, n):
+    _fill(tmp_path / 'cache', n)
+
+    def run():
+        index = CacheIndex(tmp_path / 'cache')
+        return len(index)
+
+    assert benchmark(run) == n
+
+
+def test_index_lookup_and_touch(benchmark, tmp_path):
+    _fill(tmp_path / 'cache', 10_000)
+    index = CacheIndex(tmp_path / 'cache')
+    len(index)
+
+    def run():
+        for i in range(0, 10_000, 10):
+            name = f"{i:08x}.jpg"
+            index.get(name)
+            index.touch(name)
+
+    benchmark(run)
+
+
+def test_index_listing(benchmark, tmp_path):
+    _fill(tmp_path / 'cache', 10_000)
+    index = CacheIndex(tmp_path / 'cache')
+    len(index)
+
+    assert len(benchmark(index.entries)) == 10_000
+
+
+def test_eviction(benchmark, tmp_path):
+    rounds = iter(range(1_000))
+
+    def setup():
+        # 每轮使用新目录（索引会持久化，复用目录时不会重新扫描）
+        cache_dir = tmp_path / f"cache{next(rounds)}"
+        _fill(cache_dir, 1_000)
+        downloader = WallpaperDownloader(cache_dir=str(cache_dir), max_images=500)
+        return (downloader,), {}
+
+    def run(downloader):
+        downloader._cleanup_cache()
+        return len(downloader.index)
+
+    assert benchmark.pedantic(run, setup=setup, rounds=10) == 800
+
+
+def test_full_history_within_budget(benchmark, server, tmp_path):
+    """历史写满后缓存仍保持在数量和大小上限内（只固定游标附近的历史）"""
+    from core.history import WallpaperHistory
+
+    downloader = WallpaperDownloader(cache_dir=str(tmp_path / 'cache'), max_size_mb=4,
+                                     max_images=10)
+    history = WallpaperHistory(str(tmp_path / 'history.jsonl'), capacity=30,
+                               downloader=downloader)
+    ids = iter(range(1_000))
+
+    def run():
+        for _ in range(40):
+            path = downloader.download(f"{server.url}/images/hist{next(ids)}.jpg", {})
+            assert path is not None
+            history.push(path)
+
+    benchmark.pedantic(run, rounds=1)
+    assert len(history) == 30
+    assert len(downloader.index) <= downloader.max_images
+    assert downloader.index.total_size() <= downloader.max_size_mb * 1024 * 1024
+    assert downloader.index.get(Path(history.current()).name) is not None
+
+
+def test_metadata_listing(benchmark, tmp_path):
+    """10k 张图片的元数据列表只需读取一个文件"""
+    from core.metadata_store import MetadataStore
+
+    cache_dir = tmp_path / 'cache'
+    store = MetadataStore(cache_dir)
+    with store.batch():
+        for i in range(10_000):
+            store.put(f"{i:08x}.jpg", {'id': str(i), 'description': f"photo {i}"})
+
+    def run():
+        return MetadataStore(cache_dir).all()
+
+    assert len(benchmark(run)) == 10_000
+
+
+def test_search(benchmark, tmp_path):
+    """10k 条元数据的本地全文检索"""
+    from core.search_index import SearchIndex
+
+    index = SearchIndex(tmp_path / 'search.db')
+    words = ['mountain', 'forest', 'ocean', 'city', 'desert', 'lake', 'snow', 'sunset']
+    index.add_many((f"{i:08x}.jpg", {
+        'description': f"{words[i % 8]} {words[(i * 3) % 8]} photo {i}",
+        'author': f"Author {i % 100}",
+        'source': 'unsplash' if i % 2 else 'wallhaven',
+        'category': words[i % 8],
+        'tags': [words[(i * 5) % 8]],
+    }) for i in range(10_000))
+
+    assert benchmark(index.search, 'mountain author 7', 50)
+
+
+def test_cold_tier_round_trip(benchmark, tmp_path):
+    """长期未使用的图片压缩移入冷缓存，再按需还原"""
+    pytest.importorskip('PIL')
+    from PIL import Image
+
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    for i in range(8):
+        Image.effect_noise((1920, 1080), 64).convert('RGB').save(cache_dir / f"{i:08x}.jpg",
+                                                                 quality=95)
+    downloader = WallpaperDownloader(cache_dir=str(cache_dir), cold_after_days=1)
+    for entry in downloader.index.entries():
+        entry.atime -= 2 * 86400
+    hot_bytes = downloader.index.total_size()
+
+    assert downloader.demote_cold() == 8
+    assert len(downloader.index) == 0
+    assert downloader.cold.total_size() < hot_bytes
+
+    # --benchmark-disable 时只运行一轮，按实际还原的数量检查
+    names = iter(f"{i:08x}.jpg" for i in range(8))
+    restored = []
+    benchmark.pedantic(lambda: restored.append(downloader.restore(next(names))), rounds=8)
+    assert restored and all(path is not None and path.exists() for path in restored)
+    assert len(downloader.cold) == 8 - len(restored)
@@ -0,0 +1,93 @@
+"""
+端到端更换延迟（获取 → 下载 → 设置）
+"""
+
+import pytest
+
+
+def test_change_end_to_end(benchmark, changer):
+    path, image = benchmark.pedantic(changer.change, rounds=20)
+    assert path.exists()
+    assert changer.setter.backend.calls
+
+
+def test_reapply_same_wallpaper(benchmark, changer):
+    """重复设置同一张壁纸应被跳过，不调用后端"""
+    path, _ = changer.change()
+    backend = changer.setter.backend
+    calls = len(backend.calls)
+    benchmark(changer.setter.set_wallpaper, str(path), changer.get_style())
+    assert len(backend.calls) == calls
+
+
+@pytest.mark.parametrize('latency', [0.02, 0.1])
+def test_change_with_api_latency(benchmark, server, changer, latency):
+    server.config.latency = latency
+    path, _ = benchmark.pedantic(changer.change, rounds=5)
+    assert path.exists()
+
+
+def test_prefetch(benchmark, changer):
+    downloaded = benchmark.pedantic(changer.prefetch, kwargs={'count': 8}, rounds=5)
+    assert downloaded == 8
+
+
+def test_change_with_dead_source(benchmark, changer):
+    """一个源不可达时熔断，之后的更换不再等待它"""
+    changer.apis['wallhaven'].base_url = 'http://127.0.0.1:9'
+    path, _ = benchmark.pedantic(changer.change, rounds=10)
+    assert path.exists()
+    # 熔断后不再请求不可达的源
+    stats = {item['source']: item for item in changer.selector.report()}
+    assert stats.get('wallhaven', {}).get('samples', 0) <= changer.selector.failure_threshold
+
+
+@pytest.mark.parametrize('hedging', [False, True])
+def test_change_with_tail_latency(benchmark, server, changer, hedging):
+    """API 请求偶发 1 秒长尾时，对冲请求限制前台更换的尾延迟"""
+    changer.config.config['hedging'] = {'enabled': hedging, 'percentile': 95, 'budget': 0.5}
+    for _ in range(20):
+        changer.selector.record('unsplash', 0.01, True)
+        changer.selector.record('wallhaven', 0.01, True)
+    server.config.tail_latency = 1.0
+    server.config.tail_rate = 0.2
+    server.config.random.seed(1)
+    path, _ = benchmark.pedantic(changer.change, rounds=20)
+    assert path.exists()
+
+
+def test_change_from_cache(benchmark, server, changer):
+    """离线轮换：缓存能满足时不产生任何网络请求"""
+    changer.prefetch(count=8)
+    changer.config.config['rotation'] = {'mode': 'offline'}
+    server.reset_stats()
+    path, _ = benchmark.pedantic(changer.change, rounds=8)
+    assert path.exists()
+    assert server.requests == {}
+
+
+def test_offline_first_rounds(benchmark, server, changer):
+    """offline_first：每轮先把缓存轮换一遍再获取一张新壁纸，之后开始新一轮；离线时只轮换缓存"""
+    changer.prefetch(count=4)
+    cached = {path.name for path in changer.downloader.get_cached_wallpapers()}
+    changer.config.config['rotation'] = {'mode': 'offline_first'}
+
+    def run():
+        fetched = set()
+        for _ in range(2):
+            server.reset_stats()
+            assert {changer.change()[0].name for _ in range(len(cached))} == cached
+            assert server.requests == {}
+            path, _ = changer.change()
+            assert path.name not in cached | fetched
+            fetched.add(path.name)
+
+        # 离线时持续从缓存轮换
+        for api in changer.apis.values():
+            api.base_url = 'http://127.0.0.1:9'
+        changer.connectivity.invalidate()
+        available = cached | fetched
+        shown = [changer.change()[0].name for _ in range(2 * len(available))]
+        assert set(shown) == available
+
+    benchmark.pedantic(run, rounds=1)
@@ -0,0 +1,108 @@
+"""
+下载吞吐量
+"""
+
+import itertools
+import time
+
+import pytest
+
+_ids = itertools.count()
+
+
+def _images(server, n, size):
+    return [{'url': f"{server.url}/images/bench{next(_ids)}.jpg?size={size}", 'id': str(i)}
+            for i in range(n)]
+
+
+@pytest.mark.parametrize('size', [256 * 1024, 4 * 1024 * 1024])
+def test_download_single(benchmark, server, downloader, size):
+    def run():
+        return downloader.download(_images(server, 1, size)[0]['url'])
+
+    assert benchmark(run)
+
+
+@pytest.mark.parametrize('bandwidth', [None, 8 * 1024 * 1024])
+def test_download_many(benchmark, server, downloader, bandwidth):
+    server.config.bandwidth = bandwidth
+
+    def run():
+        return downloader.download_many(_images(server, 8, 1024 * 1024))
+
+    results = benchmark.pedantic(run, rounds=5)
+    assert all(results)
+
+
+def test_download_cache_hit(benchmark, server, downloader):
+    url = _images(server, 1, 256 * 1024)[0]['url']
+    downloader.download(url)
+    server.reset_stats()
+
+    assert benchmark(downloader.download, url)
+    assert not server.requests
+
+
+def test_background_rate_limit(benchmark, server, downloader):
+    """后台下载总速率不超过令牌桶上限"""
+    from core.download_scheduler import DownloadScheduler
+    rate = 16 * 1024 * 1024
+    scheduler = DownloadScheduler(downloader, background_rate=rate)
+
+    durations = []
+
+    def run():
+        start = time.perf_counter()
+        results = scheduler.download_many(_images(server, 8, 4 * 1024 * 1024))
+        durations.append(time.perf_counter() - start)
+        return results
+
+    results = benchmark.pedantic(run, rounds=2)
+    assert all(results)
+    # 32 MB，首秒可以突发 16 MB，其余受限（自行计时：--benchmark-disable 时没有统计数据）
+    assert min(durations) >= (32 - 16) / 16 * 0.9
+
+
+def test_foreground_during_background(benchmark, server, downloader):
+    """后台预下载进行中时的前台下载延迟（后台在前台期间暂停）"""
+    import threading
+    from core.download_scheduler import DownloadScheduler
+    scheduler = DownloadScheduler(downloader, background_rate=32 * 1024 * 1024)
+    server.config.bandwidth = 16 * 1024 * 1024
+    background = threading.Thread(
+        target=scheduler.download_many, args=(_images(server, 16, 4 * 1024 * 1024),))
+    background.start()
+    try:
+        def run():
+            return scheduler.download(_images(server, 1, 1024 * 1024)[0]['url'])
+
+        assert benchmark.pedantic(run, rounds=10)
+    finally:
+        background.join()
+
+
+def test_download_refused_oversize(benchmark, server, downloader):
+    """Content-Length 超过单图上限时在读取正文前放弃，不写入缓存"""
+    downloader.max_image_mb = 1
+    server.config.bandwidth = 8 * 1024 * 1024
+
+    durations = []
+
+    def run():
+        start = time.perf_counter()
+        path = downloader.download(_images(server, 1, 16 * 1024 * 1024)[0]['url'])
+        durations.append(time.perf_counter() - start)
+        return path
+
+    assert benchmark.pedantic(run, rounds=5) is None
+    assert len(downloader.index) == 0
+    # 限速下传完 16 MB 需要 2 秒，放弃后最多多发出几个数据块
+    assert max(durations) < 0.5
+
+
+def test_download_evicts_before_streaming(server, downloader):
+    """预留空间时先淘汰旧文件，缓存始终不超过限制"""
+    downloader.set_limits(max_size_mb=4, max_images=100)
+    for image in _images(server, 12, 1024 * 1024):
+        assert downloader.download(image['url'])
+        assert downloader.index.total_size() <= 4 * 1024 * 1024
@@ -0,0 +1,26 @@
+"""
+虚拟时钟模拟基准
+"""
+
+import pytest
+
+from simulate import run_simulation
+
+
+@pytest.mark.parametrize('rotation', ['online', 'offline_first'])
+def test_simulated_week(benchmark, tmp_path, rotation):
+    """一周的每小时更换（每 6 小时预下载 3 张）"""
+    report = benchmark.pedantic(
+        run_simulation, args=(tmp_path,),
+        kwargs=dict(days=7, prefetch_every=6, prefetch_depth=3, rotation=rotation,
+                    max_images=20, catalogue=500, image_size=16 * 1024),
+        rounds=1)
+    benchmark.extra_info.update(hit_ratio=report.hit_ratio, evictions=report.evictions,
+                                api_calls=sum(report.api_calls.values()),
+                                worst_latency=report.worst_latency)
+    # schedule 从任务结束时计算下次运行时间，更换耗时会让间隔略长于一小时
+    assert 7 * 24 - 3 <= report.changes <= 7 * 24
+    assert report.failures == 0
+    if rotation == 'offline_first':
+        # 预下载的图片先被轮换完，部分更换不需要下载
+        assert report.hit_ratio > 0.2
@@ -0,0 +1,68 @@
+"""
+基准测试公共夹具
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fake_server import FakeWallpaperServer
+from models.config import Config
+from core.wallpaper_api import UnsplashAPI, WallhavenAPI
+from core.wallpaper_downloader import WallpaperDownloader
+from core.changer import WallpaperChanger
+from core.setter_backends import RecordingBackend
+from core.wallpaper_setter import WallpaperSetter
+
+
+@pytest.fixture(scope='session')
+def fake_server():
+    with FakeWallpaperServer(image_size=512 * 1024) as server:
+        yield server
+
+
+@pytest.fixture
+def server(fake_server):
+    """每个用例开始时恢复默认行为"""
+    fake_server.config.latency = 0.0
+    fake_server.config.bandwidth = None
+    fake_server.config.failure_rate = 0.0
+    fake_server.config.image_size = 512 * 1024
+    fake_server.config.tail_latency = 0.0
+    fake_server.config.tail_rate = 0.0
+    fake_server.reset_stats()
+    return fake_server
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config(str(tmp_path / 'config.json'))
+    config.config['api_keys'] = {'unsplash': 'fake-key', 'wallhaven': 'fake-key'}
+    return config
+
+
+@pytest.fixture
+def apis(server):
+    unsplash = UnsplashAPI('fake-key')
+    unsplash.base_url = server.url
+    wallhaven = WallhavenAPI('fake-key')
+    wallhaven.base_url = server.url
+    return {'unsplash': unsplash, 'wallhaven': wallhaven}
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    return WallpaperDownloader(cache_dir=str(tmp_path / 'cache'), max_size_mb=10_000,
+                               max_images=100_000)
+
+
+@pytest.fixture
+def changer(config, downloader, apis):
+    changer = WallpaperChanger(config, downloader, apis, WallpaperSetter(RecordingBackend()))
+    yield changer
+    # 等待落后的对冲请求结束，避免它们访问已关闭的伪服务器
+    changer.close(wait=True)
@@ -0,0 +1,267 @@
+"""
+本地伪造的 Unsplash / Wallhaven 服务器
+模拟 /photos/random、/search/photos 和 Wallhaven /search 接口，并提供图片下载
+
+可注入延迟、带宽限制和失败率，用于基准测试和模拟。
+"""
+
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+
+def make_image_payload(size: int) -> bytes:
+    """
+    生成指定大小的图片数据
+
+    有 Pillow 时生成真实 JPEG 并在 EOI 之后填充到目标大小（解码器会忽略尾部数据），
+    否则返回 JPEG 文件头加填充。
+    """
+    try:
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 36), (90, 120, 160)).save(buffer, 'JPEG')
+        data = buffer.getvalue()
+    except ImportError:
+        data = b'\xff\xd8\xff\xe0' + b'\x00' * 16 + b'\xff\xd9'
+    return data + b'\x00' * max(0, size - len(data))
+
+
+class FakeServerConfig:
+    """伪服务器行为参数（可在运行中修改）"""
+
+    def __init__(self, latency: float = 0.0, bandwidth: Optional[int] = None,
+                 failure_rate: float = 0.0, image_size: int = 512 * 1024,
+                 tail_latency: float = 0.0, tail_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            latency: 每个请求的附加延迟（秒）
+            bandwidth: 图片传输带宽上限（字节/秒），None 表示不限
+            failure_rate: 返回 503 的概率
+            image_size: 图片大小（字节），可被 ?size= 覆盖
+            tail_latency: 长尾请求的额外延迟（秒）
+            tail_rate: API 请求出现长尾延迟的概率
+            seed: 随机种子
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        self.image_size = image_size
+        self.tail_latency = tail_latency
+        self.tail_rate = tail_rate
+        self.random = random.Random(seed)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """请求处理"""
+
+    protocol_version = 'HTTP/1.1'
+    # 头和正文分开写，关闭 Nagle 避免与延迟 ACK 叠加出 40ms 的假延迟
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self) -> 'FakeWallpaperServer':
+        return self.server.fake
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body: bool):
+        fake = self.fake
+        config = fake.config
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        fake.record(parsed.path)
+
+        if config.latency:
+            time.sleep(config.latency)
+        if (config.tail_rate and not parsed.path.startswith('/images/')
+                and config.random.random() < config.tail_rate):
+            time.sleep(config.tail_latency)
+
+        if config.failure_rate and config.random.random() < config.failure_rate:
+            self._send_json({'errors': ['injected failure']}, status=503, send_body=send_body)
+            return
+
+        if parsed.path == '/photos/random':
+            count = int(params.get('count', 1))
+            self._send_json([fake.unsplash_photo() for _ in range(count)], send_body=send_body)
+        elif parsed.path == '/search/photos':
+            count = int(params.get('per_page', 10))
+            results = [fake.unsplash_photo(query=params.get('query')) for _ in range(count)]
+            self._send_json({'total': count, 'total_pages': 1, 'results': results},
+                            send_body=send_body)
+        elif parsed.path == '/search':
+            data = [fake.wallhaven_wallpaper() for _ in range(24)]
+            self._send_json({'data': data, 'meta': {'current_page': 1, 'last_page': 1}},
+                            send_body=send_body)
+        elif parsed.path.startswith('/images/'):
+            size = int(params.get('size', config.image_size))
+            self._send_image(size, send_body)
+        else:
+            self._send_json({'errors': ['not found']}, status=404, send_body=send_body)
+
+    def _send_json(self, payload, status: int = 200, send_body: bool = True):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Ratelimit-Remaining', '49')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+            self.fake.add_bytes(len(body))
+
+    def _send_image(self, size: int, send_body: bool):
+        body = self.fake.payload(size)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not send_body:
+            return
+
+        bandwidth = self.fake.config.bandwidth
+        chunk = 64 * 1024
+        for offset in range(0, len(body), chunk):
+            piece = body[offset:offset + chunk]
+            self.wfile.write(piece)
+            self.fake.add_bytes(len(piece))
+            if bandwidth:
+                time.sleep(len(piece) / bandwidth)
+
+
+class FakeWallpaperServer:
+    """
+    伪造的壁纸 API 服务器
+
+    用法:
+        with FakeWallpaperServer(latency=0.05) as server:
+            api = UnsplashAPI('key')
+            api.base_url = server.url
+    """
+
+    def __init__(self, **kwargs):
+        self.config = FakeServerConfig(**kwargs)
+        self.requests: Dict[str, int] = {}
+        self.bytes_served = 0
+        self._payloads: Dict[int, bytes] = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeWallpaperServer':
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def record(self, path: str):
+        key = '/images/' if path.startswith('/images/') else path
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def add_bytes(self, n: int):
+        with self._lock:
+            self.bytes_served += n
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests.clear()
+            self.bytes_served = 0
+
+    def payload(self, size: int) -> bytes:
+        with self._lock:
+            data = self._payloads.get(size)
+            if data is None:
+                data = self._payloads[size] = make_image_payload(size)
+            return data
+
+    def _next_id(self) -> str:
+        with self._lock:
+            self._counter += 1
+            return f"img{self._counter:08d}"
+
+    def unsplash_photo(self, query: str = None) -> Dict:
+        """Unsplash 照片对象（只包含客户端用到的字段）"""
+        image_id = self._next_id()
+        image_url = f"{self.url}/images/{image_id}.jpg"
+        return {
+            'id': image_id,
+            'width': 6000,
+            'height': 4000,
+            'description': f"{query or 'random'} photo {image_id}",
+            'alt_description': None,
+            'urls': {
+                'raw': f"{image_url}?ixid=fake",
+                'full': image_url,
+                'regular': image_url,
+            },
+            'links': {'download': image_url},
+            'user': {'name': 'Fake Photographer'},
+            'tags': [{'title': query or 'random'}],
+        }
+
+    def wallhaven_wallpaper(self) -> Dict:
+        """Wallhaven 壁纸对象"""
+        image_id = self._next_id()
+        return {
+            'id': image_id,
+            'path': f"{self.url}/images/{image_id}.jpg",
+            'uploader': {'username': 'fake_uploader'},
+            'category': 'general',
+            'purity': 'sfw',
+            'resolution': '3840x2160',
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the fake wallpaper API server")
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--bandwidth', type=int, default=None)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--image-size', type=int, default=512 * 1024)
+    args = parser.parse_args()
+
+    server = FakeWallpaperServer(latency=args.latency, bandwidth=args.bandwidth,
+                                 failure_rate=args.failure_rate,
+                                 image_size=args.image_size).start()
+    print(f"Fake server listening on {server.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,513 @@
+"""
+虚拟时钟负载模拟
+在虚拟时间上驱动 WallpaperScheduler、API 客户端（伪造后端）、WallpaperDownloader 和 WallpaperSetter，
+几秒内重放数月的定时更换，统计 API 调用次数、下载字节数、缓存命中率、淘汰次数和最坏更换延迟，
+用于离线比较缓存策略和预下载深度。
+
+- schedule 库和核心模块中的 time 替换为虚拟时钟，sleep 只推进虚拟时间；
+- API 请求和图片下载不经过网络，由 FakeBackend 按配置的延迟、带宽推进虚拟时钟，
+  并按小时窗口模拟配额（用完后返回 403）；
+- 图片地址从有限的图库中随机抽取，图库越小，重复抽中（缓存命中）的概率越高。
+
+用法:
+    python benchmarks/simulate.py --days 90 --prefetch-every 6 --prefetch-depth 3
+"""
+
+import contextlib
+import datetime
+import io
+import json
+import math
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+from unittest import mock
+from urllib.parse import urlparse
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import requests
+import schedule
+
+from fake_server import make_image_payload
+
+from core.changer import WallpaperChangeError, WallpaperChanger
+from core.download_scheduler import DownloadScheduler
+from core.history import WallpaperHistory
+from core.scheduler import WallpaperScheduler
+from core.setter_backends import RecordingBackend
+from core.shuffle_bag import ShuffleBag
+from core.source_selector import SourceSelector
+from core.wallpaper_api import UnsplashAPI, WallhavenAPI
+from core.wallpaper_downloader import WallpaperDownloader
+from core.wallpaper_setter import WallpaperSetter
+from models.config import Config
+from utils.connectivity import ConnectivityChecker
+from utils.metrics import metrics
+
+# 使用虚拟时间的模块（其中的 time.time/monotonic/perf_counter/sleep 走虚拟时钟）
+VIRTUAL_TIME_MODULES = (
+    'core.cache_index', 'core.changer', 'core.download_scheduler', 'core.history',
+    'core.metadata_store', 'core.wallpaper_downloader', 'utils.metrics',
+)
+
+# 虚拟时间起点。缓存索引用 time.time() 与真实文件的 mtime 比较判断租约是否过期，
+# 起点早于真实时间可以保证模拟中不会误判
+DEFAULT_START = datetime.datetime(2024, 1, 1, 8, 0)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class VirtualClock:
+    """虚拟时钟（只在 advance/sleep 时前进）"""
+
+    def __init__(self, start: datetime.datetime = DEFAULT_START):
+        self._epoch = start.timestamp()
+        self._elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    def time(self) -> float:
+        return self._epoch + self._elapsed
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.time())
+
+    def advance(self, seconds: float):
+        if seconds > 0:
+            with self._lock:
+                self._elapsed += seconds
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+    @contextlib.contextmanager
+    def installed(self):
+        """在 schedule 库和 VIRTUAL_TIME_MODULES 中使用虚拟时间"""
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(mock.patch.object(schedule, 'datetime',
+                                                  _VirtualDatetimeModule(self)))
+            virtual_time = _VirtualTimeModule(self)
+            for name in VIRTUAL_TIME_MODULES:
+                stack.enter_context(mock.patch.object(sys.modules[name], 'time', virtual_time))
+            yield self
+
+
+class _VirtualTimeModule:
+    """替换模块中的 time：时钟函数走虚拟时间，其余委托给真实模块"""
+
+    def __init__(self, clock: VirtualClock):
+        self.time = clock.time
+        self.monotonic = clock.monotonic
+        self.perf_counter = clock.monotonic
+        self.sleep = clock.sleep
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class _VirtualDatetimeModule:
+    """替换 schedule 库中的 datetime 模块：datetime.now() 返回虚拟时间"""
+
+    def __init__(self, clock: VirtualClock):
+        class VirtualDatetime(datetime.datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.datetime.fromtimestamp(clock.time(), tz)
+
+        self.datetime = VirtualDatetime
+
+    def __getattr__(self, name):
+        return getattr(datetime, name)
+
+
+class _FakeResponse:
+    """requests.Response 的最小替身"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str] = None,
+                 payload=None, body: bytes = b'', on_chunk=None):
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+        self._payload = payload
+        self._body = body
+        self._on_chunk = on_chunk
+
+    def json(self):
+        return json.loads(json.dumps(self._payload))
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} (simulated)", response=self)
+
+    def iter_content(self, chunk_size: int = CHUNK_SIZE):
+        for offset in range(0, len(self._body), chunk_size):
+            chunk = self._body[offset:offset + chunk_size]
+            if self._on_chunk is not None:
+                self._on_chunk(len(chunk))
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """替换 API 客户端和下载器的 requests.Session，请求转交给 FakeBackend"""
+
+    def __init__(self, backend: 'FakeBackend', source: str = None):
+        """
+        Args:
+            backend: 伪造后端
+            source: API 源名称，None 表示图片 CDN（下载器）
+        """
+        self.backend = backend
+        self.source = source
+        self.headers = {}
+
+    def get(self, url: str, params: Dict = None, **kwargs) -> _FakeResponse:
+        if self.source is None:
+            return self.backend.image_get(url)
+        return self.backend.api_get(self.source, url, params or {})
+
+    def head(self, url: str, **kwargs) -> _FakeResponse:
+        return _FakeResponse(200)
+
+
+class FakeBackend:
+    """伪造的 Unsplash / Wallhaven API 和图片 CDN（按虚拟时钟计时、按小时窗口计配额）"""
+
+    def __init__(self, clock: VirtualClock, rng: random.Random, catalogue: int = 5000,
+                 image_size: int = 256 * 1024, api_latency: float = 0.3,
+                 download_latency: float = 0.1, bandwidth: float = 2e6,
+                 failure_rate: float = 0.0, quotas: Dict[str, int] = None):
+        """
+        Args:
+            clock: 虚拟时钟
+            rng: 随机数生成器
+            catalogue: 每个源的图库大小
+            image_size: 平均图片大小（字节），实际在 0.5～1.4 倍之间
+            api_latency: API 请求平均延迟（秒，指数分布）
+            download_latency: 图片请求首字节延迟（秒）
+            bandwidth: 下载带宽（字节/秒）
+            failure_rate: API 请求返回 503 的概率
+            quotas: 每小时配额 {源名称: 次数}
+        """
+        self.clock = clock
+        self.rng = rng
+        self.catalogue = catalogue
+        self.image_size = image_size
+        self.api_latency = api_latency
+        self.download_latency = download_latency
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        self.quotas = quotas or {'unsplash': 50, 'wallhaven': 45 * 60}
+        self.api_calls: Counter = Counter()
+        self.quota_rejections: Counter = Counter()
+        self.image_requests = 0
+        self.bytes_served = 0
+        self._windows: Dict[str, List[float]] = {}  # 源 → [窗口起点, 已用次数]
+        self._payloads: Dict[int, bytes] = {}
+
+    def _take_quota(self, source: str) -> int:
+        """消耗一次配额，返回剩余次数（-1 表示已用完）"""
+        window = self._windows.setdefault(source, [self.clock.time(), 0])
+        if self.clock.time() - window[0] >= 3600:
+            window[0], window[1] = self.clock.time(), 0
+        limit = self.quotas.get(source, 1000)
+        if window[1] >= limit:
+            return -1
+        window[1] += 1
+        return limit - window[1]
+
+    def api_get(self, source: str, url: str, params: Dict) -> _FakeResponse:
+        self.api_calls[source] += 1
+        self.clock.advance(self.rng.expovariate(1 / self.api_latency) if self.api_latency else 0)
+
+        remaining = self._take_quota(source)
+        if remaining < 0:
+            self.quota_rejections[source] += 1
+            return _FakeResponse(403, {'X-Ratelimit-Remaining': '0'}, {'errors': ['Rate Limit Exceeded']})
+        headers = {'X-Ratelimit-Remaining': str(remaining)}
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            return _FakeResponse(503, headers, {'errors': ['simulated failure']})
+
+        path = urlparse(url).path
+        if source == 'unsplash' and path.endswith('/photos/random'):
+            count = int(params.get('count', 1))
+            return _FakeResponse(200, headers, [self._unsplash_photo(params.get('query'))
+                                                for _ in range(count)])
+        if source == 'unsplash' and path.endswith('/search/photos'):
+            count = int(params.get('per_page', 10))
+            results = [self._unsplash_photo(params.get('query')) for _ in range(count)]
+            return _FakeResponse(200, headers, {'total': count, 'total_pages': 1,
+                                                'results': results})
+        if source == 'wallhaven' and path.endswith('/search'):
+            data = [self._wallhaven_wallpaper() for _ in range(24)]
+            return _FakeResponse(200, headers, {'data': data,
+                                                'meta': {'current_page': 1, 'last_page': 1}})
+        return _FakeResponse(404, headers, {'errors': ['not found']})
+
+    def image_get(self, url: str, **kwargs) -> _FakeResponse:
+        """图片下载"""
+        self.image_requests += 1
+        self.clock.advance(self.download_latency)
+        body = self._payload(url)
+        self.bytes_served += len(body)
+        return _FakeResponse(200, {'Content-Type': 'image/jpeg', 'Content-Length': str(len(body))},
+                             body=body, on_chunk=self._transfer)
+
+    def _transfer(self, n: int):
+        if self.bandwidth:
+            self.clock.advance(n / self.bandwidth)
+
+    def _payload(self, url: str) -> bytes:
+        """图片内容：大小由图片编号决定，同一张图片每次相同"""
+        number = int(''.join(c for c in urlparse(url).path if c.isdigit()) or 0)
+        size = int(self.image_size * (0.5 + (number % 8) / 8))
+        data = self._payloads.get(size)
+        if data is None:
+            data = self._payloads[size] = make_image_payload(size)
+        return data
+
+    def _unsplash_photo(self, query: str = None) -> Dict:
+        number = self.rng.randrange(self.catalogue)
+        image_url = f"https://images.unsplash.com/photo-{number}"
+        return {
+            'id': f"u{number}",
+            'width': 6000,
+            'height': 4000,
+            'description': f"{query or 'random'} photo {number}",
+            'alt_description': None,
+            'urls': {'raw': f"{image_url}?ixid=sim", 'full': image_url, 'regular': image_url},
+            'links': {'download': image_url},
+            'user': {'name': 'Simulated Photographer'},
+            'tags': [{'title': query or 'random'}],
+        }
+
+    def _wallhaven_wallpaper(self) -> Dict:
+        number = self.rng.randrange(self.catalogue)
+        return {
+            'id': f"w{number}",
+            'path': f"https://w.wallhaven.cc/full/{number}.jpg",
+            'uploader': {'username': 'simulated_uploader'},
+            'category': 'general',
+            'purity': 'sfw',
+            'resolution': '3840x2160',
+        }
+
+
+class _AlwaysOnline(ConnectivityChecker):
+    """模拟中不做 TCP 探测"""
+
+    def _probe(self, urls) -> bool:
+        return True
+
+
+@dataclass
+class SimulationReport:
+    """模拟结果"""
+
+    days: float
+    changes: int = 0
+    failures: int = 0
+    downloads_on_change: int = 0
+    api_calls: Dict[str, int] = field(default_factory=dict)
+    quota_rejections: Dict[str, int] = field(default_factory=dict)
+    images_downloaded: int = 0
+    bytes_downloaded: int = 0
+    evictions: int = 0
+    change_latencies: List[float] = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+    @property
+    def hit_ratio(self) -> float:
+        """不需要下载就完成的更换所占比例（缓存命中或缓存轮换）"""
+        if not self.changes:
+            return 0.0
+        return 1 - self.downloads_on_change / self.changes
+
+    @property
+    def worst_latency(self) -> float:
+        return max(self.change_latencies, default=0.0)
+
+    def latency_percentile(self, percentile: float) -> float:
+        if not self.change_latencies:
+            return 0.0
+        ordered = sorted(self.change_latencies)
+        return ordered[max(0, math.ceil(len(ordered) * percentile / 100) - 1)]
+
+    def format(self) -> str:
+        calls = ', '.join(f"{name} {n}" for name, n in sorted(self.api_calls.items())) or '0'
+        rejected = sum(self.quota_rejections.values())
+        lines = [
+            f"Simulated {self.days:g} days in {self.wall_seconds:.1f} s",
+            f"  changes:          {self.changes} ({self.failures} failed)",
+            f"  API calls:        {calls} ({rejected} over quota)",
+            f"  downloaded:       {self.images_downloaded} images, "
+            f"{self.bytes_downloaded / (1024 * 1024):.1f} MB",
+            f"  cache hit ratio:  {self.hit_ratio:.1%}",
+            f"  evictions:        {self.evictions}",
+            f"  change latency:   p95 {self.latency_percentile(95):.2f} s, "
+            f"worst {self.worst_latency:.2f} s",
+        ]
+        return '\n'.join(lines)
+
+
+def run_simulation(workdir, days: float = 30, interval_hours: int = 1,
+                   prefetch_every: int = 0, prefetch_depth: int = 3,
+                   rotation: str = 'online', max_images: int = 50, max_size_mb: float = 500,
+                   history: int = 10, sources: List[str] = ('unsplash', 'wallhaven'),
+                   seed: int = 0, verbose: bool = False, **backend_options) -> SimulationReport:
+    """
+    运行一次模拟
+
+    Args:
+        workdir: 工作目录（配置、缓存和历史记录写在这里）
+        days: 模拟天数
+        interval_hours: 定时更换间隔（小时）
+        prefetch_every: 每隔几小时预下载一次，0 表示不预下载
+        prefetch_depth: 每次预下载的张数
+        rotation: 轮换模式（online/offline_first/offline）
+        max_images: 热缓存图片数上限
+        max_size_mb: 热缓存大小上限（MB）
+        history: 历史记录条数（历史中的壁纸在缓存中被固定）
+        sources: 启用的图片源
+        seed: 随机种子
+        verbose: 是否输出各模块的日志
+        backend_options: 传给 FakeBackend 的参数（图库大小、延迟、带宽等）
+    """
+    workdir = Path(workdir)
+    clock = VirtualClock()
+    rng = random.Random(seed)
+    backend = FakeBackend(clock, rng, **backend_options)
+    report = SimulationReport(days=days)
+
+    was_enabled = metrics.enabled
+    random_state = random.getstate()
+    wall_start = time.perf_counter()
+    log = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with clock.installed(), log:
+        metrics.reset()
+        metrics.enabled = True
+        random.seed(seed)  # API 客户端中的随机分类和 Wallhaven 种子
+        try:
+            config = Config(str(workdir / 'config.json'))
+            config.update({
+                'rotation.mode': rotation,
+                # 对冲请求按真实时间等待，虚拟时钟下没有意义
+                'hedging.enabled': False,
+            })
+            apis = {}
+            for name, cls in (('unsplash', UnsplashAPI), ('wallhaven', WallhavenAPI)):
+                if name in sources:
+                    apis[name] = cls('sim-key')
+                    apis[name]._session = FakeSession(backend, name)
+
+            downloader = WallpaperDownloader(cache_dir=str(workdir / 'cache'),
+                                             max_size_mb=max_size_mb, max_images=max_images)
+            downloader._session = FakeSession(backend)
+            changer = WallpaperChanger(
+                config, downloader, apis, WallpaperSetter(RecordingBackend()),
+                history=WallpaperHistory(str(workdir / 'history.log'), capacity=history,
+                                         downloader=downloader),
+                selector=SourceSelector(clock=clock.monotonic, rng=random.Random(seed)),
+                shuffle=ShuffleBag(rng=random.Random(seed)),
+                connectivity=_AlwaysOnline(clock=clock.monotonic),
+                downloads=DownloadScheduler(downloader, background_workers=1),
+            )
+
+            def change():
+                downloads_before = backend.image_requests
+                start = clock.monotonic()
+                try:
+                    changer.change()
+                except WallpaperChangeError:
+                    report.failures += 1
+                report.change_latencies.append(clock.monotonic() - start)
+                report.changes += 1
+                if backend.image_requests > downloads_before:
+                    report.downloads_on_change += 1
+
+            def prefetch():
+                try:
+                    changer.prefetch(count=prefetch_depth)
+                except WallpaperChangeError:
+                    pass
+
+            scheduler = WallpaperScheduler()
+            scheduler.set_update_callback(change)
+            scheduler.schedule_hourly(interval_hours)
+            if prefetch_every:
+                schedule.every(prefetch_every).hours.do(prefetch)
+            scheduler.start()
+
+            end = days * 86400
+            while True:
+                idle = scheduler.idle_seconds()
+                if idle is None or clock.monotonic() + idle > end:
+                    break
+                clock.advance(idle)
+                scheduler.run_pending()
+            scheduler.stop()
+            changer.close(wait=True)
+
+            report.evictions = int(metrics.counter('cache_evictions_total'))
+        finally:
+            metrics.enabled = was_enabled
+            metrics.reset()
+            random.setstate(random_state)
+
+    report.api_calls = dict(backend.api_calls)
+    report.quota_rejections = dict(backend.quota_rejections)
+    report.images_downloaded = backend.image_requests
+    report.bytes_downloaded = backend.bytes_served
+    report.wall_seconds = time.perf_counter() - wall_start
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Replay scheduled wallpaper changes on a virtual clock")
+    parser.add_argument('--days', type=float, default=30)
+    parser.add_argument('--interval', type=int, default=1, help='hours between changes')
+    parser.add_argument('--prefetch-every', type=int, default=0,
+                        help='hours between prefetches (0 disables prefetching)')
+    parser.add_argument('--prefetch-depth', type=int, default=3)
+    parser.add_argument('--rotation', choices=('online', 'offline_first', 'offline'),
+                        default='online')
+    parser.add_argument('--max-images', type=int, default=50)
+    parser.add_argument('--max-size-mb', type=float, default=500)
+    parser.add_argument('--history', type=int, default=10)
+    parser.add_argument('--sources', default='unsplash,wallhaven')
+    parser.add_argument('--catalogue', type=int, default=5000, help='images per source')
+    parser.add_argument('--image-size', type=int, default=256 * 1024)
+    parser.add_argument('--api-latency', type=float, default=0.3)
+    parser.add_argument('--bandwidth', type=float, default=2e6, help='bytes per second')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--unsplash-quota', type=int, default=50, help='requests per hour')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='keep config, cache and history here')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='wallpaper-sim-') as tmp:
+        result = run_simulation(
+            args.workdir or tmp, days=args.days, interval_hours=args.interval,
+            prefetch_every=args.prefetch_every, prefetch_depth=args.prefetch_depth,
+            rotation=args.rotation, max_images=args.max_images, max_size_mb=args.max_size_mb,
+            history=args.history, sources=args.sources.split(','), seed=args.seed,
+            verbose=args.verbose, catalogue=args.catalogue, image_size=args.image_size,
+            api_latency=args.api_latency, bandwidth=args.bandwidth,
+            failure_rate=args.failure_rate,
+            quotas={'unsplash': args.unsplash_quota, 'wallhaven': 45 * 60},
+        )
+    print(result.format())
@@ -0,0 +1,515 @@
+"""
+缓存索引
+在内存中维护缓存图片列表，避免每次查询都扫描目录和 stat 文件
+
+多个进程可以共用同一个缓存目录：
+- 索引持久化为 index.json，写入临时文件后原子替换，读取方无需加锁；
+- 修改索引时持有 .index.lock 上的排他文件锁，先合并其他进程的修改再写回；
+- 下载中的文件以 O_EXCL 创建 .part 租约，同一文件只有一个写入者；写入者的 pid 记录在
+  .part.owner 中，只有写入者已退出时才能接管租约；
+- 每个进程把正在使用的文件写入 .refs/<pid>.json，清理时跳过仍存活进程引用的文件。
+"""
+
+import json
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from utils.file_lock import FileLock
+from utils.fs import write_json_atomic
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+INDEX_FILE = 'index.json'
+LOCK_FILE = '.index.lock'
+REFS_DIR = '.refs'
+PART_SUFFIX = '.part'
+OWNER_SUFFIX = '.owner'
+
+# 租约文件超过该时间没有写入、且无法确认写入者仍在运行时视为写入者已崩溃（秒）
+LEASE_TIMEOUT = 60.0
+# 写入者进程仍存在、但租约超过该时间没有写入时也视为遗留（pid 可能已被新进程复用）
+LEASE_ABANDONED = 3600.0
+# 写回索引失败（如 Windows 上其他进程正打开 index.json）时的重试次数
+SAVE_RETRIES = 5
+# 读取时最多每隔该时间检查一次其他进程对索引的修改（秒）
+REFRESH_INTERVAL = 0.5
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目"""
+    name: str
+    size: int
+    mtime: float
+    atime: float
+    # HTTP 验证器和最近一次确认内容未变的时间（用于条件请求重新验证）
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    validated: float = 0.0
+
+    def to_dict(self) -> Dict:
+        data = {'size': self.size, 'mtime': self.mtime, 'atime': self.atime}
+        if self.etag:
+            data['etag'] = self.etag
+        if self.last_modified:
+            data['last_modified'] = self.last_modified
+        if self.validated:
+            data['validated'] = self.validated
+        return data
+
+
+def _pid_alive(pid: int) -> bool:
+    """进程是否仍在运行"""
+    if pid == os.getpid():
+        return True
+    if platform.system() == 'Windows':
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        ok = kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return bool(ok) and code.value == STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _owner_path(part_path: Path) -> Path:
+    return part_path.with_name(part_path.name + OWNER_SUFFIX)
+
+
+class WriteLease:
+    """
+    下载写入租约
+
+    持有 <name>.part 文件，commit 时原子重命名为正式文件，abort 时删除。
+    写入者的 pid 记录在 <name>.part.owner 中，供其他进程判断租约是否可以接管。
+    """
+
+    def __init__(self, final_path: Path, part_path: Path, fd: int):
+        self.final_path = final_path
+        self.path = part_path
+        self.owner_path = _owner_path(part_path)
+        self.file = os.fdopen(fd, 'wb')
+        try:
+            self.owner_path.write_text(str(os.getpid()), encoding='ascii')
+        except OSError:
+            pass
+
+    def _release_owner(self):
+        try:
+            self.owner_path.unlink()
+        except OSError:
+            pass
+
+    def commit(self):
+        """完成写入"""
+        self.file.close()
+        os.replace(self.path, self.final_path)
+        self._release_owner()
+
+    def abort(self):
+        """放弃写入"""
+        if not self.file.closed:
+            self.file.close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+        self._release_owner()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None or not self.file.closed:
+            self.abort()
+        return False
+
+
+class CacheIndex:
+    """缓存索引（首次访问时加载 index.json 或扫描目录，之后增量维护）"""
+
+    def __init__(self, cache_dir: str, extensions=IMAGE_EXTENSIONS):
+        """
+        Args:
+            cache_dir: 缓存目录
+            extensions: 扫描目录重建索引时收录的扩展名
+        """
+        self.cache_dir = Path(cache_dir)
+        self.extensions = tuple(extensions)
+        self.index_path = self.cache_dir / INDEX_FILE
+        self.refs_dir = self.cache_dir / REFS_DIR
+        self._entries: Dict[str, CacheEntry] = {}
+        self._total_size = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(self.cache_dir / LOCK_FILE)
+        self._depth = 0
+        self._signature = None
+        self._checked = 0.0
+        # 本进程更新过的访问时间，随下一次写回合并
+        self._touched: Dict[str, float] = {}
+        # 尚未成功写回的修改（None 表示删除），重新加载索引文件后重新应用
+        self._unsaved: Dict[str, Optional[CacheEntry]] = {}
+
+    # ---------- 加载与持久化 ----------
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _ensure_loaded(self):
+        """首次访问时加载索引，之后定期检查其他进程的修改"""
+        now = time.monotonic()
+        if self._loaded and (self._depth or now - self._checked < REFRESH_INTERVAL):
+            return
+        self._checked = now
+
+        signature = self._stat_signature()
+        if self._loaded and signature == self._signature:
+            return
+
+        if signature is not None and self._load_file():
+            self._signature = signature
+        elif not self._loaded:
+            self._scan()
+        self._loaded = True
+
+    def _load_file(self) -> bool:
+        """读取 index.json（原子替换保证读到完整内容）"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        self._entries = {}
+        self._total_size = 0
+        for name, item in data.get('entries', {}).items():
+            atime = max(item.get('atime', 0), self._touched.get(name, 0))
+            self._put(CacheEntry(name, item['size'], item['mtime'], atime,
+                                 item.get('etag'), item.get('last_modified'),
+                                 item.get('validated', 0.0)))
+        for name, entry in self._unsaved.items():
+            if entry is None:
+                self._drop(name)
+            else:
+                self._put(entry)
+        return True
+
+    def _scan(self):
+        """扫描缓存目录建立索引（索引文件不存在或损坏时）"""
+        previous = self._entries
+        self._entries = {}
+        self._total_size = 0
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for item in it:
+                    if not item.is_file():
+                        continue
+                    if os.path.splitext(item.name)[1].lower() not in self.extensions:
+                        continue
+                    stat = item.stat()
+                    old = previous.get(item.name)
+                    if old is not None and old.size == stat.st_size:
+                        self._put(CacheEntry(item.name, stat.st_size, stat.st_mtime, old.atime,
+                                             old.etag, old.last_modified, old.validated))
+                    else:
+                        atime = old.atime if old is not None else stat.st_mtime
+                        self._put(CacheEntry(item.name, stat.st_size, stat.st_mtime, atime))
+        except FileNotFoundError:
+            pass
+
+    def _save(self):
+        """写回 index.json"""
+        data = {
+            'version': 1,
+            'entries': {name: e.to_dict() for name, e in self._entries.items()}
+        }
+        for attempt in range(SAVE_RETRIES):
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                write_json_atomic(self.index_path, data)
+            except PermissionError as e:
+                # Windows 上其他进程打开 index.json 时无法替换，稍后重试
+                error = e
+                time.sleep(0.02 * 2 ** attempt)
+                continue
+            except OSError as e:
+                error = e
+                break
+            self._signature = self._stat_signature()
+            self._touched.clear()
+            self._unsaved.clear()
+            return
+        # 修改保留在 _unsaved 中，随下一次写回一起保存
+        print(f"Error saving cache index: {error}")
+
+    @contextmanager
+    def transaction(self):
+        """
+        修改索引的事务（可嵌套）
+
+        最外层持有跨进程排他锁，进入时合并其他进程的修改，退出时写回一次。
+        """
+        with self._lock:
+            if self._depth == 0:
+                self._file_lock.acquire()
+                self._checked = 0.0
+                self._ensure_loaded()
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self._save()
+                    finally:
+                        self._file_lock.release()
+
+    def _put(self, entry: CacheEntry):
+        old = self._entries.get(entry.name)
+        if old is not None:
+            self._total_size -= old.size
+        self._entries[entry.name] = entry
+        self._total_size += entry.size
+
+    def _drop(self, name: str):
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self._total_size -= entry.size
+
+    def _changed(self, *names: str):
+        """记录事务中修改过的条目（写回失败时保留）"""
+        for name in names:
+            self._unsaved[name] = self._entries.get(name)
+
+    # ---------- 条目 ----------
+
+    def add(self, path: Path, etag: str = None,
+            last_modified: str = None) -> Optional[CacheEntry]:
+        """
+        登记新写入的缓存文件
+
+        Args:
+            path: 文件路径
+            etag: 响应的 ETag
+            last_modified: 响应的 Last-Modified
+        """
+        path = Path(path)
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+
+        now = time.time()
+        entry = CacheEntry(path.name, stat.st_size, stat.st_mtime, now,
+                           etag, last_modified, now if (etag or last_modified) else 0.0)
+        with self.transaction():
+            old = self._entries.get(path.name)
+            if (not (etag or last_modified) and old is not None
+                    and (old.size, old.mtime) == (entry.size, entry.mtime)):
+                # 重新登记同一个文件（如等待其他进程下载完成后）时保留验证器
+                entry.etag, entry.last_modified = old.etag, old.last_modified
+                entry.validated = old.validated
+            self._put(entry)
+            self._changed(entry.name)
+        return entry
+
+    def mark_validated(self, name: str, etag: str = None, last_modified: str = None):
+        """服务器确认内容未变（304）：更新验证时间，服务器给出新的验证器时一并更新"""
+        with self.transaction():
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry.validated = time.time()
+                entry.etag = etag or entry.etag
+                entry.last_modified = last_modified or entry.last_modified
+                self._changed(name)
+
+    def remove(self, name: str):
+        """移除条目"""
+        with self.transaction():
+            self._drop(name)
+            self._changed(name)
+
+    def touch(self, name: str):
+        """更新访问时间（只在内存中，随下一次写回持久化）"""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry.atime = time.time()
+                self._touched[name] = entry.atime
+
+    def get(self, name: str) -> Optional[CacheEntry]:
+        """按文件名查找"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._entries.get(name)
+
+    def entries(self) -> List[CacheEntry]:
+        """所有条目（最新的在前）"""
+        with self._lock:
+            self._ensure_loaded()
+            return sorted(self._entries.values(), key=lambda e: e.mtime, reverse=True)
+
+    def total_size(self) -> int:
+        """总字节数"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._total_size
+
+    def rebuild(self):
+        """重新扫描缓存目录（拾取绕过索引增删的文件）"""
+        with self.transaction():
+            previous = list(self._entries)
+            self._scan()
+            self._changed(*previous, *self._entries)
+
+    def clear(self):
+        """清空索引"""
+        with self.transaction():
+            previous = list(self._entries)
+            self._entries.clear()
+            self._total_size = 0
+            self._changed(*previous)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._entries)
+
+    # ---------- 写入租约 ----------
+
+    def lease(self, name: str) -> Optional[WriteLease]:
+        """
+        获取文件的写入租约
+
+        Returns:
+            WriteLease，其他写入者正在写入时返回 None
+        """
+        final_path = self.cache_dir / name
+        part_path = self.cache_dir / (name + PART_SUFFIX)
+        flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+
+        for _ in range(2):
+            try:
+                fd = os.open(str(part_path), flags, 0o644)
+                return WriteLease(final_path, part_path, fd)
+            except FileExistsError:
+                # 写入者已崩溃时接管租约；在索引锁内确认并删除，避免多个进程同时接管
+                with self.transaction():
+                    if not self._lease_stale(part_path):
+                        return None
+                    for path in (part_path, _owner_path(part_path)):
+                        try:
+                            path.unlink()
+                        except OSError:
+                            pass
+        return None
+
+    def _lease_stale(self, part_path: Path) -> bool:
+        """
+        租约的写入者是否已不在运行
+
+        有 .owner 时以写入者进程是否存活为准（短暂停滞的写入者不会被接管）；
+        没有时（刚创建或旧版本留下的租约）按最近写入时间判断。
+        """
+        try:
+            idle = time.time() - part_path.stat().st_mtime
+        except OSError:
+            return True
+        try:
+            pid = int(_owner_path(part_path).read_text(encoding='ascii'))
+        except (OSError, ValueError):
+            return idle > LEASE_TIMEOUT
+        return not _pid_alive(pid) or idle > LEASE_ABANDONED
+
+    def is_leased(self, name: str) -> bool:
+        """文件是否正在被写入"""
+        part_path = self.cache_dir / (name + PART_SUFFIX)
+        return part_path.exists() and not self._lease_stale(part_path)
+
+    def wait_for_lease(self, name: str, timeout: float = LEASE_TIMEOUT) -> bool:
+        """
+        等待其他写入者完成
+
+        Returns:
+            正式文件是否已存在
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        while self.is_leased(name) and time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+        return (self.cache_dir / name).exists()
+
+    def purge_stale_leases(self) -> int:
+        """删除崩溃写入者遗留的租约文件"""
+        removed = 0
+        for part_path in self.cache_dir.glob('*' + PART_SUFFIX):
+            if self._lease_stale(part_path):
+                part_path.unlink(missing_ok=True)
+                _owner_path(part_path).unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    # ---------- 跨进程引用计数 ----------
+
+    def publish_refs(self, refs: Dict[str, int]):
+        """发布本进程正在使用的文件（文件名 → 引用数）"""
+        path = self.refs_dir / f"{os.getpid()}.json"
+        try:
+            if refs:
+                self.refs_dir.mkdir(parents=True, exist_ok=True)
+                write_json_atomic(path, {'pid': os.getpid(), 'refs': refs})
+            else:
+                path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Error publishing cache refs: {e}")
+
+    def foreign_refs(self) -> Set[str]:
+        """其他存活进程正在使用的文件名（顺带清理已退出进程的记录）"""
+        names: Set[str] = set()
+        try:
+            ref_files = list(os.scandir(self.refs_dir))
+        except FileNotFoundError:
+            return names
+
+        for item in ref_files:
+            stem, ext = os.path.splitext(item.name)
+            if ext != '.json' or not stem.isdigit():
+                continue
+            pid = int(stem)
+            if pid == os.getpid():
+                continue
+            if not _pid_alive(pid):
+                Path(item.path).unlink(missing_ok=True)
+                continue
+            try:
+                with open(item.path, 'r', encoding='utf-8') as f:
+                    names.update(name for name, count in json.load(f)['refs'].items()
+                                 if count > 0)
+            except (OSError, ValueError, KeyError):
+                continue
+        return names
@@ -0,0 +1,411 @@
+"""
+壁纸更换流程
+选源 → 获取图片信息 → 下载 → 设置壁纸，不依赖 Qt，可供界面、命令行和基准测试共用
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.download_scheduler import DownloadScheduler
+from core.shuffle_bag import ShuffleBag
+from core.source_selector import HedgeBudget, SourceSelector
+from core.wallpaper_setter import WallpaperStyle
+from utils.connectivity import ConnectivityChecker
+from utils.metrics import metrics
+from utils.screen_info import ScreenInfo
+
+# 预热时预先获取的图片信息的有效期（秒）
+PREFETCHED_MAX_AGE = 300.0
+
+
+class WallpaperChangeError(Exception):
+    """更换壁纸失败"""
+
+    def __init__(self, status: str, title: str, message: str):
+        """
+        Args:
+            status: 状态栏提示
+            title: 对话框标题
+            message: 详细说明
+        """
+        super().__init__(message)
+        self.status = status
+        self.title = title
+
+
+class WallpaperChanger:
+    """壁纸更换流程"""
+
+    def __init__(self, config, downloader, apis: Dict, setter, history=None,
+                 selector: SourceSelector = None, shuffle: ShuffleBag = None,
+                 connectivity: ConnectivityChecker = None, downloads: DownloadScheduler = None):
+        """
+        Args:
+            config: Config 实例
+            downloader: WallpaperDownloader 实例
+            apis: {源名称: API 客户端}，调用方可原地增删
+            setter: WallpaperSetter 实例
+            history: 可选的 WallpaperHistory
+            selector: 图片源选择器，默认新建
+            shuffle: 缓存轮换用的洗牌袋，默认只保存在内存中
+            connectivity: 连通性检测，默认新建
+            downloads: 下载调度器，默认不限速
+        """
+        self.config = config
+        self.downloader = downloader
+        self.apis = apis
+        self.setter = setter
+        self.history = history
+        self.selector = selector or SourceSelector()
+        self.shuffle = shuffle or ShuffleBag()
+        self.connectivity = connectivity or ConnectivityChecker()
+        self.downloads = downloads or DownloadScheduler(downloader)
+        self.hedge_budget = HedgeBudget(config.get_hedge_budget())
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 预热时预先获取的 (获取时间, 源名称, 图片信息)，下一次联网更换时使用
+        self._prefetched: Optional[Tuple[float, str, Dict]] = None
+        self._prefetched_lock = threading.Lock()
+
+    def get_style(self) -> WallpaperStyle:
+        """当前配置的壁纸样式"""
+        mode = self.config.get_wallpaper_mode()
+        return getattr(WallpaperStyle, mode.upper(), WallpaperStyle.FILL)
+
+    def _fetch_images(self, api_name: str, count: int) -> List[Dict]:
+        """从指定源获取随机图片信息"""
+        api = self.apis[api_name]
+        if api_name == 'unsplash':
+            category = random.choice(self.config.get_categories())
+            return api.fetch_random(query=category, count=count)
+        return api.fetch_random(count=count)
+
+    def _timed_fetch(self, api_name: str, count: int) -> List[Dict]:
+        """获取图片信息并把耗时、结果和剩余配额记入选择器"""
+        start = time.perf_counter()
+        images = self._fetch_images(api_name, count=count)
+        self.selector.record(api_name, time.perf_counter() - start, bool(images),
+                             quota=self.apis[api_name].rate_limit_remaining)
+        return images
+
+    def _fetch_hedged(self, api_name: str, count: int,
+                      status: Callable[[str], None]) -> Tuple[str, List[Dict]]:
+        """
+        向主源发出请求；超过其延迟百分位仍未返回时，向第二个源
+        （只有 Unsplash 时为第二次 Unsplash 查询）发出对冲请求，取先成功的结果
+
+        落后的请求无法中断，结果直接丢弃（耗时仍会记入选择器）。
+        """
+        self.hedge_budget.ratio = self.config.get_hedge_budget()
+        self.hedge_budget.on_request()
+        delay = self.selector.hedge_delay(api_name, self.config.get_hedge_percentile())
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='fetch')
+        futures = {self._executor.submit(self._timed_fetch, api_name, count): api_name}
+
+        if delay is not None:
+            done, _ = wait(futures, timeout=delay)
+            if not done and self.hedge_budget.try_spend():
+                hedge_name = self.selector.choose(list(self.apis), exclude=[api_name])
+                if hedge_name is None and api_name == 'unsplash':
+                    hedge_name = api_name
+                if hedge_name is not None:
+                    status(f"{api_name} 响应较慢，同时尝试 {hedge_name}...")
+                    metrics.inc('hedge_requests_total', source=hedge_name)
+                    hedge = self._executor.submit(self._timed_fetch, hedge_name, count)
+                    futures[hedge] = hedge_name
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                images = future.result()
+                if images:
+                    for other in pending:
+                        other.cancel()
+                    if len(futures) > 1 and futures[future] != api_name:
+                        metrics.inc('hedge_wins_total', source=futures[future])
+                    return futures[future], images
+        return api_name, []
+
+    def _fetch_from_best_source(self, count: int, status: Callable[[str], None],
+                                hedge: bool = False) -> Tuple[str, List[Dict]]:
+        """
+        按健康度选源获取图片信息，失败时换下一个源
+
+        Args:
+            count: 图片数量
+            status: 进度回调
+            hedge: 首个源是否启用对冲请求（用于前台操作）
+
+        Returns:
+            (源名称, 图片信息列表)，所有源都失败时图片列表为空
+        """
+        failed = []
+        api_name = None
+        while True:
+            candidate = self.selector.choose(list(self.apis), exclude=failed)
+            if candidate is None:
+                return api_name, []
+            api_name = candidate
+
+            status(f"正在从 {api_name} 获取壁纸...")
+            if hedge and not failed:
+                source, images = self._fetch_hedged(api_name, count, status)
+                if images:
+                    return source, images
+            else:
+                images = self._timed_fetch(api_name, count)
+                if images:
+                    return api_name, images
+            failed.append(api_name)
+
+    def fetch_image(self, status: Callable[[str], None] = None) -> Tuple[str, Dict]:
+        """
+        获取一张图片的信息，并把 url 替换为适合当前屏幕的高分辨率地址
+
+        Returns:
+            (源名称, 图片信息)
+        """
+        status = status or (lambda message: None)
+
+        prefetched = self._take_prefetched()
+        if prefetched is not None:
+            status("使用预先获取的壁纸信息")
+            return prefetched
+
+        if not self.apis:
+            raise WallpaperChangeError(
+                "请先配置 API 密钥",
+                "配置提示",
+                "请先在设置中配置 API 密钥才能使用。\n\n"
+                "Unsplash Access Key 可以在 https://unsplash.com/developers 获取。"
+            )
+
+        hedge = self.config.is_hedging_enabled()
+        api_name, images = self._fetch_from_best_source(1, status, hedge=hedge)
+        if not images:
+            raise WallpaperChangeError(
+                "获取壁纸失败",
+                "获取失败",
+                f"无法从 {'、'.join(self.apis)} 获取壁纸。\n请检查网络连接和 API 密钥。"
+            )
+
+        api = self.apis[api_name]
+        image = images[0]
+
+        # 根据屏幕（缓存快照）计算目标分辨率并获取高分辨率 URL
+        width, height = ScreenInfo.recommend_resolution(
+            mode=self.config.get_resolution_mode(),
+            prefer_higher=self.config.prefer_higher_resolution()
+        )
+        high_res_url = api.get_high_resolution_url(
+            image,
+            target_width=width,
+            target_height=height
+        )
+        image['url'] = high_res_url
+        image['high_res_url'] = high_res_url
+
+        status(f"已获取高分辨率图片: {width}x{height}")
+        return api_name, image
+
+    def _take_prefetched(self) -> Optional[Tuple[str, Dict]]:
+        """取出预热时获取的图片信息（过期或对应的源已移除时丢弃）"""
+        with self._prefetched_lock:
+            prefetched, self._prefetched = self._prefetched, None
+        if prefetched is None:
+            return None
+        fetched_at, api_name, image = prefetched
+        if time.monotonic() - fetched_at > PREFETCHED_MAX_AGE or api_name not in self.apis:
+            return None
+        metrics.inc('prefetched_metadata_used_total', source=api_name)
+        return api_name, image
+
+    def _will_change_online(self) -> bool:
+        """按当前轮换模式，下一次更换是否会联网获取新壁纸"""
+        mode = self.config.get_rotation_mode()
+        if mode == 'offline':
+            return False
+        if mode == 'offline_first':
+            names = [path.name for path in
+                     self.downloader.get_cached_wallpapers(include_cold=True)]
+            return not self.shuffle.has_unseen(names)
+        return True
+
+    def prewarm(self, fetch_metadata: bool = False):
+        """
+        定时更换前预热：建立到各 API 和图片 CDN 的连接（DNS、TCP、TLS），
+        使随后的更换在已建立的连接上进行
+
+        Args:
+            fetch_metadata: 是否同时预先获取下一张壁纸的信息（消耗一次 API 配额，
+                            下一次联网更换时直接使用）
+        """
+        if not self.apis or not self._will_change_online():
+            return
+        metrics.inc('prewarm_total')
+        with metrics.timer('prewarm_seconds'):
+            for api in list(self.apis.values()):
+                api.prewarm()
+                if api.image_base_url:
+                    self.downloader.prewarm(api.image_base_url)
+
+            if not fetch_metadata:
+                return
+            with self._prefetched_lock:
+                if (self._prefetched is not None
+                        and time.monotonic() - self._prefetched[0] <= PREFETCHED_MAX_AGE):
+                    return
+            try:
+                api_name, image = self.fetch_image()
+            except WallpaperChangeError as e:
+                print(f"Prewarm could not fetch wallpaper info: {e}")
+                return
+            # 图片可能不在默认 CDN 上
+            self.downloader.prewarm(image['url'])
+            with self._prefetched_lock:
+                self._prefetched = (time.monotonic(), api_name, image)
+
+    def close(self, wait: bool = False):
+        """停止对冲请求线程池（落后的请求会在超时内自行结束）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def apply(self, path) -> bool:
+        """设置本地壁纸并记录历史（不访问网络；冷缓存中的图片先还原）"""
+        if self.setter is None:
+            print("No wallpaper setter available on this platform")
+            return False
+        if not Path(path).exists():
+            path = self.downloader.restore(path)
+            if path is None:
+                print("Wallpaper is no longer in the cache")
+                return False
+        if not self.setter.set_wallpaper(str(path), self.get_style(),
+                                         digest=self.downloader.content_digest(path)):
+            return False
+        if self.history is not None:
+            self.history.push(path)
+        return True
+
+    def change(self, status: Callable[[str], None] = None) -> Tuple[Path, Dict]:
+        """
+        更换一张壁纸（按轮换模式从网络获取新壁纸或从缓存轮换）
+
+        Args:
+            status: 可选的进度回调
+
+        Returns:
+            (本地路径, 图片信息)
+
+        Raises:
+            WallpaperChangeError: 任一步骤失败
+        """
+        status = status or (lambda message: None)
+        mode = self.config.get_rotation_mode()
+        names = [path.name for path in self.downloader.get_cached_wallpapers(include_cold=True)]
+
+        unseen = self.shuffle.has_unseen(names)
+        if mode == 'offline_first' and names and not unseen:
+            # 缓存已全部显示过：这次获取新壁纸，同时开始新一轮，之后继续先轮换缓存
+            self.shuffle.reshuffle(names)
+
+        if mode == 'offline' or (mode == 'offline_first' and unseen):
+            result = self.change_from_cache(names, status)
+            if result is not None:
+                return result
+            if mode == 'offline':
+                raise WallpaperChangeError("缓存中没有壁纸", "离线模式",
+                                           "离线模式下只使用缓存壁纸，请先联网预下载一些壁纸。")
+
+        online = bool(self.apis) and self.connectivity.is_online(
+            api.base_url for api in self.apis.values())
+        if online or not names:
+            try:
+                return self.change_online(status)
+            except WallpaperChangeError:
+                # 网络或 API 不可用时改用缓存，缓存也没有时才报告错误
+                self.connectivity.invalidate()
+                result = self.change_from_cache(names, status)
+                if result is None:
+                    raise
+                return result
+
+        return self.change_from_cache(names, status) or self.change_online(status)
+
+    def change_online(self, status: Callable[[str], None] = None) -> Tuple[Path, Dict]:
+        """获取、下载并设置一张新壁纸（前台优先级，期间暂停后台下载）"""
+        with self.downloads.foreground():
+            _, image = self.fetch_image(status)
+            local_path = self.downloads.download(image['url'], image)
+        if not local_path:
+            raise WallpaperChangeError("下载壁纸失败", "下载失败", "壁纸下载失败，请重试。")
+        self.connectivity.report(True)
+
+        if not self.apply(local_path):
+            raise WallpaperChangeError("设置壁纸失败", "设置失败", "壁纸设置失败。")
+
+        self.shuffle.mark_shown(local_path.name)
+        return local_path, image
+
+    def change_from_cache(self, names: List[str] = None,
+                          status: Callable[[str], None] = None) -> Optional[Tuple[Path, Dict]]:
+        """
+        从缓存中按洗牌顺序取一张壁纸并设置（不访问网络）
+
+        Returns:
+            (本地路径, 图片信息)，缓存为空时返回 None
+        """
+        status = status or (lambda message: None)
+        if names is None:
+            names = [path.name for path in
+                     self.downloader.get_cached_wallpapers(include_cold=True)]
+
+        current = self.history.current() if self.history is not None else None
+        exclude = [Path(current).name] if current else []
+        while True:
+            name = self.shuffle.draw(names, exclude=exclude)
+            if name is None:
+                return None
+            # 冷缓存中的图片先还原；还原失败（文件已被清理）时换一张
+            local_path = self.downloader.restore(name)
+            if local_path is not None:
+                break
+            names = [n for n in names if n != name]
+
+        status("正在从缓存中更换壁纸...")
+        if not self.apply(local_path):
+            raise WallpaperChangeError("设置壁纸失败", "设置失败", "壁纸设置失败。")
+
+        self.downloader.touch(local_path)
+        metrics.inc('cache_rotation_total')
+        return local_path, self.downloader.get_metadata(local_path) or {}
+
+    def prefetch(self, count: int = 3, status: Callable[[str], None] = None) -> int:
+        """
+        预下载若干张壁纸到缓存（后台优先级：按配置限速，前台更换时暂停）
+
+        Returns:
+            成功下载的数量
+        """
+        status = status or (lambda message: None)
+        if not self.apis:
+            return 0
+
+        _, images = self._fetch_from_best_source(count, status)
+        if not images:
+            raise WallpaperChangeError("获取壁纸失败", "获取失败",
+                                       f"无法从 {'、'.join(self.apis)} 获取壁纸。")
+
+        status(f"正在下载 {len(images)} 张壁纸...")
+
+        results = self.downloads.download_many(images)
+        # 顺带把长期未使用的图片移入冷缓存（后台线程，低优先级子进程）
+        self.downloader.start_demotion()
+        return sum(1 for path in results if path)
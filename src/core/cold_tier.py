@@ -0,0 +1,208 @@
+"""
+冷缓存层
+长时间未使用的缓存图片用 Pillow 重新压缩（WebP/AVIF，或较低质量的 JPEG）后移入 cold/，
+需要时再解码还原到热缓存
+
+- 冷文件名为 <热文件名>.<冷格式扩展名>，如 abc.jpg.webp，元数据仍按热文件名保存；
+- 压缩在低优先级的子进程中进行，不占用界面和下载线程；
+- 冷缓存有独立的大小上限，超出时删除最久未使用的冷文件。
+"""
+
+import os
+import platform
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.cache_index import CacheEntry, CacheIndex
+
+COLD_DIR = 'cold'
+
+# 冷格式 → (Pillow 格式名, 扩展名)
+COLD_FORMATS = {
+    'webp': ('WEBP', '.webp'),
+    'avif': ('AVIF', '.avif'),
+    'jpeg': ('JPEG', '.jpg'),
+}
+
+# 还原时按热文件扩展名选择的格式
+_RESTORE_FORMATS = {
+    '.jpg': ('JPEG', {'quality': 95}),
+    '.jpeg': ('JPEG', {'quality': 95}),
+    '.png': ('PNG', {}),
+    '.webp': ('WEBP', {'quality': 95}),
+}
+
+
+def _lower_priority():
+    """子进程初始化：降低调度优先级"""
+    try:
+        if platform.system() == 'Windows':
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(10)
+    except (OSError, AttributeError):
+        pass
+
+
+def recompress(src: str, dst: str, fmt: str, quality: int) -> int:
+    """
+    重新压缩一张图片（在子进程中运行）
+
+    目标格式不可用时（如 Pillow 未编译 AVIF 支持）改用 JPEG。
+
+    Returns:
+        压缩后的字节数，失败返回 0
+    """
+    from PIL import Image
+
+    pil_format, _ = COLD_FORMATS.get(fmt, COLD_FORMATS['webp'])
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    try:
+        with Image.open(src) as img:
+            img = img.convert('RGB')
+            try:
+                img.save(tmp, pil_format, quality=quality)
+            except (KeyError, OSError, ValueError):
+                img.save(tmp, 'JPEG', quality=quality, optimize=True)
+        os.replace(tmp, dst)
+        return os.path.getsize(dst)
+    except Exception as e:
+        print(f"Error recompressing {src}: {e}")
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return 0
+
+
+def restore_image(src: str, file, ext: str):
+    """把冷文件解码并按热文件扩展名重新编码写入 file"""
+    from PIL import Image
+
+    pil_format, options = _RESTORE_FORMATS.get(ext.lower(), _RESTORE_FORMATS['.jpg'])
+    with Image.open(src) as img:
+        if pil_format == 'JPEG':
+            img = img.convert('RGB')
+        img.save(file, pil_format, **options)
+
+
+def pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ColdTier:
+    """冷缓存层"""
+
+    def __init__(self, cache_dir, fmt: str = 'webp', quality: int = 80,
+                 max_size_mb: int = 200):
+        """
+        Args:
+            cache_dir: 热缓存目录（冷缓存位于其下的 cold/）
+            fmt: 冷格式（webp/avif/jpeg）
+            quality: 压缩质量
+            max_size_mb: 冷缓存大小上限（MB）
+        """
+        self.dir = Path(cache_dir) / COLD_DIR
+        self.fmt = fmt if fmt in COLD_FORMATS else 'webp'
+        self.quality = quality
+        self.max_size_mb = max_size_mb
+        self.index = CacheIndex(self.dir, extensions=[ext for _, ext in COLD_FORMATS.values()])
+
+    @property
+    def suffix(self) -> str:
+        return COLD_FORMATS[self.fmt][1]
+
+    @staticmethod
+    def hot_name(cold_name: str) -> str:
+        """冷文件名 → 热文件名"""
+        return os.path.splitext(cold_name)[0]
+
+    def find(self, hot_name: str) -> Optional[CacheEntry]:
+        """查找热文件对应的冷文件（任意冷格式）"""
+        for _, ext in COLD_FORMATS.values():
+            entry = self.index.get(hot_name + ext)
+            if entry is not None:
+                return entry
+        return None
+
+    def names(self) -> List[str]:
+        """冷缓存中图片的热文件名"""
+        return [self.hot_name(e.name) for e in self.index.entries()]
+
+    def total_size(self) -> int:
+        return self.index.total_size()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def demote(self, sources: List[Path], workers: int = 1,
+               cancel: threading.Event = None) -> Dict[Path, Tuple[Path, int]]:
+        """
+        在低优先级子进程中重新压缩
+
+        Args:
+            sources: 热缓存文件
+            workers: 子进程数
+            cancel: 置位后不再开始新的压缩（正在压缩的文件完成后返回）
+
+        Returns:
+            {热文件: (冷文件, 冷文件大小)}，只包含成功且确实变小的文件
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        targets = {src: self.dir / (src.name + self.suffix) for src in sources}
+        results = {}
+        cancelled = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_lower_priority) as pool:
+            futures = {src: pool.submit(recompress, str(src), str(dst), self.fmt, self.quality)
+                       for src, dst in targets.items()}
+            for src, future in futures.items():
+                dst = targets[src]
+                if cancel is not None and cancel.is_set():
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    cancelled.append(dst)
+                    continue
+                size = future.result()
+                try:
+                    original = src.stat().st_size
+                except OSError:
+                    original = 0
+                if size and size < original:
+                    results[src] = (dst, size)
+                elif size:
+                    # 没有变小（已经是高压缩率的图片），保留原文件
+                    dst.unlink(missing_ok=True)
+        # 取消时已在压缩的文件可能在退出 with 时才完成
+        for dst in cancelled:
+            dst.unlink(missing_ok=True)
+        return results
+
+    def add(self, cold_path: Path):
+        self.index.add(cold_path)
+
+    def remove(self, cold_name: str):
+        """删除冷文件"""
+        self.index.remove(cold_name)
+        (self.dir / cold_name).unlink(missing_ok=True)
+
+    def over_budget(self) -> List[CacheEntry]:
+        """超出大小上限时需要删除的冷文件（最久未使用的在前）"""
+        budget = self.max_size_mb * 1024 * 1024
+        excess = self.index.total_size() - budget
+        if excess <= 0:
+            return []
+        victims = []
+        for entry in sorted(self.index.entries(), key=lambda e: e.atime):
+            if excess <= 0:
+                break
+            victims.append(entry)
+            excess -= entry.size
+        return victims
@@ -0,0 +1,224 @@
+"""
+应用组件装配
+创建配置、下载器、API 客户端、设置器、历史、更换流程和调度器，并订阅配置变更
+
+不依赖 Qt，界面和无界面（命令行/守护进程）模式共用。
+"""
+
+from pathlib import Path
+
+from models.config import Config
+from core.wallpaper_api import UnsplashAPI, WallhavenAPI
+from core.wallpaper_downloader import WallpaperDownloader
+from core.history import WallpaperHistory
+from core.changer import WallpaperChanger
+from core.download_scheduler import DownloadScheduler
+from core.shuffle_bag import ShuffleBag
+from core.response_cache import ResponseCache
+from core.scheduler import WallpaperScheduler
+from utils.memory import MemoryManager
+from utils.metrics import metrics
+
+
+def default_base_dir() -> Path:
+    """默认数据目录（项目根目录）"""
+    return Path(__file__).parent.parent.parent
+
+
+def create_setter(backend_name: str = 'auto'):
+    """创建壁纸设置器，没有可用后端时返回 None"""
+    from core.setter_backends import create_backend
+    from core.wallpaper_setter import WallpaperSetter
+
+    backend = create_backend(backend_name)
+    if backend is None:
+        return None
+    return WallpaperSetter(backend)
+
+
+class AppComponents:
+    """应用组件"""
+
+    def __init__(self, config_path: str = "config.json", base_dir: str = None,
+                 setter=None):
+        """
+        Args:
+            config_path: 配置文件路径
+            base_dir: 数据目录（缓存、历史），默认项目根目录
+            setter: 壁纸设置器，默认按配置的后端创建
+        """
+        self.base_dir = Path(base_dir) if base_dir else default_base_dir()
+
+        # 配置
+        self.config = Config(config_path)
+
+        # 性能指标
+        metrics.configure(self.config.is_metrics_enabled(),
+                          self.config.get_metrics_export_path())
+
+        # 下载器
+        cache_dir = self.base_dir / "cache"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        cold = self.config.get_cold_cache_settings()
+        self.downloader = WallpaperDownloader(
+            cache_dir=str(cache_dir),
+            max_size_mb=self.config.get_cache_max_size(),
+            max_images=self.config.get_cache_max_images(),
+            max_image_mb=self.config.get_cache_max_image_size(),
+            cold_after_days=cold['after_days'],
+            cold_max_size_mb=cold['max_size_mb'],
+            cold_format=cold['format'],
+            cold_quality=cold['quality'],
+            revalidate_after_days=self.config.get_cache_revalidate_days()
+        )
+
+        # 下载调度（后台预下载限速，前台下载优先）
+        self.downloads = DownloadScheduler(
+            self.downloader,
+            background_rate=self.config.get_background_limit_kbps() * 1024
+        )
+
+        # API（搜索结果缓存在各数据源之间共享并持久化）
+        self.api_cache = ResponseCache(self.base_dir / "api_cache.json",
+                                       max_age=self.config.get_api_cache_max_age())
+        self.apis = {}
+        self.sync_apis()
+
+        # 设置器
+        self.setter = (setter if setter is not None
+                       else create_setter(self.config.get_setter_backend()))
+
+        # 壁纸历史（首次访问时才从磁盘加载）
+        self.history = WallpaperHistory(
+            self.base_dir / "history.jsonl",
+            capacity=self.config.get_history_max_entries(),
+            downloader=self.downloader
+        )
+
+        # 更换流程
+        self.changer = WallpaperChanger(
+            self.config, self.downloader, self.apis, self.setter, self.history,
+            shuffle=ShuffleBag(self.base_dir / "shuffle.json"),
+            downloads=self.downloads
+        )
+
+        # 调度器
+        self.scheduler = WallpaperScheduler()
+        self.apply_schedule()
+        self.apply_prewarm()
+
+        # 常驻内存上限（由界面或守护进程的循环调用 poll）
+        self.memory = MemoryManager(
+            ceiling_mb=self.config.get_memory_ceiling_mb(),
+            interval=self.config.get_memory_check_interval(),
+            trace_frames=self.config.get_tracemalloc_frames()
+        )
+        self.memory.register('metadata', self.downloader.release_memory)
+
+        # 各组件只订阅自己关心的配置键，变更时原地更新
+        self.config.subscribe(['cache'], self._on_cache_config_changed)
+        self.config.subscribe(['download'], self._on_download_config_changed)
+        self.config.subscribe(['api_keys'], self._on_api_keys_changed)
+        self.config.subscribe(['history'], self._on_history_config_changed)
+        self.config.subscribe(['metrics'], self._on_metrics_config_changed)
+        self.config.subscribe(['memory'], self._on_memory_config_changed)
+        self.config.subscribe(
+            ['update_frequency', 'update_time', 'interval_hours'],
+            self._on_schedule_config_changed
+        )
+        self.config.subscribe(['prewarm'], self._on_prewarm_config_changed)
+
+    def close(self):
+        """停止调度和后台任务（退出前调用）"""
+        if self.scheduler.running:
+            self.scheduler.stop()
+        self.changer.close()
+        self.downloader.stop_demotion()
+
+    def sync_apis(self):
+        """根据配置的 API 密钥创建、更新或移除 API 客户端（原地修改 self.apis）"""
+        unsplash_key = self.config.get_api_key('unsplash')
+        wallhaven_key = self.config.get_api_key('wallhaven')
+
+        if unsplash_key:
+            if 'unsplash' in self.apis:
+                self.apis['unsplash'].set_access_key(unsplash_key)
+            else:
+                self.apis['unsplash'] = UnsplashAPI(unsplash_key)
+                self.apis['unsplash'].response_cache = self.api_cache
+        else:
+            self.apis.pop('unsplash', None)
+
+        if wallhaven_key:
+            if 'wallhaven' in self.apis:
+                self.apis['wallhaven'].set_api_key(wallhaven_key)
+            else:
+                self.apis['wallhaven'] = WallhavenAPI(wallhaven_key)
+                self.apis['wallhaven'].response_cache = self.api_cache
+        else:
+            self.apis.pop('wallhaven', None)
+
+    def apply_schedule(self):
+        """按配置设置调度"""
+        freq = self.config.get_update_frequency()
+        if freq == 'daily':
+            self.scheduler.schedule_daily(self.config.get_update_time())
+        else:
+            self.scheduler.schedule_hourly(self.config.get_interval_hours())
+
+    def apply_prewarm(self):
+        """按配置设置定时更换前的预热"""
+        if self.config.is_prewarm_enabled():
+            self.scheduler.set_prewarm_callback(self._prewarm,
+                                                self.config.get_prewarm_lead_seconds())
+        else:
+            self.scheduler.set_prewarm_callback(None)
+
+    def _prewarm(self):
+        """预热网络连接（调度器在后台线程中调用）"""
+        self.changer.prewarm(fetch_metadata=self.config.is_prewarm_metadata_enabled())
+
+    def _on_cache_config_changed(self, changes: dict):
+        """缓存配置变更"""
+        self.downloader.set_limits(
+            max_size_mb=self.config.get_cache_max_size(),
+            max_images=self.config.get_cache_max_images(),
+            max_image_mb=self.config.get_cache_max_image_size()
+        )
+        cold = self.config.get_cold_cache_settings()
+        self.downloader.set_cold_limits(cold['after_days'], cold['max_size_mb'],
+                                        fmt=cold['format'], quality=cold['quality'])
+        self.downloader.set_revalidate_after(self.config.get_cache_revalidate_days())
+        self.api_cache.max_age = self.config.get_api_cache_max_age()
+
+    def _on_download_config_changed(self, changes: dict):
+        """下载配置变更"""
+        self.downloads.set_background_rate(self.config.get_background_limit_kbps() * 1024)
+
+    def _on_history_config_changed(self, changes: dict):
+        """历史配置变更"""
+        self.history.set_capacity(self.config.get_history_max_entries())
+
+    def _on_metrics_config_changed(self, changes: dict):
+        """指标配置变更"""
+        metrics.configure(self.config.is_metrics_enabled(),
+                          self.config.get_metrics_export_path())
+
+    def _on_memory_config_changed(self, changes: dict):
+        """内存配置变更"""
+        self.memory.ceiling_mb = self.config.get_memory_ceiling_mb()
+        self.memory.interval = self.config.get_memory_check_interval()
+        self.memory.set_tracing(self.config.get_tracemalloc_frames())
+
+    def _on_api_keys_changed(self, changes: dict):
+        """API 密钥变更"""
+        self.sync_apis()
+
+    def _on_schedule_config_changed(self, changes: dict):
+        """调度配置变更"""
+        self.apply_schedule()
+
+    def _on_prewarm_config_changed(self, changes: dict):
+        """预热配置变更"""
+        self.apply_prewarm()
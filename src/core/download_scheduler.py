@@ -0,0 +1,137 @@
+"""
+下载调度
+前台下载（用户操作、定时更换）优先；后台预下载限速，并在有前台下载时暂停
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils.metrics import metrics
+
+FOREGROUND = 'foreground'
+BACKGROUND = 'background'
+
+# 后台下载单次最长暂停时间（秒）；超过后继续，避免与前台等待同一文件时互相等待
+MAX_PAUSE = 10.0
+
+
+class TokenBucket:
+    """
+    令牌桶限速（字节/秒）
+
+    允许欠账：一次取出超过余额的字节时，按欠下的量睡眠，平均速率不超过 rate。
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None):
+        """
+        Args:
+            rate: 速率上限（字节/秒），None 或 0 表示不限
+            burst: 桶容量（字节），默认为一秒的量
+        """
+        self._lock = threading.Lock()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: Optional[float], burst: Optional[float] = None):
+        """修改速率（运行中可调用）"""
+        with self._lock:
+            self.rate = rate or None
+            self.burst = burst or (rate or 0)
+            self._tokens = self.burst
+            self._updated = time.monotonic()
+
+    def consume(self, n: int):
+        """取出 n 个字节的令牌，余额不足时阻塞"""
+        with self._lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class DownloadScheduler:
+    """下载调度器（包装 WallpaperDownloader）"""
+
+    def __init__(self, downloader, background_rate: Optional[float] = None,
+                 background_workers: int = 2):
+        """
+        Args:
+            downloader: WallpaperDownloader 实例
+            background_rate: 后台下载总带宽上限（字节/秒），None 表示不限
+            background_workers: 后台并发下载数
+        """
+        self.downloader = downloader
+        self.background_workers = background_workers
+        self.bucket = TokenBucket(background_rate)
+        self._lock = threading.Lock()
+        self._foreground = 0
+        # 没有前台下载时置位；后台下载在每个数据块之间等待它
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def set_background_rate(self, rate: Optional[float]):
+        """修改后台带宽上限（字节/秒）"""
+        self.bucket.set_rate(rate)
+
+    @property
+    def foreground_active(self) -> bool:
+        return not self._idle.is_set()
+
+    @contextmanager
+    def foreground(self):
+        """前台操作期间（含获取图片信息）暂停后台下载"""
+        with self._lock:
+            self._foreground += 1
+            self._idle.clear()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._foreground -= 1
+                if self._foreground == 0:
+                    self._idle.set()
+
+    def _throttle_background(self, n: int):
+        """后台下载的数据块回调：前台下载进行中时暂停，然后按令牌桶限速"""
+        if not self._idle.is_set():
+            metrics.inc('background_download_pauses_total')
+            with metrics.timer('background_download_paused_seconds'):
+                self._idle.wait(MAX_PAUSE)
+        if n:
+            self.bucket.consume(n)
+
+    def download(self, url: str, info: Dict = None,
+                 priority: str = FOREGROUND) -> Optional[Path]:
+        """
+        下载一张壁纸
+
+        Args:
+            url: 图片 URL
+            info: 图片信息
+            priority: FOREGROUND 或 BACKGROUND
+        """
+        if priority == FOREGROUND:
+            with self.foreground():
+                return self.downloader.download(url, info)
+        return self.downloader.download(url, info, throttle=self._throttle_background)
+
+    def download_many(self, images: List[Dict],
+                      priority: str = BACKGROUND) -> List[Optional[Path]]:
+        """
+        下载多张壁纸（默认为后台优先级）
+
+        Returns:
+            与输入顺序对应的本地路径列表，失败项为 None
+        """
+        if priority == FOREGROUND:
+            with self.foreground():
+                return self.downloader.download_many(images)
+        return self.downloader.download_many(images, max_workers=self.background_workers,
+                                             throttle=self._throttle_background)
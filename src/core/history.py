@@ -0,0 +1,222 @@
+"""
+壁纸历史记录
+固定容量环形缓冲 + 游标，支持 O(1) 后退/前进，追加写日志持久化
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+# 在缓存中固定游标前后各多少条历史（更远的条目可能被淘汰或移入冷缓存）
+PIN_WINDOW = 3
+
+
+class WallpaperHistory:
+    """壁纸历史"""
+
+    def __init__(self, log_path: str, capacity: int = 50, downloader=None,
+                 pin_window: int = PIN_WINDOW):
+        """
+        Args:
+            log_path: 历史日志文件路径（JSONL，追加写）
+            capacity: 最大条目数
+            downloader: 可选的 WallpaperDownloader，用于在缓存中固定游标附近的历史条目
+            pin_window: 固定游标前后各多少条（固定的文件不受缓存上限约束，应远小于缓存容量）
+        """
+        self.log_path = Path(log_path)
+        self.capacity = max(1, capacity)
+        self.downloader = downloader
+        self.pin_window = max(0, pin_window)
+        # 当前在下载器中固定的条目（引用计数）
+        self._pinned: Counter = Counter()
+
+        self._items: List[Optional[str]] = [None] * self.capacity
+        self._start = 0      # 最旧条目在环形缓冲中的位置
+        self._size = 0       # 条目数
+        self._cursor = -1    # 当前条目的逻辑下标
+        self._log_lines = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    # ---------- 环形缓冲 ----------
+
+    def _get(self, index: int) -> str:
+        """按逻辑下标读取条目"""
+        return self._items[(self._start + index) % self.capacity]
+
+    def _push(self, path: str):
+        """追加条目：丢弃游标之后的前进记录，满时覆盖最旧条目"""
+        # 丢弃前进记录（与浏览器历史一致）
+        self._size = self._cursor + 1
+
+        if self._size == self.capacity:
+            self._start = (self._start + 1) % self.capacity
+            self._size -= 1
+
+        self._items[(self._start + self._size) % self.capacity] = path
+        self._size += 1
+        self._cursor = self._size - 1
+
+    def _update_pins(self):
+        """只固定游标前后 pin_window 条，移出窗口的条目取消固定"""
+        if self.downloader is None:
+            return
+        wanted = Counter(self._get(i) for i in
+                         range(max(0, self._cursor - self.pin_window),
+                               min(self._size, self._cursor + self.pin_window + 1)))
+        added, removed = wanted - self._pinned, self._pinned - wanted
+        if not added and not removed:
+            return
+        with self.downloader.pin_batch():
+            for path in removed.elements():
+                self.downloader.unpin(path)
+            for path in added.elements():
+                self.downloader.pin(path)
+        self._pinned = wanted
+
+    # ---------- 持久化 ----------
+
+    def _ensure_loaded(self):
+        """首次访问时回放日志"""
+        if self._loaded:
+            return
+        self._loaded = True
+
+        if not self.log_path.exists():
+            return
+
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._log_lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 崩溃时可能留下半行，忽略
+                        continue
+                    if record.get('op') == 'push':
+                        self._push(record['path'])
+                    elif record.get('op') == 'cursor' and self._size:
+                        self._cursor = min(max(0, record['index']), self._size - 1)
+        except Exception as e:
+            print(f"Error loading history: {e}")
+        self._update_pins()
+
+        if self._log_lines > self.capacity * 4:
+            self._compact()
+
+    def _append_log(self, record: dict):
+        """追加一条日志"""
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._log_lines += 1
+        except Exception as e:
+            print(f"Error writing history: {e}")
+
+        if self._log_lines > self.capacity * 4:
+            self._compact()
+
+    def _compact(self):
+        """用当前状态重写日志，防止无限增长"""
+        tmp_path = self.log_path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for i in range(self._size):
+                    f.write(json.dumps({'op': 'push', 'path': self._get(i)},
+                                       ensure_ascii=False) + '\n')
+                f.write(json.dumps({'op': 'cursor', 'index': self._cursor}) + '\n')
+            os.replace(tmp_path, self.log_path)
+            self._log_lines = self._size + 1
+        except Exception as e:
+            print(f"Error compacting history: {e}")
+
+    # ---------- 公共接口 ----------
+
+    def push(self, path: str):
+        """记录新应用的壁纸"""
+        path = str(path)
+        with self._lock:
+            self._ensure_loaded()
+            self._push(path)
+            self._update_pins()
+            self._append_log({'op': 'push', 'path': path, 'time': time.time()})
+
+    def current(self) -> Optional[str]:
+        """当前壁纸"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._get(self._cursor) if self._size else None
+
+    def peek(self, offset: int) -> Optional[str]:
+        """相对当前条目偏移 offset 的条目（不移动游标），超出范围时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            index = self._cursor + offset
+            return self._get(index) if self._size and 0 <= index < self._size else None
+
+    def peek_back(self) -> Optional[str]:
+        """上一条（不移动游标）"""
+        return self.peek(-1)
+
+    def peek_forward(self) -> Optional[str]:
+        """下一条（不移动游标）"""
+        return self.peek(1)
+
+    def move(self, offset: int) -> Optional[str]:
+        """游标移动 offset 步，返回新的当前条目；超出范围时不移动并返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            index = self._cursor + offset
+            if not offset or not 0 <= index < self._size:
+                return None
+            self._cursor = index
+            self._update_pins()
+            self._append_log({'op': 'cursor', 'index': self._cursor})
+            return self._get(self._cursor)
+
+    def back(self) -> Optional[str]:
+        """游标后退一步，返回新的当前条目"""
+        return self.move(-1)
+
+    def forward(self) -> Optional[str]:
+        """游标前进一步，返回新的当前条目"""
+        return self.move(1)
+
+    def entries(self) -> List[str]:
+        """所有条目（从旧到新）"""
+        with self._lock:
+            self._ensure_loaded()
+            return [self._get(i) for i in range(self._size)]
+
+    def set_capacity(self, capacity: int):
+        """调整容量（保留最新的条目）"""
+        capacity = max(1, capacity)
+        with self._lock:
+            self._ensure_loaded()
+            if capacity == self.capacity:
+                return
+
+            entries = [self._get(i) for i in range(self._size)]
+            cursor = self._cursor
+            dropped = max(0, len(entries) - capacity)
+
+            self.capacity = capacity
+            self._items = [None] * capacity
+            kept = entries[dropped:]
+            self._items[:len(kept)] = kept
+            self._start = 0
+            self._size = len(kept)
+            self._cursor = max(0, cursor - dropped) if self._size else -1
+            self._update_pins()
+            self._compact()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return self._size
@@ -0,0 +1,138 @@
+"""
+流式写入
+下载的每个数据块只经过一次：写入文件的同时计算 SHA-256，并从文件头识别图片格式和尺寸，
+最后一块到达时按容器格式的结束标记判断文件是否被截断，写入后不再回读文件
+
+不解码像素：Pillow 的增量解码器（ImageFile.Parser）识别出文件头后会按图片尺寸分配整张位图，
+这与常驻内存上限相冲突；截断改由文件结束标记和 Content-Length 判断。
+"""
+
+import hashlib
+import io
+import os
+import struct
+from typing import Dict, Optional
+
+# 每次从响应中读取的块大小
+CHUNK_SIZE = 256 * 1024
+# 文件头超过该长度仍无法识别时放弃识别
+HEADER_LIMIT = 1024 * 1024
+# 检查结束标记时保留的尾部长度
+TAIL_SIZE = 64
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_PNG_END = b'IEND\xaeB`\x82'
+
+
+def _pillow_open():
+    """Pillow 的 Image.open，未安装时返回 None"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image.open
+
+
+class IngestError(ValueError):
+    """下载内容不是完整的图片"""
+
+
+class StreamIngest:
+    """单次流式写入（包装下载租约的文件对象）"""
+
+    def __init__(self, file, expected: Optional[int] = None):
+        """
+        Args:
+            file: 以二进制写入方式打开的文件
+            expected: Content-Length（已知时预分配文件空间）
+        """
+        self.file = file
+        self.expected = expected
+        self.size = 0
+        self.format: Optional[str] = None
+        self.width: Optional[int] = None
+        self.height: Optional[int] = None
+        self._hasher = hashlib.sha256()
+        self._open = _pillow_open()
+        self._head: Optional[bytearray] = bytearray() if self._open is not None else None
+        self._magic = b''
+        self._tail = b''
+        # 去掉尾部零字节填充后的结尾
+        self._end = b''
+        if expected:
+            self._preallocate(expected)
+
+    def _preallocate(self, size: int):
+        """预分配文件空间，减少碎片（文件系统不支持时跳过）"""
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(self.file.fileno(), 0, size)
+            else:
+                self.file.truncate(size)
+        except (OSError, AttributeError, ValueError):
+            pass
+
+    def feed(self, chunk: bytes):
+        """写入一个数据块"""
+        self.file.write(chunk)
+        self._hasher.update(chunk)
+        self.size += len(chunk)
+        if len(self._magic) < 16:
+            self._magic += chunk[:16 - len(self._magic)]
+        stripped = chunk.rstrip(b'\x00')
+        if stripped:
+            self._end = (self._tail + stripped[-TAIL_SIZE:])[-TAIL_SIZE:]
+        self._tail = (self._tail + chunk[-TAIL_SIZE:])[-TAIL_SIZE:]
+        if self._head is not None:
+            self._identify(chunk)
+
+    def _identify(self, chunk: bytes):
+        """文件头足够时识别格式和尺寸（只解析文件头，不解码像素）"""
+        self._head += chunk
+        try:
+            with self._open(io.BytesIO(self._head)) as img:
+                self.format = img.format
+                self.width, self.height = img.size
+        except Exception:
+            if len(self._head) < HEADER_LIMIT:
+                return
+        self._head = None
+
+    @property
+    def sha256(self) -> str:
+        return self._hasher.hexdigest()
+
+    def truncated(self) -> bool:
+        """内容短于 Content-Length，或缺少容器格式的结束标记"""
+        if self.expected and self.size < self.expected:
+            return True
+        magic, tail = self._magic, self._tail
+        if magic.startswith(b'\xff\xd8'):
+            # JPEG 以 EOI 结尾（部分服务器会在其后填充零字节）
+            return not self._end.endswith(b'\xff\xd9')
+        if magic.startswith(_PNG_SIGNATURE):
+            return not tail.endswith(_PNG_END)
+        if magic.startswith(b'GIF8'):
+            return not tail.endswith(b';')
+        if magic.startswith(b'RIFF') and magic[8:12] == b'WEBP':
+            return struct.unpack('<I', magic[4:8])[0] + 8 > self.size
+        return False
+
+    def finish(self) -> Dict:
+        """
+        最后一个数据块写入后调用：截去预分配的多余空间并检查完整性
+
+        Returns:
+            写入元数据的字段（sha256、bytes，识别出时还有 format、width、height）
+
+        Raises:
+            IngestError: 图片被截断
+        """
+        if self.expected and self.expected != self.size:
+            self.file.truncate(self.size)
+        if self.truncated():
+            raise IngestError(f"truncated image ({self.size} bytes)")
+        result = {'sha256': self.sha256, 'bytes': self.size}
+        if self.format is not None:
+            result.update(format=self.format, width=self.width, height=self.height)
+        return result
@@ -0,0 +1,254 @@
+"""
+图片元数据存储
+所有缓存图片的元数据保存在一个追加写的 JSONL 日志中（取代每张图片一个 .json 文件）
+
+- 加载时一次读取整个日志，之后只读取其他进程追加的新行；
+- 写入整行追加，多条写入可合并为一次；
+- 日志中失效的行超过一定比例时压缩重写；
+- 首次使用时把旧的 .json 元数据文件迁移进来。
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from utils.file_lock import FileLock
+
+METADATA_FILE = 'metadata.jsonl'
+LOCK_FILE = '.metadata.lock'
+
+# 读取时最多每隔该时间检查一次其他进程追加的内容（秒）
+REFRESH_INTERVAL = 0.5
+# 日志行数超过 max(该值, 2 × 条目数) 时压缩
+COMPACT_MIN_LINES = 256
+
+
+class MetadataStore:
+    """图片元数据存储（文件名 → 元数据）"""
+
+    def __init__(self, cache_dir, exclude: Iterable[str] = ()):
+        """
+        Args:
+            cache_dir: 缓存目录
+            exclude: 迁移旧元数据时跳过的 .json 文件名（如缓存索引文件）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.path = self.cache_dir / METADATA_FILE
+        self.exclude = set(exclude)
+        self._items: Dict[str, Dict] = {}
+        self._lines = 0
+        self._offset = 0
+        self._inode = None
+        self._loaded = False
+        self._checked = 0.0
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(self.cache_dir / LOCK_FILE)
+        self._batch_depth = 0
+        self._pending: List[Dict] = []
+
+    # ---------- 加载 ----------
+
+    def _ensure_loaded(self):
+        """首次访问时加载（必要时迁移旧文件），之后定期读取新追加的行"""
+        now = time.monotonic()
+        if self._loaded and now - self._checked < REFRESH_INTERVAL:
+            return
+        self._checked = now
+
+        if not self._loaded:
+            self._loaded = True
+            if not self.path.exists():
+                self._migrate_sidecars()
+        self._refresh()
+
+    def _refresh(self):
+        """读取日志中尚未读取的部分（被压缩替换时重新加载）"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._items = {}
+            self._lines = 0
+            self._offset = 0
+            self._inode = stat.st_ino
+        if stat.st_size == self._offset:
+            return
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+
+        # 只处理完整的行，末尾可能是其他进程正在写入的半行
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            self._lines += 1
+            try:
+                self._apply(json.loads(line))
+            except ValueError:
+                # 崩溃时可能留下损坏的行，忽略
+                continue
+        self._offset += end
+
+    def _apply(self, record: Dict):
+        if record.get('op') == 'put':
+            self._items[record['name']] = record['info']
+        elif record.get('op') == 'delete':
+            self._items.pop(record['name'], None)
+
+    def _migrate_sidecars(self):
+        """一次性迁移旧的 <图片>.json 元数据文件"""
+        with self._file_lock:
+            # 其他进程可能已经完成迁移
+            if not self.path.exists():
+                self._migrate_locked()
+
+    def _migrate_locked(self):
+        records = []
+        sidecars = []
+        for path in self.cache_dir.glob('*.json'):
+            if path.name in self.exclude:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+            except (OSError, ValueError):
+                continue
+            image = next((path.with_suffix(ext) for ext in ('.jpg', '.jpeg', '.png', '.webp')
+                          if path.with_suffix(ext).exists()), None)
+            if image is not None:
+                records.append({'op': 'put', 'name': image.name, 'info': info})
+            sidecars.append(path)
+
+        if not sidecars:
+            return
+
+        self._append_locked(records)
+        for path in sidecars:
+            path.unlink(missing_ok=True)
+        print(f"Migrated {len(records)} metadata file(s) into {self.path.name}")
+
+    # ---------- 写入 ----------
+
+    def _write(self, records: List[Dict]):
+        """在文件锁内追加多条记录（一次写入）"""
+        if not records:
+            return
+        with self._lock, self._file_lock:
+            self._append_locked(records)
+
+    def _append_locked(self, records: List[Dict]):
+        """追加记录（调用方持有文件锁）"""
+        data = ''.join(json.dumps(r, ensure_ascii=False, separators=(',', ':')) + '\n'
+                       for r in records).encode('utf-8')
+
+        # 先读入其他进程追加的内容，保持偏移与文件一致
+        self._refresh()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            self._offset = f.tell()
+        self._inode = os.stat(self.path).st_ino
+        for record in records:
+            self._apply(record)
+        self._lines += len(records)
+
+        if self._lines > max(COMPACT_MIN_LINES, 2 * len(self._items)):
+            self._compact()
+
+    def _compact(self):
+        """只保留有效条目重写日志（调用方持有文件锁）"""
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                for name, info in self._items.items():
+                    record = {'op': 'put', 'name': name, 'info': info}
+                    f.write(json.dumps(record, ensure_ascii=False,
+                                       separators=(',', ':')).encode('utf-8') + b'\n')
+                offset = f.tell()
+            os.replace(tmp_path, self.path)
+            self._offset = offset
+            self._inode = os.stat(self.path).st_ino
+            self._lines = len(self._items)
+        except OSError as e:
+            print(f"Error compacting metadata: {e}")
+
+    def _submit(self, records: List[Dict]):
+        with self._lock:
+            self._ensure_loaded()
+            if self._batch_depth:
+                self._pending.extend(records)
+                for record in records:
+                    self._apply(record)
+                return
+        self._write(records)
+
+    @contextmanager
+    def batch(self):
+        """合并多次写入，退出时一次追加"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._pending:
+                    records, self._pending = self._pending, []
+                    self._write(records)
+
+    def put(self, name: str, info: Dict):
+        """保存元数据"""
+        self._submit([{'op': 'put', 'name': name, 'info': info}])
+
+    def delete(self, name: str):
+        """删除元数据"""
+        self.delete_many([name])
+
+    def delete_many(self, names: Iterable[str]):
+        """批量删除元数据"""
+        with self._lock:
+            self._ensure_loaded()
+            records = [{'op': 'delete', 'name': name} for name in names if name in self._items]
+        self._submit(records)
+
+    # ---------- 读取 ----------
+
+    def get(self, name: str) -> Optional[Dict]:
+        """读取一张图片的元数据"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._items.get(name)
+
+    def get_many(self, names: Iterable[str]) -> Dict[str, Dict]:
+        """批量读取"""
+        with self._lock:
+            self._ensure_loaded()
+            return {name: self._items[name] for name in names if name in self._items}
+
+    def all(self) -> Dict[str, Dict]:
+        """全部元数据（副本）"""
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._items)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._items)
+
+    def release(self):
+        """丢弃内存中的副本，下次访问时从日志重新加载（有未写入的批量记录时不释放）"""
+        with self._lock:
+            if self._batch_depth or self._pending:
+                return
+            self._items = {}
+            self._lines = 0
+            self._offset = 0
+            self._inode = None
+            self._loaded = False
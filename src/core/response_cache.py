@@ -0,0 +1,117 @@
+"""
+API 响应缓存
+保存搜索接口的 JSON 响应及其 ETag/Last-Modified 验证器：新鲜期内直接使用，
+过期后带 If-None-Match/If-Modified-Since 重新验证，服务器返回 304 时只刷新时间
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+from utils.fs import write_json_atomic
+
+
+class ResponseCache:
+    """API 响应缓存"""
+
+    def __init__(self, path=None, max_age: float = 3600, max_entries: int = 100,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            path: 持久化文件路径，None 表示只保存在内存中
+            max_age: 新鲜期（秒），超过后需要重新验证
+            max_entries: 最多保存的响应数，超出时丢弃最久未验证的
+            clock: 时钟
+        """
+        self.path = Path(path) if path else None
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+    @staticmethod
+    def key(url: str, params: Dict = None) -> str:
+        """缓存键：URL 加排序后的查询参数"""
+        if not params:
+            return url
+        return f"{url}?{urlencode(sorted(params.items()))}"
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """首次访问时从磁盘加载（调用者持有锁）"""
+        if self._entries is None:
+            self._entries = {}
+            if self.path is not None and self.path.exists():
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._entries = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Error loading API cache: {e}")
+        return self._entries
+
+    def _save(self):
+        """写回磁盘（调用者持有锁）"""
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_json_atomic(self.path, self._entries)
+        except OSError as e:
+            print(f"Error saving API cache: {e}")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """缓存条目（body/etag/last_modified/validated），不存在时返回 None"""
+        with self._lock:
+            return self._load().get(key)
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return self.clock() - entry.get('validated', 0) < self.max_age
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """重新验证用的条件请求头（条目没有验证器时为空）"""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, key: str, body: Any, etag: str = None, last_modified: str = None):
+        """保存响应；没有验证器的响应只在新鲜期内使用"""
+        with self._lock:
+            entries = self._load()
+            entries.pop(key, None)
+            entries[key] = {
+                'body': body,
+                'etag': etag,
+                'last_modified': last_modified,
+                'validated': self.clock(),
+            }
+            if len(entries) > self.max_entries:
+                for old in sorted(entries, key=lambda k: entries[k]['validated'])[
+                        :len(entries) - self.max_entries]:
+                    del entries[old]
+            self._save()
+
+    def refresh(self, key: str, etag: str = None, last_modified: str = None):
+        """服务器返回 304：刷新验证时间（以及服务器给出的新验证器）"""
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None:
+                return
+            entry['validated'] = self.clock()
+            if etag:
+                entry['etag'] = etag
+            if last_modified:
+                entry['last_modified'] = last_modified
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save()
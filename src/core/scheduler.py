@@ -3,6 +3,7 @@
 """
 
 import schedule
+import threading
 import time
 from datetime import datetime
 from typing import Callable, Optional
@@ -14,11 +15,25 @@ class WallpaperScheduler:
     def __init__(self):
         self.running = False
         self.update_callback: Optional[Callable] = None
+        self.prewarm_callback: Optional[Callable] = None
+        self.prewarm_lead = 0.0
+        self._prewarmed_for: Optional[datetime] = None
 
     def set_update_callback(self, callback: Callable):
         """设置更新回调函数"""
         self.update_callback = callback
 
+    def set_prewarm_callback(self, callback: Optional[Callable], lead_seconds: float = 30.0):
+        """
+        设置预热回调：每次定时更新前 lead_seconds 秒在后台线程中调用一次
+
+        Args:
+            callback: 预热函数，None 表示不预热
+            lead_seconds: 提前的秒数
+        """
+        self.prewarm_callback = callback
+        self.prewarm_lead = lead_seconds if callback else 0.0
+
     def schedule_daily(self, time_str: str):
         """
         每天定时更新
@@ -83,13 +98,55 @@ class WallpaperScheduler:
         print("Running manual update")
         self._update()
 
-    def run(self):
-        """运行调度循环"""
+    def _maybe_prewarm(self):
+        """距下次任务不超过 prewarm_lead 秒且尚未为它预热时启动预热"""
+        if not self.prewarm_callback:
+            return
+        next_run = schedule.next_run()
+        idle = schedule.idle_seconds()
+        if next_run is None or next_run == self._prewarmed_for:
+            return
+        if idle is None or idle <= 0 or idle > self.prewarm_lead:
+            return
+        self._prewarmed_for = next_run
+        # 预热涉及网络请求，不阻塞调用方（界面事件循环）
+        threading.Thread(target=self._prewarm, name='prewarm', daemon=True).start()
+
+    def _prewarm(self):
+        try:
+            self.prewarm_callback()
+        except Exception as e:
+            print(f"Error in prewarm: {e}")
+
+    def run_pending(self):
+        """执行到期的任务（由外部事件循环周期调用）"""
+        if self.running:
+            self._maybe_prewarm()
+            schedule.run_pending()
+
+    def idle_seconds(self) -> Optional[float]:
+        """距下次任务的秒数，没有任务时返回 None"""
+        return schedule.idle_seconds()
+
+    def run(self, on_tick: Callable = None, max_sleep: float = 1.0):
+        """
+        运行调度循环
+
+        Args:
+            on_tick: 每轮循环调用的回调（如轮询配置文件）
+            max_sleep: 每轮最长休眠秒数
+        """
         self.start()
         try:
             while self.running:
-                schedule.run_pending()
-                time.sleep(1)
+                self.run_pending()
+                if on_tick:
+                    on_tick()
+                idle = schedule.idle_seconds()
+                if idle is not None and idle > self.prewarm_lead:
+                    # 在预热时刻醒来
+                    idle -= self.prewarm_lead
+                time.sleep(max(0.0, min(max_sleep, idle if idle is not None else max_sleep)))
         except KeyboardInterrupt:
             self.stop()
 
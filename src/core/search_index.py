@@ -0,0 +1,183 @@
+"""
+缓存图片全文检索
+基于 SQLite FTS5 索引描述、作者、来源、类别和标签，不访问网络
+
+SQLite 未编译 FTS5 时退化为普通表 + LIKE 查询（结果相同，只是没有相关度排序）。
+"""
+
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+SEARCH_DB_FILE = 'search.db'
+
+FIELDS = ('description', 'author', 'source', 'category', 'tags')
+
+# SQLite 页缓存上限（KB）
+CACHE_KB = 2048
+
+
+def _field_values(info: Dict) -> Tuple[str, ...]:
+    """从图片元数据中取出检索字段"""
+    tags = info.get('tags') or []
+    if isinstance(tags, (list, tuple)):
+        tags = ' '.join(str(t) for t in tags if t)
+    return (
+        str(info.get('description') or ''),
+        str(info.get('author') or ''),
+        str(info.get('source') or ''),
+        str(info.get('category') or ''),
+        str(tags),
+    )
+
+
+def _terms(query: str) -> List[str]:
+    """拆分查询词（去掉 FTS 语法字符）"""
+    return [t for t in re.split(r'[\s"\'*():^+\-]+', query) if t]
+
+
+class SearchIndex:
+    """缓存图片检索索引（文件名 → 检索字段）"""
+
+    def __init__(self, db_path, cache_kb: int = CACHE_KB):
+        """
+        Args:
+            db_path: 数据库路径
+            cache_kb: 页缓存上限（KB）
+        """
+        self.db_path = Path(db_path)
+        self.cache_kb = cache_kb
+        self._conn = None
+        self._lock = threading.Lock()
+        self.fts = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """首次使用时打开数据库"""
+        if self._conn is not None:
+            return self._conn
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=5.0, check_same_thread=False)
+        # WAL：多个进程可同时读，写入不阻塞读取
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_kb)}')
+
+        columns = ', '.join(FIELDS)
+        try:
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS images USING fts5("
+                         f"name UNINDEXED, {columns}, tokenize='unicode61')")
+            self.fts = True
+        except sqlite3.OperationalError:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS images_plain("
+                         f"name TEXT PRIMARY KEY, {columns})")
+            self.fts = False
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    @property
+    def _table(self) -> str:
+        return 'images' if self.fts else 'images_plain'
+
+    def add_many(self, items: Iterable[Tuple[str, Dict]]):
+        """批量添加或更新（文件名, 元数据）"""
+        with self._lock:
+            conn = self._connect()
+            rows = [(name,) + _field_values(info) for name, info in items]
+            if not rows:
+                return
+            placeholders = ', '.join('?' * (len(FIELDS) + 1))
+            with conn:
+                conn.executemany(f"DELETE FROM {self._table} WHERE name = ?",
+                                 [(row[0],) for row in rows])
+                conn.executemany(f"INSERT INTO {self._table} (name, {', '.join(FIELDS)}) "
+                                 f"VALUES ({placeholders})", rows)
+
+    def add(self, name: str, info: Dict):
+        """添加或更新一张图片"""
+        self.add_many([(name, info)])
+
+    def remove_many(self, names: Iterable[str]):
+        """批量移除"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(f"DELETE FROM {self._table} WHERE name = ?",
+                                 [(name,) for name in names])
+
+    def remove(self, name: str):
+        """移除一张图片"""
+        self.remove_many([name])
+
+    def names(self) -> List[str]:
+        """已索引的文件名"""
+        with self._lock:
+            conn = self._connect()
+            return [row[0] for row in conn.execute(f"SELECT name FROM {self._table}")]
+
+    def sync(self, metadata: Dict[str, Dict]) -> int:
+        """
+        与元数据存储对齐（补充缺失条目、移除多余条目）
+
+        Returns:
+            变更的条目数
+        """
+        indexed = set(self.names())
+        missing = [(name, info) for name, info in metadata.items() if name not in indexed]
+        extra = [name for name in indexed if name not in metadata]
+        self.add_many(missing)
+        self.remove_many(extra)
+        return len(missing) + len(extra)
+
+    def search(self, query: str, limit: int = 50) -> List[str]:
+        """
+        检索
+
+        Args:
+            query: 关键词（空格分隔，全部匹配；前缀匹配，如 "moun" 可匹配 mountain）
+            limit: 最多返回条数
+
+        Returns:
+            文件名列表（FTS5 下按相关度排序）
+        """
+        terms = _terms(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            conn = self._connect()
+            if self.fts:
+                match = ' '.join(f'"{t}"*' for t in terms)
+                sql = "SELECT name FROM images WHERE images MATCH ? ORDER BY rank LIMIT ?"
+                params = (match, limit)
+            else:
+                haystack = " || ' ' || ".join(FIELDS)
+                where = ' AND '.join(f"({haystack}) LIKE ?" for _ in terms)
+                sql = f"SELECT name FROM images_plain WHERE {where} LIMIT ?"
+                params = tuple(f"%{t}%" for t in terms) + (limit,)
+            try:
+                return [row[0] for row in conn.execute(sql, params)]
+            except sqlite3.OperationalError as e:
+                print(f"Search error: {e}")
+                return []
+
+    def __len__(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            return conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+
+    def release(self):
+        """释放页缓存（连接保持打开）"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute('PRAGMA shrink_memory')
+
+    def close(self):
+        """关闭数据库"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,339 @@
+"""
+壁纸设置后端
+Windows（SystemParametersInfoW + 注册表）、Linux（gsettings / feh）和用于测试的记录后端
+"""
+
+import ctypes
+import platform
+import shutil
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from core.wallpaper_setter import WallpaperStyle
+
+
+class SetterBackend:
+    """壁纸设置后端接口"""
+
+    name = 'base'
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """当前环境是否可用"""
+        return False
+
+    def set_style(self, style: WallpaperStyle) -> bool:
+        """设置壁纸样式"""
+        raise NotImplementedError
+
+    def set_image(self, image_path: str) -> bool:
+        """设置壁纸图片（绝对路径）"""
+        raise NotImplementedError
+
+    def get_current_wallpaper(self) -> Optional[str]:
+        """获取当前壁纸路径"""
+        return None
+
+
+class WindowsBackend(SetterBackend):
+    """Windows API 后端"""
+
+    name = 'windows'
+
+    # 样式对应的 (WallpaperStyle, TileWallpaper) 注册表值
+    STYLE_VALUES = {
+        WallpaperStyle.CENTER: ("0", "0"),
+        WallpaperStyle.TILE: ("1", "1"),
+        WallpaperStyle.STRETCH: ("2", "0"),
+        WallpaperStyle.KEEP_ASPECT: ("6", "0"),
+        WallpaperStyle.CROP: ("10", "0"),
+        WallpaperStyle.SPAN: ("22", "0")
+    }
+
+    def __init__(self):
+        self.SPI_SETDESKWALLPAPER = 20
+        self.SPIF_UPDATEINIFILE = 0x01
+        self.SPIF_SENDWININICHANGE = 0x02
+        self.SPIF_SENDCHANGE = 0x02
+
+        # 加载系统库
+        self.user32 = ctypes.windll.user32
+        self.user32.SystemParametersInfoW.restype = ctypes.c_bool
+        self.user32.SystemParametersInfoW.argtypes = [
+            ctypes.c_uint,
+            ctypes.c_uint,
+            ctypes.c_wchar_p,
+            ctypes.c_uint
+        ]
+
+        # 注册表中当前的样式值（首次设置时读取一次）
+        self._style_values: Optional[Tuple[str, str]] = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return platform.system() == 'Windows'
+
+    def _read_style_values(self) -> Optional[Tuple[str, str]]:
+        """读取注册表中的样式值"""
+        import winreg
+
+        try:
+            key = winreg.OpenKey(
+                winreg.HKEY_CURRENT_USER,
+                r"Control Panel\Desktop",
+                0,
+                winreg.KEY_READ
+            )
+            wallpaper_style, _ = winreg.QueryValueEx(key, "WallpaperStyle")
+            tile_wallpaper, _ = winreg.QueryValueEx(key, "TileWallpaper")
+            winreg.CloseKey(key)
+            return str(wallpaper_style), str(tile_wallpaper)
+        except Exception:
+            return None
+
+    def set_style(self, style: WallpaperStyle) -> bool:
+        """设置壁纸样式（注册表值未变化时不写入）"""
+        # Windows 壁纸样式注册表路径
+        # HKEY_CURRENT_USER\Control Panel\Desktop\WallpaperStyle
+        # HKEY_CURRENT_USER\Control Panel\Desktop\TileWallpaper
+
+        import winreg
+
+        values = self.STYLE_VALUES.get(style, ("2", "0"))
+        if self._style_values is None:
+            self._style_values = self._read_style_values()
+        if self._style_values == values:
+            return True
+
+        try:
+            # 打开注册表
+            key = winreg.OpenKey(
+                winreg.HKEY_CURRENT_USER,
+                r"Control Panel\Desktop",
+                0,
+                winreg.KEY_SET_VALUE
+            )
+
+            wallpaper_style, tile_wallpaper = values
+            winreg.SetValueEx(key, "WallpaperStyle", 0, winreg.REG_SZ, wallpaper_style)
+            winreg.SetValueEx(key, "TileWallpaper", 0, winreg.REG_SZ, tile_wallpaper)
+
+            winreg.CloseKey(key)
+            self._style_values = values
+            return True
+
+        except Exception as e:
+            print(f"Error setting wallpaper style: {e}")
+            self._style_values = None
+            return False
+
+    def set_image(self, image_path: str) -> bool:
+        try:
+            # 调用 Windows API 设置壁纸
+            result = self.user32.SystemParametersInfoW(
+                self.SPI_SETDESKWALLPAPER,
+                0,
+                image_path,
+                self.SPIF_UPDATEINIFILE | self.SPIF_SENDCHANGE
+            )
+
+            if result:
+                print(f"Wallpaper set: {image_path}")
+                return True
+            else:
+                print("Failed to set wallpaper")
+                return False
+
+        except Exception as e:
+            print(f"Error setting wallpaper: {e}")
+            return False
+
+    def get_current_wallpaper(self) -> Optional[str]:
+        """获取当前壁纸路径"""
+        import winreg
+
+        try:
+            key = winreg.OpenKey(
+                winreg.HKEY_CURRENT_USER,
+                r"Control Panel\Desktop",
+                0,
+                winreg.KEY_READ
+            )
+
+            wallpaper, _ = winreg.QueryValueEx(key, "Wallpaper")
+            winreg.CloseKey(key)
+
+            return wallpaper
+
+        except Exception as e:
+            print(f"Error getting current wallpaper: {e}")
+            return None
+
+    def refresh_desktop(self):
+        """刷新桌面"""
+        # 发送 WM_SETTINGCHANGE 消息
+        HWND_BROADCAST = 0xFFFF
+        WM_SETTINGCHANGE = 0x001A
+        SMTO_BLOCK = 0x0001
+
+        result = ctypes.c_ulong()
+        self.user32.SendMessageTimeoutW(
+            HWND_BROADCAST,
+            WM_SETTINGCHANGE,
+            0,
+            "Environment",
+            SMTO_BLOCK,
+            5000,
+            ctypes.byref(result)
+        )
+
+
+class GSettingsBackend(SetterBackend):
+    """GNOME 桌面后端（gsettings）"""
+
+    name = 'gsettings'
+
+    SCHEMA = 'org.gnome.desktop.background'
+    STYLE_OPTIONS = {
+        WallpaperStyle.CENTER: 'centered',
+        WallpaperStyle.TILE: 'wallpaper',
+        WallpaperStyle.STRETCH: 'stretched',
+        WallpaperStyle.KEEP_ASPECT: 'scaled',
+        WallpaperStyle.CROP: 'zoom',
+        WallpaperStyle.SPAN: 'spanned'
+    }
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return platform.system() == 'Linux' and shutil.which('gsettings') is not None
+
+    def _gsettings(self, *args) -> Optional[str]:
+        try:
+            result = subprocess.run(['gsettings', *args], capture_output=True,
+                                    text=True, timeout=5, check=True)
+            return result.stdout.strip()
+        except Exception as e:
+            print(f"gsettings error: {e}")
+            return None
+
+    def set_style(self, style: WallpaperStyle) -> bool:
+        option = self.STYLE_OPTIONS.get(style, 'zoom')
+        return self._gsettings('set', self.SCHEMA, 'picture-options', option) is not None
+
+    def set_image(self, image_path: str) -> bool:
+        uri = Path(image_path).as_uri()
+        ok = self._gsettings('set', self.SCHEMA, 'picture-uri', uri) is not None
+        # GNOME 42+ 深色模式使用单独的键，旧版本没有该键，忽略失败
+        self._gsettings('set', self.SCHEMA, 'picture-uri-dark', uri)
+        if ok:
+            print(f"Wallpaper set: {image_path}")
+        return ok
+
+    def get_current_wallpaper(self) -> Optional[str]:
+        value = self._gsettings('get', self.SCHEMA, 'picture-uri')
+        if not value:
+            return None
+        uri = value.strip("'")
+        return uri[len('file://'):] if uri.startswith('file://') else uri
+
+
+class FehBackend(SetterBackend):
+    """通用 X11 后端（feh）"""
+
+    name = 'feh'
+
+    STYLE_FLAGS = {
+        WallpaperStyle.CENTER: '--bg-center',
+        WallpaperStyle.TILE: '--bg-tile',
+        WallpaperStyle.STRETCH: '--bg-scale',
+        WallpaperStyle.KEEP_ASPECT: '--bg-max',
+        WallpaperStyle.CROP: '--bg-fill',
+        WallpaperStyle.SPAN: '--bg-fill'
+    }
+
+    def __init__(self):
+        self._style = WallpaperStyle.FILL
+        self._current: Optional[str] = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return platform.system() == 'Linux' and shutil.which('feh') is not None
+
+    def set_style(self, style: WallpaperStyle) -> bool:
+        # feh 在设置图片时一并指定样式
+        self._style = style
+        return True
+
+    def set_image(self, image_path: str) -> bool:
+        flag = self.STYLE_FLAGS.get(self._style, '--bg-fill')
+        try:
+            subprocess.run(['feh', '--no-fehbg', flag, image_path],
+                           capture_output=True, timeout=10, check=True)
+        except Exception as e:
+            print(f"feh error: {e}")
+            return False
+        self._current = image_path
+        print(f"Wallpaper set: {image_path}")
+        return True
+
+    def get_current_wallpaper(self) -> Optional[str]:
+        return self._current
+
+
+class RecordingBackend(SetterBackend):
+    """记录调用但不修改桌面的后端（基准测试和模拟用）"""
+
+    name = 'recording'
+
+    def __init__(self):
+        self.calls: List[Tuple[str, object]] = []
+        self._current: Optional[str] = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return True
+
+    def set_style(self, style: WallpaperStyle) -> bool:
+        self.calls.append(('style', style))
+        return True
+
+    def set_image(self, image_path: str) -> bool:
+        self.calls.append(('image', image_path))
+        self._current = image_path
+        return True
+
+    def get_current_wallpaper(self) -> Optional[str]:
+        return self._current
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (WindowsBackend, GSettingsBackend, FehBackend, RecordingBackend)
+}
+
+
+def create_backend(name: str = 'auto') -> Optional[SetterBackend]:
+    """
+    创建设置后端
+
+    Args:
+        name: 后端名称（windows/gsettings/feh/recording），auto 表示按平台自动选择
+
+    Returns:
+        后端实例，没有可用后端（或指定的后端在当前环境不可用）时返回 None
+    """
+    if name and name != 'auto':
+        backend = BACKENDS.get(name)
+        if backend is None:
+            print(f"Unknown wallpaper backend: {name}")
+            return None
+        if not backend.is_available():
+            print(f"Wallpaper backend not available on this system: {name}")
+            return None
+        return backend()
+
+    for backend in (WindowsBackend, GSettingsBackend, FehBackend):
+        if backend.is_available():
+            return backend()
+    return None
@@ -0,0 +1,122 @@
+"""
+缓存壁纸洗牌轮换
+持久化的洗牌袋：一轮内每张缓存壁纸只出现一次，全部用完后重新洗牌
+"""
+
+import json
+import random
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from utils.fs import write_json_atomic
+
+
+class ShuffleBag:
+    """洗牌袋（只保存文件名，候选集合由调用方每次传入）"""
+
+    def __init__(self, path=None, rng: random.Random = None):
+        """
+        Args:
+            path: 持久化文件路径，None 表示只保存在内存中
+            rng: 随机数生成器
+        """
+        self.path = Path(path) if path else None
+        self.rng = rng or random.Random()
+        self._remaining: List[str] = []  # 本轮尚未出现的文件名（从末尾取）
+        self._shown: List[str] = []      # 本轮已经出现的文件名
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._remaining = list(data.get('remaining', []))
+            self._shown = list(data.get('shown', []))
+        except (OSError, ValueError) as e:
+            print(f"Error loading shuffle bag: {e}")
+
+    def _save(self):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_json_atomic(self.path, {'version': 1, 'remaining': self._remaining,
+                                           'shown': self._shown})
+        except OSError as e:
+            print(f"Error saving shuffle bag: {e}")
+
+    def _sync(self, names: Iterable[str]):
+        """与当前缓存对齐：去掉已删除的文件，新文件随机插入本轮"""
+        names = set(names)
+        self._remaining = [name for name in self._remaining if name in names]
+        self._shown = [name for name in self._shown if name in names]
+        known = set(self._remaining) | set(self._shown)
+        for name in sorted(names - known):
+            self._remaining.insert(self.rng.randint(0, len(self._remaining)), name)
+
+    def has_unseen(self, names: Iterable[str]) -> bool:
+        """本轮是否还有没出现过的壁纸"""
+        self._ensure_loaded()
+        shown = set(self._shown)
+        return any(name not in shown for name in names)
+
+    def _reshuffle(self, names: List[str]):
+        """开始新一轮（尽量不以刚出现过的壁纸开始）"""
+        last = self._shown[-1:]
+        self._remaining = list(names)
+        self.rng.shuffle(self._remaining)
+        self._shown = []
+        if len(self._remaining) > 1 and self._remaining[-1:] == last:
+            self._remaining.insert(0, self._remaining.pop())
+
+    def reshuffle(self, names: Iterable[str]):
+        """本轮用完时由调用方开始新一轮（如 offline_first 模式获取新壁纸后继续轮换缓存）"""
+        self._ensure_loaded()
+        self._reshuffle(list(names))
+        self._save()
+
+    def draw(self, names: Iterable[str], exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        取出下一张
+
+        Args:
+            names: 当前可用的文件名
+            exclude: 尽量避开的文件名（如当前壁纸）
+
+        Returns:
+            文件名，没有可用文件时返回 None
+        """
+        self._ensure_loaded()
+        names = list(names)
+        if not names:
+            return None
+        exclude = set(exclude)
+
+        self._sync(names)
+        if not any(name not in exclude for name in self._remaining):
+            self._reshuffle(names)
+
+        for index in range(len(self._remaining) - 1, -1, -1):
+            if self._remaining[index] not in exclude:
+                name = self._remaining.pop(index)
+                break
+        else:
+            name = self._remaining.pop()
+
+        self._shown.append(name)
+        self._save()
+        return name
+
+    def mark_shown(self, name: str):
+        """记录一张从其他途径显示的壁纸（如刚下载的新壁纸）"""
+        self._ensure_loaded()
+        if name in self._remaining:
+            self._remaining.remove(name)
+        if name not in self._shown:
+            self._shown.append(name)
+        self._save()
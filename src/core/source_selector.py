@@ -0,0 +1,240 @@
+"""
+图片源选择
+按各源的滚动延迟、错误率和剩余配额加权选择，连续失败时熔断，冷却后半开试探
+
+熔断状态:
+    closed     正常参与选择
+    open       连续失败达到阈值（或配额用尽），冷却期内不再选择
+    half_open  冷却结束，放行一个试探请求；成功则恢复，失败则重新熔断
+"""
+
+import math
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+from utils.metrics import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class SourceStats:
+    """单个源的滚动统计"""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)  # (延迟秒数, 是否成功)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.quota: Optional[int] = None
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    @property
+    def latency(self) -> Optional[float]:
+        """成功请求的平均延迟"""
+        latencies = [latency for latency, ok in self.samples if ok]
+        return sum(latencies) / len(latencies) if latencies else None
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """成功请求延迟的百分位（nearest-rank）"""
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        rank = math.ceil(len(latencies) * percentile / 100.0)
+        return latencies[min(max(rank, 1), len(latencies)) - 1]
+
+
+class HedgeBudget:
+    """
+    对冲请求预算（令牌桶）
+
+    每个普通请求存入 ratio 个令牌，每次对冲消耗 1 个，
+    长期来看对冲请求不超过普通请求的 ratio 倍。
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 2.0):
+        """
+        Args:
+            ratio: 对冲请求占比上限
+            burst: 令牌上限（允许短时间内连续对冲的次数）
+        """
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self._lock = threading.Lock()
+
+    def on_request(self):
+        """记录一次普通请求"""
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """尝试消耗一次对冲的令牌"""
+        with self._lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+class SourceSelector:
+    """图片源选择器"""
+
+    def __init__(self, failure_threshold: int = 3, open_seconds: float = 60.0,
+                 window: int = 20, low_quota: int = 5,
+                 clock: Callable[[], float] = time.monotonic, rng: random.Random = None):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            open_seconds: 熔断冷却时间（秒）
+            window: 滚动窗口大小（请求数）
+            low_quota: 剩余配额低于该值时降低权重
+            clock: 时钟（测试和模拟时可替换）
+            rng: 随机数生成器
+        """
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.window = window
+        self.low_quota = low_quota
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._stats: Dict[str, SourceStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str) -> SourceStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = SourceStats(self.window)
+        return stats
+
+    def _available(self, stats: SourceStats, now: float) -> bool:
+        """是否可以发出请求（必要时从 open 转为 half_open）"""
+        if stats.state == OPEN and now - stats.opened_at >= self.open_seconds:
+            stats.state = HALF_OPEN
+            stats.probing = False
+        if stats.state == OPEN:
+            return False
+        if stats.state == HALF_OPEN:
+            return not stats.probing
+        return True
+
+    def _weight(self, stats: SourceStats) -> float:
+        """健康度权重：成功率 / 延迟，配额不足时降权"""
+        latency = stats.latency
+        if latency is None:
+            # 没有数据的源给一个乐观的默认值，保证会被尝试
+            latency = 0.5
+        weight = (1.0 - stats.error_rate) / max(latency, 0.05)
+        if stats.quota is not None and stats.quota < self.low_quota:
+            weight *= 0.1
+        return max(weight, 1e-3)
+
+    def choose(self, names: Iterable[str], exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        选择一个源
+
+        Args:
+            names: 候选源
+            exclude: 本次已经失败、需要跳过的源
+
+        Returns:
+            源名称；全部熔断时返回最早熔断的源作为试探，没有候选时返回 None
+        """
+        exclude = set(exclude)
+        candidates = [name for name in names if name not in exclude]
+        if not candidates:
+            return None
+
+        now = self.clock()
+        with self._lock:
+            available = [name for name in candidates if self._available(self._get(name), now)]
+            if not available:
+                # 全部不可用时不完全停摆：试探最早熔断（最快冷却完）的源
+                name = min(candidates, key=lambda n: self._get(n).opened_at)
+                self._get(name).probing = True
+                return name
+
+            weights = [self._weight(self._get(name)) for name in available]
+            name = self.rng.choices(available, weights=weights)[0]
+            stats = self._get(name)
+            if stats.state == HALF_OPEN:
+                stats.probing = True
+            return name
+
+    def record(self, name: str, latency: float, ok: bool, quota: Optional[int] = None):
+        """
+        记录一次请求结果
+
+        Args:
+            name: 源名称
+            latency: 耗时（秒）
+            ok: 是否成功
+            quota: 响应中的剩余配额（X-Ratelimit-Remaining），未知时为 None
+        """
+        with self._lock:
+            stats = self._get(name)
+            stats.samples.append((latency, ok))
+            stats.probing = False
+            if quota is not None:
+                stats.quota = quota
+
+            if ok and quota == 0:
+                # 配额用尽：与熔断相同，冷却后再试探
+                stats.state = OPEN
+                stats.opened_at = self.clock()
+                return
+
+            if ok:
+                stats.consecutive_failures = 0
+                stats.state = CLOSED
+                return
+
+            stats.consecutive_failures += 1
+            if stats.state == HALF_OPEN or stats.consecutive_failures >= self.failure_threshold:
+                if stats.state != OPEN:
+                    metrics.inc('source_circuit_open_total', source=name)
+                stats.state = OPEN
+                stats.opened_at = self.clock()
+
+    def hedge_delay(self, name: str, percentile: float,
+                    min_samples: int = 5) -> Optional[float]:
+        """
+        对冲触发延迟：该源已观测延迟的百分位
+
+        Returns:
+            秒数；样本不足时返回 None（不对冲）
+        """
+        with self._lock:
+            stats = self._get(name)
+            if sum(1 for _, ok in stats.samples if ok) < min_samples:
+                return None
+            return max(stats.latency_percentile(percentile), 0.05)
+
+    def state(self, name: str) -> str:
+        """熔断状态"""
+        with self._lock:
+            stats = self._get(name)
+            self._available(stats, self.clock())
+            return stats.state
+
+    def report(self) -> List[Dict]:
+        """各源的统计（用于显示和调试）"""
+        with self._lock:
+            return [{
+                'source': name,
+                'state': stats.state,
+                'latency': stats.latency,
+                'error_rate': stats.error_rate,
+                'quota': stats.quota,
+                'samples': len(stats.samples),
+            } for name, stats in self._stats.items()]
@@ -4,32 +4,113 @@
 按照 Unsplash API 规范正确获取高分辨率图片
 """
 
-import requests
 import random
 from typing import List, Dict, Optional
 from pathlib import Path
 
+from core.response_cache import ResponseCache
+from utils.connectivity import warm_connection
+from utils.metrics import metrics
+
 
 class WallpaperAPI:
     """壁纸 API 基类"""
 
+    # 图片所在的 CDN（预热下载连接用）
+    image_base_url: Optional[str] = None
+
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+        # 会话在第一次请求时创建，启动时不导入 requests
+        self.headers = {
             'User-Agent': 'WallpaperChanger/1.0'
-        })
+        }
+        self._session = None
+        # 最近一次响应中的剩余配额（X-Ratelimit-Remaining），未知时为 None
+        self.rate_limit_remaining: Optional[int] = None
+        # 搜索结果缓存（可替换为持久化的共享缓存）
+        self.response_cache = ResponseCache()
+
+    def _note_rate_limit(self, response):
+        """记录响应头中的剩余配额"""
+        remaining = response.headers.get('X-Ratelimit-Remaining')
+        try:
+            self.rate_limit_remaining = int(remaining) if remaining is not None else None
+        except ValueError:
+            self.rate_limit_remaining = None
+
+    def _get_json(self, url: str, params: Dict, source: str, op: str):
+        """
+        带缓存的 GET 请求
+
+        新鲜期内直接返回缓存的响应；过期后带验证器请求，304 时沿用缓存的响应。
+        """
+        cache = self.response_cache
+        key = cache.key(url, params)
+        entry = cache.get(key)
+        if entry is not None and cache.is_fresh(entry):
+            metrics.inc('api_cache_hits_total', source=source, op=op)
+            return entry['body']
+
+        conditional = cache.conditional_headers(entry)
+        with metrics.timer('api_request_seconds', source=source, op=op):
+            response = self.session.get(url, params=params, timeout=10,
+                                        headers=conditional or None)
+        self._note_rate_limit(response)
+        if conditional and response.status_code == 304:
+            cache.refresh(key, response.headers.get('ETag'),
+                          response.headers.get('Last-Modified'))
+            metrics.inc('api_revalidations_total', source=source, result='not_modified')
+            return entry['body']
+        response.raise_for_status()
+        data = response.json()
+        cache.put(key, data, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        if conditional:
+            metrics.inc('api_revalidations_total', source=source, result='modified')
+        return data
+
+    @property
+    def session(self):
+        """HTTP 会话（延迟创建）"""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+        return self._session
+
+    def prewarm(self, timeout: float = 5.0) -> bool:
+        """预先建立到 API 主机的连接（匿名请求，不消耗配额）"""
+        return warm_connection(self.session, self.base_url, timeout,
+                               strip_headers=[name for name in self.headers
+                                              if name != 'User-Agent'])
+
+    def _set_header(self, name: str, value: Optional[str]):
+        """设置或移除请求头（会话已创建时同步更新）"""
+        if value:
+            self.headers[name] = value
+        else:
+            self.headers.pop(name, None)
+        if self._session is not None:
+            if value:
+                self._session.headers[name] = value
+            else:
+                self._session.headers.pop(name, None)
 
 
 class UnsplashAPI(WallpaperAPI):
     """Unsplash API - 按照官方规范获取高分辨率图片"""
 
+    image_base_url = "https://images.unsplash.com"
+
     def __init__(self, access_key: str):
         super().__init__()
         self.access_key = access_key
         self.base_url = "https://api.unsplash.com"
-        self.session.headers.update({
-            'Authorization': f'Client-ID {access_key}'
-        })
+        self._set_header('Authorization', f'Client-ID {access_key}')
+
+    def set_access_key(self, access_key: str):
+        """更新 Access Key（保留现有会话和连接池）"""
+        self.access_key = access_key
+        self._set_header('Authorization', f'Client-ID {access_key}')
 
     def _build_resolution_url(self, image: Dict, width: int, height: int, prefer_higher: bool = True) -> str:
         """
@@ -56,8 +137,8 @@ class UnsplashAPI(WallpaperAPI):
         Returns:
             高分辨率图片 URL
         """
-        # 获取 raw URL 作为基础
-        raw_url = image['urls']['raw']
+        # 获取 raw URL 作为基础（兼容 API 原始对象和 fetch_random/search 的解析结果）
+        raw_url = image.get('raw_url') or image['urls']['raw']
 
         # 构建查询参数
         params = []
@@ -110,11 +191,13 @@ class UnsplashAPI(WallpaperAPI):
             params['query'] = query
 
         try:
-            response = self.session.get(
-                f"{self.base_url}/photos/random",
-                params=params,
-                timeout=10
-            )
+            with metrics.timer('api_request_seconds', source='unsplash', op='fetch_random'):
+                response = self.session.get(
+                    f"{self.base_url}/photos/random",
+                    params=params,
+                    timeout=10
+                )
+            self._note_rate_limit(response)
             response.raise_for_status()
             images = response.json()
 
@@ -129,10 +212,13 @@ class UnsplashAPI(WallpaperAPI):
                 'description': img.get('description') or img.get('alt_description', ''),
                 'width': img['width'],
                 'height': img['height'],
-                'source': 'unsplash'
+                'source': 'unsplash',
+                'category': query or '',
+                'tags': [t.get('title') for t in img.get('tags', []) if t.get('title')]
             } for img in images]
 
         except Exception as e:
+            metrics.inc('api_errors_total', source='unsplash', op='fetch_random')
             print(f"Unsplash API error: {e}")
             return []
 
@@ -157,13 +243,8 @@ class UnsplashAPI(WallpaperAPI):
         }
 
         try:
-            response = self.session.get(
-                f"{self.base_url}/search/photos",
-                params=params,
-                timeout=10
-            )
-            response.raise_for_status()
-            results = response.json()['results']
+            results = self._get_json(f"{self.base_url}/search/photos", params,
+                                     'unsplash', 'search')['results']
 
             return [{
                 'id': img['id'],
@@ -175,10 +256,13 @@ class UnsplashAPI(WallpaperAPI):
                 'description': img.get('description') or img.get('alt_description', ''),
                 'width': img['width'],
                 'height': img['height'],
-                'source': 'unsplash'
+                'source': 'unsplash',
+                'category': query,
+                'tags': [t.get('title') for t in img.get('tags', []) if t.get('title')]
             } for img in results]
 
         except Exception as e:
+            metrics.inc('api_errors_total', source='unsplash', op='search')
             print(f"Unsplash search error: {e}")
             return []
 
@@ -209,15 +293,28 @@ class UnsplashAPI(WallpaperAPI):
 class WallhavenAPI(WallpaperAPI):
     """Wallhaven API"""
 
+    image_base_url = "https://w.wallhaven.cc"
+
     def __init__(self, api_key: str = None):
         super().__init__()
         self.api_key = api_key
         self.base_url = "https://wallhaven.cc/api/v1"
+        self._set_header('X-API-Key', api_key)
+
+    def set_api_key(self, api_key: str = None):
+        """更新 API Key（保留现有会话和连接池）"""
+        self.api_key = api_key
+        self._set_header('X-API-Key', api_key)
+
+    def get_high_resolution_url(self, image: Dict, target_width: int, target_height: int,
+                                prefer_higher: bool = True) -> str:
+        """
+        Wallhaven 直接提供原图，无需按分辨率构建 URL
 
-        if api_key:
-            self.session.headers.update({
-                'X-API-Key': api_key
-            })
+        Returns:
+            原图 URL
+        """
+        return image['full_url']
 
     def fetch_random(self, count: int = 10,
                      categories: str = '111',
@@ -247,11 +344,13 @@ class WallhavenAPI(WallpaperAPI):
             params['resolutions'] = ','.join(resolutions)
 
         try:
-            response = self.session.get(
-                f"{self.base_url}/search",
-                params=params,
-                timeout=10
-            )
+            with metrics.timer('api_request_seconds', source='wallhaven', op='fetch_random'):
+                response = self.session.get(
+                    f"{self.base_url}/search",
+                    params=params,
+                    timeout=10
+                )
+            self._note_rate_limit(response)
             response.raise_for_status()
             data = response.json()
 
@@ -264,10 +363,13 @@ class WallhavenAPI(WallpaperAPI):
                 'description': f"{img['category']} - {img['purity']}",
                 'width': img['resolution'].split('x')[0],
                 'height': img['resolution'].split('x')[1],
-                'source': 'wallhaven'
+                'source': 'wallhaven',
+                'category': img.get('category', ''),
+                'tags': [t.get('name') for t in img.get('tags', []) if t.get('name')]
             } for img in data.get('data', [])[:count]]
 
         except Exception as e:
+            metrics.inc('api_errors_total', source='wallhaven', op='fetch_random')
             print(f"Wallhaven API error: {e}")
             return []
 
@@ -294,13 +396,7 @@ class WallhavenAPI(WallpaperAPI):
         }
 
         try:
-            response = self.session.get(
-                f"{self.base_url}/search",
-                params=params,
-                timeout=10
-            )
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json(f"{self.base_url}/search", params, 'wallhaven', 'search')
 
             return [{
                 'id': img['id'],
@@ -311,9 +407,12 @@ class WallhavenAPI(WallpaperAPI):
                 'description': f"{img['category']} - {img['purity']}",
                 'width': img['resolution'].split('x')[0],
                 'height': img['resolution'].split('x')[1],
-                'source': 'wallhaven'
+                'source': 'wallhaven',
+                'category': img.get('category', ''),
+                'tags': [t.get('name') for t in img.get('tags', []) if t.get('name')]
             } for img in data.get('data', [])[:count]]
 
         except Exception as e:
+            metrics.inc('api_errors_total', source='wallhaven', op='search')
             print(f"Wallhaven search error: {e}")
             return []
@@ -1,28 +1,179 @@
 """
 壁纸下载器
 负责下载和缓存壁纸
+
+缓存目录可被多个进程共用（见 core.cache_index）：下载通过写入租约避免重复，
+清理时跳过其他进程正在写入或使用的文件。
 """
 
 import os
+import time
 import hashlib
-import requests
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Callable, Optional, Dict, List
 from urllib.parse import urlparse
 
+from core.cache_index import CacheIndex, CacheEntry, INDEX_FILE
+from core.cold_tier import ColdTier, pillow_available, restore_image
+from core.ingest import StreamIngest, IngestError, CHUNK_SIZE as INGEST_CHUNK_SIZE
+from core.metadata_store import MetadataStore
+from core.search_index import SearchIndex, SEARCH_DB_FILE
+from utils.connectivity import warm_connection
+from utils.metrics import metrics, SIZE_BUCKETS, THROUGHPUT_BUCKETS
+
 
 class WallpaperDownloader:
     """壁纸下载器"""
 
     def __init__(self, cache_dir: str = "cache", max_size_mb: int = 500,
-                 max_images: int = 50):
+                 max_images: int = 50, max_image_mb: float = 50,
+                 cold_after_days: float = 0, cold_max_size_mb: int = 500,
+                 cold_format: str = 'webp', cold_quality: int = 80,
+                 revalidate_after_days: float = 0):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_size_mb: 热缓存大小上限（MB）
+            max_images: 热缓存图片数上限
+            max_image_mb: 单张图片大小上限（MB）
+            cold_after_days: 超过该天数未使用的图片压缩后移入冷缓存，0 表示不使用冷缓存
+            cold_max_size_mb: 冷缓存大小上限（MB）
+            cold_format: 冷缓存格式（webp/avif/jpeg）
+            cold_quality: 冷缓存压缩质量
+            revalidate_after_days: 缓存命中的图片超过该天数未验证时，用 ETag/Last-Modified
+                                   向服务器确认是否变化，0 表示不重新验证
+        """
         self.cache_dir = Path(cache_dir)
         self.max_size_mb = max_size_mb
         self.max_images = max_images
+        self.max_image_mb = max_image_mb
+        self.cold_after_days = cold_after_days
+        self.revalidate_after_days = revalidate_after_days
+
+        # 被固定的文件（如历史记录中的壁纸）不会被清理，值为引用计数
+        self._pins: Dict[str, int] = {}
+        self._pins_lock = threading.Lock()
+        self._pin_batch = 0
+        self._cleanup_lock = threading.Lock()
+        # 正在下载的文件预留的缓存空间
+        self._reserved_bytes = 0
+        self._reserved_count = 0
+        # HTTP 会话（连接池在多次下载之间复用），第一次下载时创建
+        self._session = None
 
         # 确保缓存目录存在
         self.cache_dir.mkdir(parents=True, exist_ok=True)
 
+        # 缓存索引（避免每次查询都扫描目录）
+        self.index = CacheIndex(self.cache_dir)
+
+        # 冷缓存（长时间未使用的图片重新压缩后保存在 cold/）
+        self.cold = ColdTier(self.cache_dir, fmt=cold_format, quality=cold_quality,
+                             max_size_mb=cold_max_size_mb)
+        self._demote_thread: Optional[threading.Thread] = None
+        self._demote_cancel = threading.Event()
+
+        # 元数据存储（单个 JSONL 日志，首次访问时迁移旧的 .json 文件）
+        self.metadata = MetadataStore(self.cache_dir, exclude=(INDEX_FILE,))
+
+        # 元数据全文检索（首次检索时与元数据存储对齐）
+        self.search_index = SearchIndex(self.cache_dir / SEARCH_DB_FILE)
+        self._search_synced = False
+
+    def set_limits(self, max_size_mb: int, max_images: int, max_image_mb: float = None):
+        """更新缓存限制（不影响已缓存内容）"""
+        self.max_size_mb = max_size_mb
+        self.max_images = max_images
+        if max_image_mb is not None:
+            self.max_image_mb = max_image_mb
+
+    def set_revalidate_after(self, days: float):
+        """更新缓存图片的重新验证间隔（天）"""
+        self.revalidate_after_days = days
+
+    def set_cold_limits(self, after_days: float, max_size_mb: int,
+                        fmt: str = None, quality: int = None):
+        """更新冷缓存设置"""
+        self.cold_after_days = after_days
+        self.cold.max_size_mb = max_size_mb
+        if fmt is not None:
+            self.cold.fmt = fmt
+        if quality is not None:
+            self.cold.quality = quality
+
+    @property
+    def session(self):
+        """下载用的 HTTP 会话（延迟创建）"""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers['User-Agent'] = 'WallpaperChanger/1.0'
+        return self._session
+
+    def prewarm(self, url: str, timeout: float = 5.0) -> bool:
+        """预先建立到图片主机的连接"""
+        return warm_connection(self.session, url, timeout)
+
+    def pin(self, path):
+        """固定缓存文件，清理时跳过（包括其他进程的清理）"""
+        key = str(Path(path).resolve())
+        with self._pins_lock:
+            count = self._pins.get(key, 0)
+            self._pins[key] = count + 1
+        if count == 0:
+            self._publish_pins()
+
+    def unpin(self, path):
+        """取消固定"""
+        key = str(Path(path).resolve())
+        with self._pins_lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+        if count <= 0:
+            self._publish_pins()
+
+    @contextmanager
+    def pin_batch(self):
+        """批量固定/取消固定，结束时只发布一次"""
+        self._pin_batch += 1
+        try:
+            yield
+        finally:
+            self._pin_batch -= 1
+            self._publish_pins()
+
+    def _publish_pins(self):
+        """把缓存目录内被固定的文件发布给其他进程"""
+        if self._pin_batch:
+            return
+        cache_dir = str(self.cache_dir.resolve())
+        with self._pins_lock:
+            refs = {os.path.basename(key): count for key, count in self._pins.items()
+                    if os.path.dirname(key) == cache_dir}
+        self.index.publish_refs(refs)
+
+    def is_pinned(self, path) -> bool:
+        """是否被固定"""
+        return str(Path(path).resolve()) in self._pins
+
+    def _list_images(self) -> list:
+        """列出缓存中的图片文件"""
+        return [self.cache_dir / e.name for e in self.index.entries()]
+
+    def list_entries(self) -> List[CacheEntry]:
+        """列出缓存索引条目（最新的在前）"""
+        return self.index.entries()
+
+    def touch(self, path):
+        """更新缓存文件的访问时间（直接使用缓存文件时）"""
+        self.index.touch(Path(path).name)
+
     def _get_cache_path(self, url: str) -> Path:
         """
         根据URL生成缓存路径
@@ -53,114 +204,530 @@ class WallpaperDownloader:
             # 默认使用 jpg
             return '.jpg'
 
-    def download(self, url: str, info: Dict = None) -> Optional[Path]:
+    def download(self, url: str, info: Dict = None,
+                 throttle: Callable[[int], None] = None) -> Optional[Path]:
         """
         下载壁纸到缓存
 
         Args:
             url: 图片URL
             info: 图片信息元数据
+            throttle: 可选的限速回调，开始请求前以 0、每个数据块后以块大小调用（可阻塞）
 
         Returns:
             本地文件路径，失败返回 None
         """
-        # 检查是否已缓存
+        # 检查是否已缓存；过了验证期的缓存带上验证器发出条件请求
         cache_path = self._get_cache_path(url)
-        if cache_path.exists():
-            print(f"Using cached: {cache_path}")
+        conditional = None
+        if self._cache_hit(cache_path):
+            conditional = self._revalidation_headers(cache_path.name)
+            if conditional is None:
+                return cache_path
+        elif self._restore_cold(cache_path):
             return cache_path
 
-        # 检查缓存大小限制
-        if not self._check_cache_size():
-            self._cleanup_cache()
+        # 获取写入租约；其他线程或进程正在下载同一文件时等待其完成
+        lease = self.index.lease(cache_path.name)
+        if lease is None:
+            if conditional is not None:
+                # 其他线程正在重新验证或更新该文件，继续使用现有文件
+                return cache_path
+            print(f"Waiting for concurrent download: {cache_path}")
+            if self.index.wait_for_lease(cache_path.name):
+                self.index.add(cache_path)
+                return cache_path
+            return None
+        if conditional is None:
+            metrics.inc('cache_misses_total')
+
+        reserved = None
+        response = None
+        with lease:
+            try:
+                # 拿到租约前可能刚好有其他进程完成了下载
+                if conditional is None and cache_path.exists():
+                    lease.abort()
+                    self.index.add(cache_path)
+                    return cache_path
+
+                if throttle is not None:
+                    throttle(0)
+
+                print(f"Revalidating: {url}" if conditional else f"Downloading: {url}")
+                start = time.perf_counter()
+                response = self.session.get(url, stream=True, timeout=30, headers=conditional)
+                if conditional is not None and response.status_code == 304:
+                    # 内容未变：只刷新验证时间，不传输正文
+                    lease.abort()
+                    self.index.mark_validated(cache_path.name, response.headers.get('ETag'),
+                                              response.headers.get('Last-Modified'))
+                    metrics.inc('cache_revalidations_total', result='not_modified')
+                    return cache_path
+                response.raise_for_status()
+
+                # 读取正文前按 Content-Length 检查大小并预留缓存空间（需要时先淘汰旧文件）
+                max_image_bytes = int(self.max_image_mb * 1024 * 1024)
+                expected = int(response.headers.get('Content-Length') or 0)
+                if expected > max_image_bytes:
+                    response.close()
+                    metrics.inc('download_refused_total', reason='too_large')
+                    print(f"Refusing download larger than {self.max_image_mb} MB: {url}")
+                    lease.abort()
+                    return None
+                # 重新验证后更新的文件替换原文件，不另外预留空间
+                if conditional is None and not self._reserve(expected):
+                    response.close()
+                    metrics.inc('download_refused_total', reason='over_cache_limit')
+                    print(f"Refusing download larger than the cache limit: {url}")
+                    lease.abort()
+                    return None
+                reserved = expected if conditional is None else None
+
+                # 写入租约文件（同时计算摘要并识别图片），完成后原子重命名
+                ingest = StreamIngest(lease.file, expected or None)
+                first_byte = None
+                for chunk in response.iter_content(chunk_size=INGEST_CHUNK_SIZE):
+                    if first_byte is None:
+                        first_byte = time.perf_counter()
+                    if ingest.size + len(chunk) > max_image_bytes:
+                        # 没有 Content-Length 或与实际不符
+                        response.close()
+                        metrics.inc('download_refused_total', reason='too_large')
+                        raise ValueError(f"image exceeds {self.max_image_mb} MB")
+                    ingest.feed(chunk)
+                    if throttle is not None:
+                        throttle(len(chunk))
+                try:
+                    details = ingest.finish()
+                except IngestError:
+                    metrics.inc('download_refused_total', reason='truncated')
+                    raise
+                size = ingest.size
+                if ingest.format is None:
+                    metrics.inc('download_unidentified_total')
+
+                elapsed = time.perf_counter() - start
+                metrics.observe('download_ttfb_seconds', (first_byte or start + elapsed) - start)
+                metrics.observe('download_seconds', elapsed)
+                metrics.observe('download_bytes', size, SIZE_BUCKETS)
+                metrics.inc('download_bytes_total', size)
+                if elapsed > 0:
+                    metrics.observe('download_throughput_bytes_per_second', size / elapsed,
+                                    THROUGHPUT_BUCKETS)
+
+                with metrics.timer('download_postprocess_seconds'):
+                    # 保存元数据（以实际文件的尺寸为准）
+                    if info:
+                        self._save_metadata(cache_path, {**info, **details})
+
+                    lease.commit()
+                    self.index.add(cache_path, response.headers.get('ETag'),
+                                   response.headers.get('Last-Modified'))
+
+                if conditional is not None:
+                    metrics.inc('cache_revalidations_total', result='modified')
+                print(f"Downloaded to: {cache_path}")
+                return cache_path
+
+            except Exception as e:
+                metrics.inc('download_errors_total')
+                print(f"Download error: {e}")
+                # 删除不完整的文件
+                lease.abort()
+                if conditional is not None:
+                    # 重新验证失败（如离线）时继续使用缓存
+                    metrics.inc('cache_revalidations_total', result='error')
+                    return cache_path
+                return None
+
+            finally:
+                if response is not None:
+                    # 正文已读完时连接回到连接池
+                    response.close()
+                if reserved is not None:
+                    self._release(reserved)
+
+    def _cache_hit(self, cache_path: Path) -> bool:
+        """缓存命中检查"""
+        if self.index.get(cache_path.name) is not None and cache_path.exists():
+            print(f"Using cached: {cache_path}")
+            metrics.inc('cache_hits_total')
+            self.index.touch(cache_path.name)
+            return True
+        return False
+
+    def _revalidation_headers(self, name: str) -> Optional[Dict[str, str]]:
+        """缓存条目过了验证期且有验证器时返回条件请求头，否则返回 None"""
+        if not self.revalidate_after_days:
+            return None
+        entry = self.index.get(name)
+        if entry is None or not (entry.etag or entry.last_modified):
+            return None
+        if time.time() - entry.validated < self.revalidate_after_days * 86400:
+            return None
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def _restore_cold(self, cache_path: Path) -> bool:
+        """冷缓存中有该图片时解码还原到热缓存"""
+        entry = self.cold.find(cache_path.name)
+        if entry is None:
+            return False
 
-        try:
-            print(f"Downloading: {url}")
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
+        lease = self.index.lease(cache_path.name)
+        if lease is None:
+            return self.index.wait_for_lease(cache_path.name) and self._cache_hit(cache_path)
+
+        with lease:
+            try:
+                with metrics.timer('cache_restore_seconds'):
+                    restore_image(str(self.cold.dir / entry.name), lease.file, cache_path.suffix)
+                size = lease.file.tell()
+                if not self._reserve(size):
+                    lease.abort()
+                    return False
+                try:
+                    lease.commit()
+                    self.index.add(cache_path)
+                finally:
+                    self._release(size)
+            except Exception as e:
+                print(f"Error restoring {entry.name} from cold cache: {e}")
+                lease.abort()
+                return False
+
+        self.cold.remove(entry.name)
+        metrics.inc('cache_restores_total')
+        print(f"Restored from cold cache: {cache_path}")
+        return True
+
+    def locate(self, path) -> Optional[Path]:
+        """图片当前所在的文件：热缓存文件，或冷缓存中重新压缩的文件（不还原）"""
+        path = self.cache_dir / Path(path).name
+        if path.exists():
+            return path
+        entry = self.cold.find(path.name)
+        return self.cold.dir / entry.name if entry is not None else None
+
+    def restore(self, path) -> Optional[Path]:
+        """
+        确保缓存图片位于热缓存中（在冷缓存中时还原）
 
-            # 写入文件
-            with open(cache_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+        Returns:
+            热缓存路径，图片已不在任何一层时返回 None
+        """
+        path = self.cache_dir / Path(path).name
+        if self.index.get(path.name) is not None and path.exists():
+            return path
+        return path if self._restore_cold(path) else None
 
-            # 保存元数据
-            if info:
-                self._save_metadata(cache_path, info)
+    def demote_cold(self, limit: int = 20) -> int:
+        """
+        把超过 cold_after_days 天未使用的图片压缩后移入冷缓存（阻塞直到完成）
 
-            print(f"Downloaded to: {cache_path}")
-            return cache_path
+        Args:
+            limit: 本次最多处理的文件数
 
-        except Exception as e:
-            print(f"Download error: {e}")
-            # 删除不完整的文件
-            if cache_path.exists():
-                cache_path.unlink()
-            return None
+        Returns:
+            移入冷缓存的文件数
+        """
+        if not self.cold_after_days or not pillow_available():
+            return 0
+
+        cutoff = time.time() - self.cold_after_days * 86400
+        candidates = [self.cache_dir / e.name for e in self._evictable()
+                      if e.atime < cutoff][:limit]
+        moved = 0
+        if candidates:
+            # 压缩期间不持有锁；完成后确认文件仍未被使用再替换
+            results = self.cold.demote(candidates, cancel=self._demote_cancel)
+            with self._cleanup_lock, self.index.transaction():
+                in_use = self.index.foreign_refs()
+                for src, (dst, size) in results.items():
+                    entry = self.index.get(src.name)
+                    if (entry is None or entry.atime >= cutoff or src.name in in_use
+                            or self.is_pinned(src) or self.index.is_leased(src.name)):
+                        dst.unlink(missing_ok=True)
+                        continue
+                    self.index.remove(src.name)
+                    src.unlink(missing_ok=True)
+                    self.cold.add(dst)
+                    moved += 1
+                    metrics.inc('cache_demoted_bytes_saved_total', entry.size - size)
+            metrics.inc('cache_demotions_total', moved)
+
+        # 冷缓存超出上限时删除最久未使用的冷文件
+        victims = self.cold.over_budget()
+        for entry in victims:
+            self.cold.remove(entry.name)
+        self._forget([ColdTier.hot_name(e.name) for e in victims])
+        return moved
+
+    def start_demotion(self):
+        """在后台线程中执行 demote_cold（已有任务在运行时忽略）"""
+        if not self.cold_after_days:
+            return
+        if self._demote_thread is not None and self._demote_thread.is_alive():
+            return
+        self._demote_cancel.clear()
+        # 守护线程：退出程序时不等待整轮压缩（见 stop_demotion）
+        self._demote_thread = threading.Thread(target=self.demote_cold, name='cache-demote',
+                                               daemon=True)
+        self._demote_thread.start()
+
+    def stop_demotion(self, timeout: float = 2.0):
+        """停止后台压缩（正在压缩的一张完成后结束，最多等待 timeout 秒）"""
+        self._demote_cancel.set()
+        if self._demote_thread is not None:
+            self._demote_thread.join(timeout)
+
+    def download_many(self, images: List[Dict], max_workers: int = 4,
+                      throttle: Callable[[int], None] = None) -> List[Optional[Path]]:
+        """
+        并发下载多张壁纸
+
+        Args:
+            images: 图片信息列表（需包含 url）
+            max_workers: 最大并发数
+            throttle: 可选的限速回调（见 download）
+
+        Returns:
+            与输入顺序对应的本地路径列表，失败项为 None
+        """
+        if not images:
+            return []
+        with self.metadata.batch(), \
+                ThreadPoolExecutor(max_workers=min(max_workers, len(images))) as pool:
+            return list(pool.map(lambda image: self.download(image['url'], image, throttle),
+                                 images))
 
     def _save_metadata(self, image_path: Path, info: Dict):
-        """保存图片元数据"""
-        metadata_path = image_path.with_suffix('.json')
-        import json
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(info, f, ensure_ascii=False, indent=2)
+        """保存图片元数据并加入检索索引"""
+        self.metadata.put(image_path.name, info)
+        try:
+            self.search_index.add(image_path.name, info)
+        except Exception as e:
+            print(f"Error indexing metadata: {e}")
+
+    def _forget(self, names: List[str]):
+        """删除图片的元数据和检索条目"""
+        if not names:
+            return
+        self.metadata.delete_many(names)
+        try:
+            self.search_index.remove_many(names)
+        except Exception as e:
+            print(f"Error updating search index: {e}")
+
+    def search(self, query: str, limit: int = 50) -> List[Path]:
+        """
+        在缓存图片的元数据中检索（不访问网络）
+
+        Args:
+            query: 关键词，匹配描述、作者、来源、类别和标签
+            limit: 最多返回条数
+
+        Returns:
+            缓存图片路径列表（含冷缓存中的图片）
+        """
+        if not self._search_synced:
+            self._search_synced = True
+            self.search_index.sync(self.metadata.all())
+        names = self.search_index.search(query, limit)
+        # 冷缓存中的图片也保留元数据，返回其热缓存路径（使用前需 restore）
+        return [self.cache_dir / name for name in names
+                if self.index.get(name) is not None or self.cold.find(name) is not None]
+
+    def release_memory(self):
+        """释放元数据的内存副本和检索索引的页缓存（下次使用时重新加载）"""
+        self.metadata.release()
+        self.search_index.release()
 
     def _load_metadata(self, image_path: Path) -> Optional[Dict]:
         """加载图片元数据"""
-        metadata_path = image_path.with_suffix('.json')
-        if not metadata_path.exists():
-            return None
+        return self.metadata.get(Path(image_path).name)
+
+    def get_metadata(self, path) -> Optional[Dict]:
+        """获取缓存图片的元数据"""
+        return self._load_metadata(path)
 
-        import json
+    def content_digest(self, path) -> Optional[str]:
+        """下载时计算的 SHA-256（文件已被改写，如从冷缓存还原后，返回 None）"""
+        info = self._load_metadata(path)
+        if not info or 'sha256' not in info:
+            return None
         try:
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
+            if Path(path).stat().st_size != info.get('bytes'):
+                return None
+        except OSError:
             return None
+        return info['sha256']
+
+    def list_metadata(self) -> Dict[str, Dict]:
+        """所有缓存图片的元数据（文件名 → 元数据，一次读取）"""
+        return self.metadata.all()
 
     def _check_cache_size(self) -> bool:
         """检查缓存是否在限制内"""
-        files = list(self.cache_dir.glob('*.{jpg,png,jpeg,webp}'))
-
-        if len(files) >= self.max_images:
+        if len(self.index) >= self.max_images:
             return False
 
-        total_size = sum(f.stat().st_size for f in files)
-        total_size_mb = total_size / (1024 * 1024)
+        total_size_mb = self.index.total_size() / (1024 * 1024)
 
         return total_size_mb <= self.max_size_mb
 
+    def _evictable(self) -> List[CacheEntry]:
+        """可以淘汰的条目（跳过被固定、被其他进程使用或正在写入的文件），最旧的在前"""
+        in_use = self.index.foreign_refs()
+        entries = [e for e in self.index.entries()
+                   if e.name not in in_use
+                   and not self.is_pinned(self.cache_dir / e.name)
+                   and not self.index.is_leased(e.name)]
+        entries.sort(key=lambda e: e.mtime)
+        return entries
+
+    def _evict(self, entries: List[CacheEntry]):
+        """删除缓存文件及其元数据（调用方持有索引事务）"""
+        for entry in entries:
+            f = self.cache_dir / entry.name
+            self.index.remove(entry.name)
+            f.unlink(missing_ok=True)
+            metrics.inc('cache_evictions_total')
+            print(f"Deleted old cache: {f}")
+        self._forget([e.name for e in entries])
+
     def _cleanup_cache(self):
-        """清理旧缓存文件"""
-        files = list(self.cache_dir.glob('*.{jpg,png,jpeg,webp,json}'))
+        """清理最旧的 20% 缓存文件"""
+        with self.index.transaction():
+            entries = self._evictable()
+            if entries:
+                self._evict(entries[:max(1, len(entries) // 5)])
 
-        if not files:
-            return
+    def _reserve(self, size: int) -> bool:
+        """
+        为即将写入的文件预留缓存空间，超出限制时先淘汰最旧的文件
 
-        # 按修改时间排序
-        files.sort(key=lambda f: f.stat().st_mtime)
+        Args:
+            size: 预计字节数（未知时为 0，只预留一个文件名额）
 
-        # 删除最旧的 20% 文件
-        num_to_delete = max(1, len(files) // 5)
-        for f in files[:num_to_delete]:
-            f.unlink()
-            print(f"Deleted old cache: {f}")
+        Returns:
+            是否预留成功（文件本身超过缓存上限时失败）。
+            被固定或正在使用的文件不会被淘汰，因此它们占满缓存时仍然预留成功，缓存暂时超出限制。
+        """
+        budget = self.max_size_mb * 1024 * 1024
+        if size > budget:
+            return False
+        with self._cleanup_lock, self.index.transaction():
+            excess_bytes = self.index.total_size() + self._reserved_bytes + size - budget
+            excess_count = len(self.index) + self._reserved_count + 1 - self.max_images
+            if excess_bytes > 0 or excess_count > 0:
+                evicted = []
+                for entry in self._evictable():
+                    if excess_bytes <= 0 and excess_count <= 0:
+                        break
+                    evicted.append(entry)
+                    excess_bytes -= entry.size
+                    excess_count -= 1
+                self._evict(evicted)
+                if excess_bytes > 0 or excess_count > 0:
+                    metrics.inc('cache_over_budget_total')
+                    print("Cache limit exceeded: remaining files are pinned or in use")
+
+            self._reserved_bytes += size
+            self._reserved_count += 1
+            return True
+
+    def _release(self, size: int):
+        """释放预留的缓存空间（文件已登记到索引或下载失败）"""
+        with self._cleanup_lock:
+            self._reserved_bytes -= size
+            self._reserved_count -= 1
+
+    def gc(self) -> int:
+        """
+        整理缓存：重建索引，按限制清理到达标，把长期未使用的图片移入冷缓存，
+        并删除孤立的元数据和租约文件
 
-    def get_cached_wallpapers(self) -> list[Path]:
-        """获取所有缓存的壁纸"""
-        return list(self.cache_dir.glob('*.{jpg,png,jpeg,webp}'))
+        Returns:
+            删除的文件数
+        """
+        removed = 0
+        with self._cleanup_lock:
+            self.index.rebuild()
+            while not self._check_cache_size():
+                before = len(self.index)
+                self._cleanup_cache()
+                removed += before - len(self.index)
+                if len(self.index) == before:
+                    break
+
+        removed += self.index.purge_stale_leases()
+
+        # 移入冷缓存，并按冷缓存上限清理
+        cold_before = len(self.cold)
+        moved = self.demote_cold(limit=len(self.index))
+        removed += max(0, cold_before + moved - len(self.cold))
+
+        # 删除没有对应图片的元数据（正在下载的除外）
+        cached = {e.name for e in self.index.entries()} | set(self.cold.names())
+        orphans = [name for name in self.metadata.all()
+                   if name not in cached and not self.index.is_leased(name)]
+        self._forget(orphans)
+        removed += len(orphans)
+
+        self.search_index.sync(self.metadata.all())
+        self._search_synced = True
+
+        return removed
+
+    def get_cached_wallpapers(self, include_cold: bool = False) -> list[Path]:
+        """
+        获取所有缓存的壁纸
+
+        Args:
+            include_cold: 是否包含冷缓存中的图片（返回其热缓存路径，使用前需 restore）
+        """
+        paths = self._list_images()
+        if include_cold:
+            paths += [self.cache_dir / name for name in self.cold.names()]
+        return paths
 
     def clear_cache(self):
-        """清空缓存"""
-        import shutil
-        if self.cache_dir.exists():
-            shutil.rmtree(self.cache_dir)
-            self.cache_dir.mkdir(parents=True, exist_ok=True)
-            print("Cache cleared")
+        """清空缓存（保留锁和索引文件，跳过其他进程正在使用的文件）"""
+        removed = []
+        with self._cleanup_lock, self.index.transaction():
+            in_use = self.index.foreign_refs()
+            for entry in self.index.entries():
+                if entry.name in in_use or self.index.is_leased(entry.name):
+                    continue
+                self.index.remove(entry.name)
+                (self.cache_dir / entry.name).unlink(missing_ok=True)
+                removed.append(entry.name)
+        for entry in self.cold.index.entries():
+            self.cold.remove(entry.name)
+            removed.append(ColdTier.hot_name(entry.name))
+        self._forget(removed)
+        print("Cache cleared")
+
+    def get_tier_sizes(self) -> Dict[str, Dict]:
+        """各缓存层的大小、数量和上限"""
+        return {
+            'hot': {'bytes': self.index.total_size(), 'count': len(self.index),
+                    'max_mb': self.max_size_mb},
+            'cold': {'bytes': self.cold.total_size(), 'count': len(self.cold),
+                     'max_mb': self.cold.max_size_mb},
+        }
 
     def get_cache_size(self) -> str:
-        """获取缓存大小"""
-        files = list(self.cache_dir.glob('*.{jpg,png,jpeg,webp}'))
-        total_size = sum(f.stat().st_size for f in files)
-        total_size_mb = total_size / (1024 * 1024)
-        return f"{total_size_mb:.2f} MB"
+        """获取缓存大小（有冷缓存时分别显示）"""
+        tiers = self.get_tier_sizes()
+        text = f"{tiers['hot']['bytes'] / (1024 * 1024):.2f} MB"
+        if tiers['cold']['count']:
+            text += (f"（冷缓存 {tiers['cold']['bytes'] / (1024 * 1024):.2f} MB / "
+                     f"{tiers['cold']['count']} 张）")
+        return text
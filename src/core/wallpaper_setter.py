@@ -1,14 +1,15 @@
 """
 壁纸设置器
-调用 Windows API 设置桌面壁纸
+设置桌面壁纸，跳过与当前壁纸相同的重复设置
 """
 
 import os
-import ctypes
-from pathlib import Path
-from typing import Optional
+import hashlib
+from typing import Optional, Tuple
 from enum import Enum
 
+from utils.metrics import metrics
+
 
 class WallpaperStyle(Enum):
     """壁纸样式"""
@@ -22,35 +23,81 @@ class WallpaperStyle(Enum):
 
 
 class WallpaperSetter:
-    """壁纸设置器 - Windows API"""
-
-    def __init__(self):
-        self.SPI_SETDESKWALLPAPER = 20
-        self.SPIF_UPDATEINIFILE = 0x01
-        self.SPIF_SENDWININICHANGE = 0x02
-        self.SPIF_SENDCHANGE = 0x02
-
-        # 加载系统库
-        self.user32 = ctypes.windll.user32
-        self.user32.SystemParametersInfoW.restype = ctypes.c_bool
-        self.user32.SystemParametersInfoW.argtypes = [
-            ctypes.c_uint,
-            ctypes.c_uint,
-            ctypes.c_wchar_p,
-            ctypes.c_uint
-        ]
+    """
+    壁纸设置器
+
+    具体的桌面操作委托给后端（见 core.setter_backends），本层记录已应用的
+    路径、内容哈希和样式，三者都未变化时跳过，避免重复写注册表和广播重绘。
+    """
+
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend: SetterBackend 实例，默认按平台自动选择
+
+        Raises:
+            RuntimeError: 当前平台没有可用的后端
+        """
+        if backend is None:
+            from core.setter_backends import create_backend
+            backend = create_backend()
+            if backend is None:
+                raise RuntimeError("No wallpaper backend available on this platform")
+        self.backend = backend
+
+        # 已应用的状态
+        self._applied_path: Optional[str] = None
+        self._applied_stat: Optional[Tuple[int, float]] = None
+        self._applied_hash: Optional[str] = None
+        self._applied_style: Optional[WallpaperStyle] = None
+
+    @staticmethod
+    def _file_hash(image_path: str) -> str:
+        """文件内容的 SHA-256"""
+        sha = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def _is_applied(self, image_path: str, stat: Tuple[int, float]) -> bool:
+        """
+        图片是否与已应用的相同（路径和文件状态相同，或文件被重写但内容相同）
+
+        后端能读取当前壁纸时以其为准：壁纸可能已被用户或其他程序换掉。
+        """
+        if image_path != self._applied_path:
+            return False
+        try:
+            current = self.backend.get_current_wallpaper()
+        except Exception as e:
+            print(f"Error reading current wallpaper: {e}")
+            current = None
+        if current and os.path.normcase(os.path.abspath(current)) != os.path.normcase(image_path):
+            return False
+        if stat == self._applied_stat:
+            return True
+        try:
+            same = self._file_hash(image_path) == self._applied_hash
+        except OSError:
+            return False
+        if same:
+            self._applied_stat = stat
+        return same
 
     def set_wallpaper(self, image_path: str,
-                      style: WallpaperStyle = WallpaperStyle.FILL) -> bool:
+                      style: WallpaperStyle = WallpaperStyle.FILL,
+                      digest: str = None) -> bool:
         """
         设置桌面壁纸
 
         Args:
-            image_path: 图片路径（必须是绝对路径）
+            image_path: 图片路径
             style: 壁纸样式
+            digest: 已知的文件 SHA-256（如下载时计算的），省去重新读取文件
 
         Returns:
-            是否成功
+            是否成功（与当前壁纸相同时直接返回 True）
         """
         if not os.path.exists(image_path):
             print(f"Image not found: {image_path}")
@@ -58,112 +105,45 @@ class WallpaperSetter:
 
         # 转换为绝对路径
         image_path = os.path.abspath(image_path)
-
-        # 设置壁纸样式
-        self._set_style(style)
-
-        try:
-            # 调用 Windows API 设置壁纸
-            result = self.user32.SystemParametersInfoW(
-                self.SPI_SETDESKWALLPAPER,
-                0,
-                image_path,
-                self.SPIF_UPDATEINIFILE | self.SPIF_SENDCHANGE
-            )
-
-            if result:
-                print(f"Wallpaper set: {image_path}")
-                return True
-            else:
-                print("Failed to set wallpaper")
-                return False
-
-        except Exception as e:
-            print(f"Error setting wallpaper: {e}")
+        st = os.stat(image_path)
+        stat = (st.st_size, st.st_mtime)
+
+        image_applied = self._is_applied(image_path, stat)
+        style_applied = style == self._applied_style
+        if image_applied and style_applied:
+            metrics.inc('set_wallpaper_skipped_total')
+            return True
+
+        with metrics.timer('set_wallpaper_seconds'):
+            if not style_applied:
+                # 样式变化后需要重新设置图片才会生效
+                if not self.backend.set_style(style):
+                    return False
+                self._applied_style = style
+            ok = self.backend.set_image(image_path)
+
+        if not ok:
+            self._applied_path = None
             return False
 
-    def _set_style(self, style: WallpaperStyle):
-        """设置壁纸样式"""
-        # Windows 壁纸样式注册表路径
-        # HKEY_CURRENT_USER\Control Panel\Desktop\WallpaperStyle
-        # HKEY_CURRENT_USER\Control Panel\Desktop\TileWallpaper
-
-        import winreg
-
-        try:
-            # 打开注册表
-            key = winreg.OpenKey(
-                winreg.HKEY_CURRENT_USER,
-                r"Control Panel\Desktop",
-                0,
-                winreg.KEY_SET_VALUE
-            )
-
-            # 设置样式值
-            style_values = {
-                WallpaperStyle.CENTER: ("0", "0"),
-                WallpaperStyle.TILE: ("1", "1"),
-                WallpaperStyle.STRETCH: ("2", "0"),
-                WallpaperStyle.KEEP_ASPECT: ("6", "0"),
-                WallpaperStyle.CROP: ("10", "0"),
-                WallpaperStyle.SPAN: ("22", "0")
-            }
-
-            wallpaper_style, tile_wallpaper = style_values.get(
-                style, ("2", "0")
-            )
-
-            winreg.SetValueEx(key, "WallpaperStyle", 0, winreg.REG_SZ, wallpaper_style)
-            winreg.SetValueEx(key, "TileWallpaper", 0, winreg.REG_SZ, tile_wallpaper)
-
-            winreg.CloseKey(key)
-
-        except Exception as e:
-            print(f"Error setting wallpaper style: {e}")
+        if not image_applied:
+            self._applied_path = image_path
+            self._applied_stat = stat
+            try:
+                self._applied_hash = digest or self._file_hash(image_path)
+            except OSError:
+                self._applied_hash = None
+        return True
 
     def get_current_wallpaper(self) -> Optional[str]:
         """获取当前壁纸路径"""
-        import winreg
-
-        try:
-            key = winreg.OpenKey(
-                winreg.HKEY_CURRENT_USER,
-                r"Control Panel\Desktop",
-                0,
-                winreg.KEY_READ
-            )
-
-            wallpaper, _ = winreg.QueryValueEx(key, "Wallpaper")
-            winreg.CloseKey(key)
-
-            return wallpaper
-
-        except Exception as e:
-            print(f"Error getting current wallpaper: {e}")
-            return None
+        return self.backend.get_current_wallpaper()
 
     def refresh_desktop(self):
-        """刷新桌面"""
-        # 发送 WM_SETTINGCHANGE 消息
-        import ctypes
-        from ctypes import wintypes
-
-        HWND_BROADCAST = 0xFFFF
-        WM_SETTINGCHANGE = 0x001A
-        SMTO_BLOCK = 0x0001
-
-        def callback(result, lparam):
-            pass
-
-        self.user32.SendMessageTimeoutW(
-            HWND_BROADCAST,
-            WM_SETTINGCHANGE,
-            0,
-            "Environment",
-            SMTO_BLOCK,
-            5000,
-            callback
-        )
+        """刷新桌面（后端支持时）"""
+        refresh = getattr(self.backend, 'refresh_desktop', None)
+        if refresh is not None:
+            refresh()
 
 
 def set_wallpaper(image_path: str, style: str = "fill") -> bool:
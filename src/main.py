@@ -1,6 +1,17 @@
 #!/usr/bin/env python3
 """
 Wallpaper Changer - Main Entry Point
+
+Without arguments the Qt UI is started. Headless commands
+(daemon, next, prefetch, stats, gc, search) run without importing PyQt5.
+
+GUI options:
+    --tray            start with only the tray icon (used for autostart);
+                      the window is built on first show
+    --startup-report  print import and tray-visible timings
+
+Only one UI instance runs per data directory. A second launch forwards
+"show" (or nothing with --tray) to the running instance and exits.
 """
 
 import sys
@@ -15,28 +26,104 @@ sys.path.insert(0, str(current_dir))
 if getattr(sys, 'frozen', False):
     sys.path.insert(0, sys._MEIPASS)
 
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import Qt
+from utils.startup import profiler
+from utils.file_lock import FileLock
+from utils.single_instance import send_command
+from wallpaper_changer.cli import COMMANDS
 
-from ui.main_window import MainWindow
+# Data directory holding cache/ and history (same as core.components.default_base_dir)
+BASE_DIR = current_dir.parent
 
 
-def main():
-    """Main function"""
-    app = QApplication(sys.argv)
+def run_gui():
+    """Start the Qt UI"""
+    # Hand over to a running instance before paying for any Qt import
+    command = 'ping' if '--tray' in sys.argv else 'show'
+    if send_command(BASE_DIR, command):
+        sys.exit(0)
+
+    # The running instance owns the cache; a second process waits briefly
+    # in case the owner is still starting up and not listening yet
+    cache_lock = FileLock(BASE_DIR / 'cache' / '.lock')
+    if not cache_lock.acquire(timeout=2.0):
+        if send_command(BASE_DIR, command):
+            sys.exit(0)
+        print("Another Wallpaper Changer instance is using the cache", file=sys.stderr)
+        sys.exit(1)
+
+    # Timed in dependency order so each entry is the module's own cost
+    QtWidgets = profiler.import_module('PyQt5.QtWidgets')
+    QtCore = profiler.import_module('PyQt5.QtCore')
+    profiler.import_module('models.config')
+    profiler.import_module('core.components')
+    main_window = profiler.import_module('ui.main_window')
+    from ui.instance_server import InstanceServer
+    from utils.screen_info import ScreenInfo
+    from utils.metrics import metrics
+
+    # Enable high DPI scaling (must be set before the application is created)
+    QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_EnableHighDpiScaling, True)
+    QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_UseHighDpiPixmaps, True)
+
+    app = QtWidgets.QApplication(sys.argv)
     app.setApplicationName("Wallpaper Changer")
     app.setOrganizationName("PanCodeInventory")
+    profiler.mark('qapplication')
+
+    # Cache screen topology; refreshed only on display change signals
+    ScreenInfo.install_change_hooks()
 
-    # Enable high DPI scaling
-    app.setAttribute(Qt.AA_EnableHighDpiScaling, True)
-    app.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
+    # Create main window (in tray mode only the tray icon and scheduler)
+    window = main_window.MainWindow(start_minimized=True)
+    config = window.config
 
-    # Create main window
-    window = MainWindow()
-    window.show()
+    instance_server = InstanceServer(BASE_DIR, window)
+    instance_server.command_received.connect(window.handle_command)
+    instance_server.listen()
+
+    # Log GUI thread stalls with the blocking Python stack
+    if config.is_watchdog_enabled():
+        from ui.stall_monitor import StallMonitor
+        stall_monitor = StallMonitor(threshold_ms=config.get_watchdog_threshold_ms(),
+                                     log_path=BASE_DIR / config.get_watchdog_log_path(),
+                                     parent=window)
+        # Start once the event loop runs so startup work is not reported as a stall
+        QtCore.QTimer.singleShot(0, stall_monitor.start)
+
+    start_minimized = '--tray' in sys.argv or config.is_start_minimized()
+    if start_minimized:
+        # Dialogs shown while the window is hidden must not quit the app
+        app.setQuitOnLastWindowClosed(False)
+    else:
+        window.show_window()
+    profiler.mark('window_shown' if not start_minimized else 'tray_ready')
+
+    def report_startup():
+        profiler.mark('event_loop')
+        budget_ms = config.get_startup_budget_ms()
+        profiler.record_metrics(metrics)
+        if '--startup-report' in sys.argv:
+            print(profiler.report(budget_ms))
+        elif not profiler.within_budget(budget_ms):
+            print(f"Startup over budget ({budget_ms} ms), run with --startup-report for details")
+
+    QtCore.QTimer.singleShot(0, report_startup)
 
     sys.exit(app.exec_())
 
 
+def main():
+    """Main function"""
+    if any(arg in COMMANDS for arg in sys.argv[1:]):
+        from wallpaper_changer.cli import main as cli_main
+        sys.exit(cli_main())
+
+    run_gui()
+
+
 if __name__ == "__main__":
+    if getattr(sys, 'frozen', False):
+        # The cold cache recompresses images in worker processes
+        import multiprocessing
+        multiprocessing.freeze_support()
     main()
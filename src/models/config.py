@@ -2,9 +2,10 @@
 配置管理
 """
 
+import copy
 import json
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 
 class Config:
@@ -29,33 +30,87 @@ class Config:
         "cache": {
             "enabled": True,
             "max_size_mb": 500,
-            "max_images": 50
+            "max_images": 50,
+            "max_image_mb": 50,
+            "revalidate_after_days": 30,
+            "api_max_age_s": 3600,
+            "cold": {
+                "after_days": 0,
+                "max_size_mb": 500,
+                "format": "webp",
+                "quality": 80
+            }
+        },
+        "history": {
+            "max_entries": 50
+        },
+        "metrics": {
+            "enabled": False,
+            "export_path": "metrics.prom"
         },
         "wallpaper_mode": "fill",
-        "auto_start": True
+        "setter_backend": "auto",
+        "download": {
+            "background_limit_kbps": 0
+        },
+        "rotation": {
+            "mode": "online"
+        },
+        "hedging": {
+            "enabled": True,
+            "percentile": 95,
+            "budget": 0.1
+        },
+        "prewarm": {
+            "enabled": True,
+            "lead_seconds": 30,
+            "fetch_metadata": False
+        },
+        "auto_start": True,
+        "watchdog": {
+            "enabled": True,
+            "threshold_ms": 500,
+            "log_path": "stalls.log"
+        },
+        "startup": {
+            "minimized": False,
+            "budget_ms": 1000
+        },
+        "memory": {
+            "ceiling_mb": 150,
+            "check_interval_s": 60,
+            "release_after_hidden_s": 30,
+            "thumbnail_cache_mb": 32,
+            "pixmap_cache_mb": 10,
+            "tracemalloc_frames": 0
+        }
     }
 
     def __init__(self, config_path: str = "config.json"):
         self.config_path = Path(config_path)
+        # 订阅者列表：(关注的键前缀, 回调)
+        self._observers: List[Tuple[Tuple[str, ...], Callable[[Dict], None]]] = []
+        self._mtime: Optional[float] = None
         self.config = self._load_config()
 
     def _load_config(self) -> Dict:
         """加载配置文件"""
         if self.config_path.exists():
             try:
+                self._mtime = self.config_path.stat().st_mtime
                 with open(self.config_path, 'r', encoding='utf-8') as f:
                     config = json.load(f)
                 # 合并默认配置，确保所有字段存在
                 return self._merge_config(self.DEFAULT_CONFIG, config)
             except Exception as e:
                 print(f"Error loading config: {e}")
-                return self.DEFAULT_CONFIG.copy()
+                return copy.deepcopy(self.DEFAULT_CONFIG)
         else:
-            return self.DEFAULT_CONFIG.copy()
+            return copy.deepcopy(self.DEFAULT_CONFIG)
 
     def _merge_config(self, default: Dict, user: Dict) -> Dict:
         """合并配置（递归）"""
-        result = default.copy()
+        result = copy.deepcopy(default)
         for key, value in user.items():
             if key in result and isinstance(result[key], dict) and isinstance(value, dict):
                 result[key] = self._merge_config(result[key], value)
@@ -68,10 +123,87 @@ class Config:
         try:
             with open(self.config_path, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, ensure_ascii=False, indent=2)
+            self._mtime = self.config_path.stat().st_mtime
             print(f"Config saved to: {self.config_path}")
         except Exception as e:
             print(f"Error saving config: {e}")
 
+    def subscribe(self, keys: List[str], callback: Callable[[Dict], None]):
+        """
+        订阅配置变更
+
+        Args:
+            keys: 关注的配置键（支持前缀，如 "cache" 匹配 "cache.max_size_mb"）
+            callback: 回调函数，参数为 {键: (旧值, 新值)}，仅包含关注的键
+        """
+        self._observers.append((tuple(keys), callback))
+
+    def unsubscribe(self, callback: Callable[[Dict], None]):
+        """取消订阅"""
+        self._observers = [(keys, cb) for keys, cb in self._observers if cb != callback]
+
+    def reload(self) -> Dict:
+        """
+        重新读取配置文件，并通知变更的订阅者
+
+        Returns:
+            变更字典 {键: (旧值, 新值)}
+        """
+        try:
+            mtime = self.config_path.stat().st_mtime
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                user = json.load(f)
+        except Exception as e:
+            # 文件可能正在被编辑器写入，保留当前配置
+            print(f"Error reloading config: {e}")
+            return {}
+
+        old = self.config
+        self._mtime = mtime
+        self.config = self._merge_config(self.DEFAULT_CONFIG, user)
+        changes = self._diff(old, self.config)
+        if changes:
+            print(f"Config reloaded: {', '.join(sorted(changes))}")
+            self._notify(changes)
+        return changes
+
+    def reload_if_changed(self) -> Dict:
+        """文件修改时间变化时才重新加载（供无文件监视器的场景轮询）"""
+        try:
+            mtime = self.config_path.stat().st_mtime
+        except OSError:
+            return {}
+        if mtime == self._mtime:
+            return {}
+        return self.reload()
+
+    def _diff(self, old: Dict, new: Dict, prefix: str = '') -> Dict:
+        """比较两份配置，返回叶子键的变更"""
+        changes = {}
+        for key in set(old) | set(new):
+            path = f"{prefix}{key}"
+            old_value = old.get(key)
+            new_value = new.get(key)
+            if isinstance(old_value, dict) and isinstance(new_value, dict):
+                changes.update(self._diff(old_value, new_value, f"{path}."))
+            elif old_value != new_value:
+                changes[path] = (old_value, new_value)
+        return changes
+
+    def _notify(self, changes: Dict):
+        """通知关注了变更键的订阅者"""
+        for keys, callback in list(self._observers):
+            relevant = {
+                path: change for path, change in changes.items()
+                if any(path == k or path.startswith(f"{k}.") for k in keys)
+            }
+            if not relevant:
+                continue
+            try:
+                callback(relevant)
+            except Exception as e:
+                print(f"Error in config observer: {e}")
+
     def get(self, key: str, default=None):
         """获取配置值"""
         keys = key.split('.')
@@ -87,17 +219,34 @@ class Config:
 
     def set(self, key: str, value):
         """设置配置值"""
-        keys = key.split('.')
-        config = self.config
+        self.update({key: value})
+
+    def update(self, values: Dict[str, Any]):
+        """
+        批量设置配置值，只保存一次并通知订阅者
+
+        Args:
+            values: {点分键: 值}
+        """
+        old = copy.deepcopy(self.config)
+
+        for key, value in values.items():
+            keys = key.split('.')
+            config = self.config
+
+            for k in keys[:-1]:
+                if k not in config:
+                    config[k] = {}
+                config = config[k]
 
-        for k in keys[:-1]:
-            if k not in config:
-                config[k] = {}
-            config = config[k]
+            config[keys[-1]] = value
 
-        config[keys[-1]] = value
         self.save()
 
+        changes = self._diff(old, self.config)
+        if changes:
+            self._notify(changes)
+
     def get_update_frequency(self) -> str:
         """获取更新频率"""
         return self.get('update_frequency', 'daily')
@@ -149,10 +298,137 @@ class Config:
         """获取缓存最大图片数"""
         return self.get('cache.max_images', 50)
 
+    def get_cache_max_image_size(self) -> float:
+        """获取单张图片大小上限（MB），超过的图片不下载"""
+        return self.get('cache.max_image_mb', 50)
+
+    def get_cache_revalidate_days(self) -> float:
+        """获取缓存图片的重新验证间隔（天），0 表示不重新验证"""
+        return self.get('cache.revalidate_after_days', 30)
+
+    def get_api_cache_max_age(self) -> float:
+        """获取搜索结果缓存的新鲜期（秒），过期后向服务器重新验证"""
+        return self.get('cache.api_max_age_s', 3600)
+
+    def get_cold_cache_settings(self) -> Dict[str, Any]:
+        """
+        获取冷缓存设置
+
+        after_days   超过该天数未使用的图片压缩后移入冷缓存（默认 0，不使用冷缓存：
+                     重新压缩是有损的，需要用户主动开启）
+        max_size_mb  冷缓存大小上限
+        format       压缩格式（webp/avif/jpeg）
+        quality      压缩质量
+        """
+        return {
+            'after_days': self.get('cache.cold.after_days', 0),
+            'max_size_mb': self.get('cache.cold.max_size_mb', 500),
+            'format': self.get('cache.cold.format', 'webp'),
+            'quality': self.get('cache.cold.quality', 80),
+        }
+
+    def get_history_max_entries(self) -> int:
+        """获取历史记录最大条数"""
+        return self.get('history.max_entries', 50)
+
+    def is_metrics_enabled(self) -> bool:
+        """是否启用性能指标"""
+        return self.get('metrics.enabled', False)
+
+    def get_metrics_export_path(self) -> str:
+        """获取指标导出路径（.json 为 JSON，其它为 Prometheus 文本格式）"""
+        return self.get('metrics.export_path', 'metrics.prom')
+
     def get_wallpaper_mode(self) -> str:
         """获取壁纸显示模式"""
         return self.get('wallpaper_mode', 'fill')
 
+    def get_setter_backend(self) -> str:
+        """获取壁纸设置后端（auto/windows/gsettings/feh/recording）"""
+        return self.get('setter_backend', 'auto')
+
+    def get_background_limit_kbps(self) -> int:
+        """获取后台预下载的带宽上限（KB/s，0 表示不限）"""
+        return self.get('download.background_limit_kbps', 0)
+
+    def get_rotation_mode(self) -> str:
+        """
+        获取轮换模式
+
+        online         每次从网络获取新壁纸，失败时从缓存轮换
+        offline_first  优先从缓存轮换，本轮缓存全部显示过后再获取新壁纸
+        offline        只从缓存轮换
+        """
+        return self.get('rotation.mode', 'online')
+
+    def is_hedging_enabled(self) -> bool:
+        """获取图片信息超时时是否向第二个源发出对冲请求"""
+        return self.get('hedging.enabled', True)
+
+    def get_hedge_percentile(self) -> float:
+        """获取对冲触发延迟（该源已观测延迟的百分位）"""
+        return self.get('hedging.percentile', 95)
+
+    def get_hedge_budget(self) -> float:
+        """获取对冲请求上限（占请求数的比例）"""
+        return self.get('hedging.budget', 0.1)
+
+    def is_prewarm_enabled(self) -> bool:
+        """定时更换前是否预热网络连接"""
+        return self.get('prewarm.enabled', True)
+
+    def get_prewarm_lead_seconds(self) -> float:
+        """获取预热提前的秒数"""
+        return self.get('prewarm.lead_seconds', 30)
+
+    def is_prewarm_metadata_enabled(self) -> bool:
+        """预热时是否预先获取壁纸信息"""
+        return self.get('prewarm.fetch_metadata', False)
+
     def is_auto_start(self) -> bool:
         """是否开机自启动"""
         return self.get('auto_start', True)
+
+    def is_start_minimized(self) -> bool:
+        """启动时是否只显示托盘图标"""
+        return self.get('startup.minimized', False)
+
+    def get_startup_budget_ms(self) -> int:
+        """获取启动耗时预算（毫秒，托盘图标可见的时间）"""
+        return self.get('startup.budget_ms', 1000)
+
+    def is_watchdog_enabled(self) -> bool:
+        """是否监测界面卡顿"""
+        return self.get('watchdog.enabled', True)
+
+    def get_watchdog_threshold_ms(self) -> int:
+        """获取界面卡顿阈值（毫秒）"""
+        return self.get('watchdog.threshold_ms', 500)
+
+    def get_watchdog_log_path(self) -> str:
+        """获取卡顿日志路径（相对路径相对于数据目录）"""
+        return self.get('watchdog.log_path', 'stalls.log')
+
+    def get_memory_ceiling_mb(self) -> float:
+        """获取常驻内存上限（MB，0 表示不限制）"""
+        return self.get('memory.ceiling_mb', 150)
+
+    def get_memory_check_interval(self) -> float:
+        """获取内存检查间隔（秒）"""
+        return self.get('memory.check_interval_s', 60)
+
+    def get_release_after_hidden(self) -> float:
+        """窗口隐藏多久后释放预览和界面（秒）"""
+        return self.get('memory.release_after_hidden_s', 30)
+
+    def get_thumbnail_cache_mb(self) -> float:
+        """获取壁纸库缩略图缓存上限（MB）"""
+        return self.get('memory.thumbnail_cache_mb', 32)
+
+    def get_pixmap_cache_mb(self) -> float:
+        """获取 Qt 全局位图缓存上限（MB）"""
+        return self.get('memory.pixmap_cache_mb', 10)
+
+    def get_tracemalloc_frames(self) -> int:
+        """tracemalloc 保存的栈帧数（0 表示不启用）"""
+        return self.get('memory.tracemalloc_frames', 0)
@@ -0,0 +1,274 @@
+"""
+缓存壁纸库
+基于 QListView 的虚拟化视图，只为可见行异步加载缩略图
+"""
+
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Optional
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QListView,
+                             QPushButton, QLabel, QLineEdit, QAbstractItemView)
+from PyQt5.QtCore import (Qt, QAbstractListModel, QModelIndex, QObject, QRunnable,
+                          QThreadPool, QSize, QTimer, pyqtSignal)
+from PyQt5.QtGui import QImage, QImageReader, QPixmap, QColor
+
+THUMBNAIL_SIZE = QSize(192, 108)
+
+
+class ThumbnailCache:
+    """缩略图 LRU 缓存（按字节数限制）"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, QPixmap]" = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _cost(pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+    def get(self, key: str) -> Optional[QPixmap]:
+        pixmap = self._items.get(key)
+        if pixmap is not None:
+            self._items.move_to_end(key)
+        return pixmap
+
+    def put(self, key: str, pixmap: QPixmap):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._bytes -= self._cost(old)
+        self._items[key] = pixmap
+        self._bytes += self._cost(pixmap)
+
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= self._cost(evicted)
+
+    def clear(self):
+        self._items.clear()
+        self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+class _ThumbnailSignals(QObject):
+    """缩略图任务信号（QRunnable 不是 QObject）"""
+    loaded = pyqtSignal(str, QImage)
+
+
+class _ThumbnailTask(QRunnable):
+    """在工作线程中按缩小尺寸解码图片（只产出 QImage，QPixmap 必须在 GUI 线程创建）"""
+
+    def __init__(self, path: str, source: str, size: QSize, signals: _ThumbnailSignals):
+        super().__init__()
+        self.path = path
+        self.source = source
+        self.size = size
+        self.signals = signals
+
+    def run(self):
+        image = QImage()
+        try:
+            reader = QImageReader(self.source)
+            reader.setAutoTransform(True)
+            source_size = reader.size()
+            if source_size.isValid():
+                # JPEG 可直接按缩小尺寸解码，避免解出整张大图
+                reader.setScaledSize(source_size.scaled(self.size, Qt.KeepAspectRatio))
+            image = reader.read()
+        except Exception as e:
+            print(f"Error loading thumbnail: {e}")
+        self.signals.loaded.emit(self.path, image)
+
+
+class CacheGalleryModel(QAbstractListModel):
+    """缓存索引的列表模型"""
+
+    PathRole = Qt.UserRole + 1
+
+    # 待加载队列上限：快速滚动时丢弃最早的请求（多半已滚出视野）
+    MAX_QUEUED = 64
+
+    def __init__(self, downloader, thumbnail_cache: ThumbnailCache = None, parent=None):
+        super().__init__(parent)
+        self.downloader = downloader
+        self.thumbnails = thumbnail_cache or ThumbnailCache()
+        self._paths = []
+        self._rows = {}
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self._queue = deque()
+        self._pending = set()
+        self._active = 0
+        self._signals = _ThumbnailSignals()
+        self._signals.loaded.connect(self._on_loaded)
+
+        self._placeholder = QPixmap(THUMBNAIL_SIZE)
+        self._placeholder.fill(QColor('#e0e0e0'))
+        # 无法解码的图片也缓存一个占位图，避免每次重绘都重新解码
+        self._broken = QPixmap(THUMBNAIL_SIZE)
+        self._broken.fill(QColor('#c0c0c0'))
+
+        self.reload()
+
+    def reload(self):
+        """从缓存索引重新加载列表（含冷缓存中的图片）"""
+        self.set_paths([str(path) for path in
+                        self.downloader.get_cached_wallpapers(include_cold=True)])
+
+    def set_filter(self, query: str):
+        """按关键词过滤（检索本地元数据），空字符串显示全部"""
+        query = query.strip()
+        if not query:
+            self.reload()
+            return
+        self.set_paths([str(path) for path in self.downloader.search(query, limit=10_000)])
+
+    def set_paths(self, paths):
+        """替换显示的图片列表"""
+        self.beginResetModel()
+        self._paths = list(paths)
+        self._rows = {path: row for row, path in enumerate(self._paths)}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self._paths[index.row()]
+
+        if role == Qt.DecorationRole:
+            pixmap = self.thumbnails.get(path)
+            if pixmap is None:
+                self._request(path)
+                return self._placeholder
+            return pixmap
+        if role == Qt.ToolTipRole:
+            return Path(path).name
+        if role == self.PathRole:
+            return path
+        return None
+
+    def _request(self, path: str):
+        """请求加载缩略图（视图只会为可见行调用 data）"""
+        if path in self._pending:
+            return
+        self._pending.add(path)
+        self._queue.append(path)
+        while len(self._queue) > self.MAX_QUEUED:
+            self._pending.discard(self._queue.popleft())
+        self._dispatch()
+
+    def _dispatch(self):
+        """按后进先出启动任务，优先加载最近滚动到的行"""
+        while self._queue and self._active < self._pool.maxThreadCount():
+            path = self._queue.pop()
+            # 冷缓存中的图片直接从重新压缩的文件生成缩略图，不还原
+            source = self.downloader.locate(path) or path
+            self._active += 1
+            self._pool.start(_ThumbnailTask(path, str(source), THUMBNAIL_SIZE, self._signals))
+
+    def _on_loaded(self, path: str, image: QImage):
+        self._active -= 1
+        self._pending.discard(path)
+
+        self.thumbnails.put(path, self._broken if image.isNull() else QPixmap.fromImage(image))
+        row = self._rows.get(path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+        self._dispatch()
+
+    def shutdown(self):
+        """停止加载"""
+        self._queue.clear()
+        self._pending.clear()
+        self._pool.clear()
+        self._pool.waitForDone(1000)
+
+
+class GalleryDialog(QDialog):
+    """壁纸库对话框"""
+
+    wallpaper_selected = pyqtSignal(str)
+
+    def __init__(self, downloader, parent=None, thumbnail_mb: float = 64):
+        super().__init__(parent)
+        self.downloader = downloader
+        self.model = CacheGalleryModel(
+            downloader, ThumbnailCache(int(thumbnail_mb * 1024 * 1024)), parent=self)
+        self.init_ui()
+
+    def init_ui(self):
+        """初始化界面"""
+        self.setWindowTitle("壁纸库")
+        self.resize(900, 600)
+
+        layout = QVBoxLayout(self)
+
+        # 检索框（输入停顿后再查询）
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索描述、作者、来源、类别或标签")
+        self.search_edit.setClearButtonEnabled(True)
+        layout.addWidget(self.search_edit)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self._apply_filter)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+
+        self.view = QListView()
+        self.view.setViewMode(QListView.IconMode)
+        self.view.setMovement(QListView.Static)
+        self.view.setResizeMode(QListView.Adjust)
+        self.view.setIconSize(THUMBNAIL_SIZE)
+        self.view.setGridSize(THUMBNAIL_SIZE + QSize(12, 12))
+        # 统一尺寸 + 分批布局：上万条目时也只计算可见区域
+        self.view.setUniformItemSizes(True)
+        self.view.setLayoutMode(QListView.Batched)
+        self.view.setBatchSize(200)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setModel(self.model)
+        self.view.doubleClicked.connect(self._apply_index)
+        layout.addWidget(self.view)
+
+        button_layout = QHBoxLayout()
+        self.count_label = QLabel(f"共 {self.model.rowCount()} 张")
+        self.apply_btn = QPushButton("设为壁纸")
+        self.close_btn = QPushButton("关闭")
+        button_layout.addWidget(self.count_label)
+        button_layout.addStretch()
+        button_layout.addWidget(self.apply_btn)
+        button_layout.addWidget(self.close_btn)
+        layout.addLayout(button_layout)
+
+        self.apply_btn.clicked.connect(self._apply_selected)
+        self.close_btn.clicked.connect(self.close)
+
+    def _apply_filter(self):
+        self.model.set_filter(self.search_edit.text())
+        self.count_label.setText(f"共 {self.model.rowCount()} 张")
+
+    def _apply_selected(self):
+        indexes = self.view.selectionModel().selectedIndexes()
+        if indexes:
+            self._apply_index(indexes[0])
+
+    def _apply_index(self, index: QModelIndex):
+        path = index.data(CacheGalleryModel.PathRole)
+        if path:
+            self.wallpaper_selected.emit(path)
+
+    def closeEvent(self, event):
+        """关闭时停止加载并释放缩略图"""
+        self.model.shutdown()
+        self.model.thumbnails.clear()
+        super().closeEvent(event)
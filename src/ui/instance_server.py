@@ -0,0 +1,57 @@
+"""
+单实例服务器
+在运行中的界面实例里监听本地套接字，接收重复启动转发来的命令
+"""
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+from utils.single_instance import server_name, INSTANCE_COMMANDS
+
+
+class InstanceServer(QObject):
+    """接收其他进程转发的命令（show/next/refresh/ping）"""
+
+    command_received = pyqtSignal(str)
+
+    def __init__(self, base_dir, parent=None):
+        super().__init__(parent)
+        self.name = server_name(base_dir)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self._on_new_connection)
+
+    def listen(self) -> bool:
+        """
+        开始监听
+
+        调用方应已持有缓存锁：此时残留的套接字只可能来自崩溃的旧实例，可以直接移除。
+        """
+        QLocalServer.removeServer(self.name)
+        if not self.server.listen(self.name):
+            print(f"Instance server failed to listen: {self.server.errorString()}")
+            return False
+        return True
+
+    def close(self):
+        """停止监听"""
+        self.server.close()
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda s=socket: self._on_ready_read(s))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def _on_ready_read(self, socket: QLocalSocket):
+        if not socket.canReadLine():
+            return
+        command = bytes(socket.readLine()).decode('utf-8', 'replace').strip()
+        socket.write(b'+')
+        socket.flush()
+        socket.disconnectFromServer()
+
+        if command.split(' ', 1)[0] in INSTANCE_COMMANDS:
+            self.command_received.emit(command)
+        else:
+            print(f"Ignoring unknown instance command: {command!r}")
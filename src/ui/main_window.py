@@ -3,35 +3,59 @@
 """
 
 import sys
-import random
-import platform
+import threading
 from pathlib import Path
-from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QSystemTrayIcon, QMenu, QAction,
                              QStatusBar, QMessageBox, QInputDialog, QComboBox,
                              QSpinBox, QTimeEdit, QCheckBox, QGroupBox,
                              QFormLayout, QLineEdit, QDialog, QDialogButtonBox)
-from PyQt5.QtCore import Qt, QTimer, QTime
-from PyQt5.QtGui import QIcon, QPixmap
+from PyQt5.QtCore import Qt, QTimer, QTime, QFileSystemWatcher, QObject, pyqtSignal
+from PyQt5.QtGui import QIcon, QImageReader, QPixmap, QPixmapCache
 from PyQt5.QtCore import QSize
 from PyQt5.QtWidgets import QDesktopWidget
 
 from models.config import Config
-from core.wallpaper_api import UnsplashAPI, WallhavenAPI
-from core.wallpaper_downloader import WallpaperDownloader
-
-# Windows特定导入
-if platform.system() == 'Windows':
-    from core.wallpaper_setter import WallpaperSetter, WallpaperStyle
-else:
-    # 非Windows平台的占位符
-    class WallpaperSetter:
-        pass
-    class WallpaperStyle:
-        pass
-
-from core.scheduler import WallpaperScheduler
+from core.components import AppComponents
+from core.changer import WallpaperChangeError
+
 from utils.screen_info import ScreenInfo
+from utils.metrics import metrics
+from utils.startup import profiler
+
+# 刷新壁纸库时预下载的数量
+PREFETCH_COUNT = 3
+
+
+class _TaskSignals(QObject):
+    """后台任务信号（从工作线程发出，在 GUI 线程中处理）"""
+    status = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+
+class _BackgroundTask:
+    """
+    在守护线程中执行更换/预下载，结果通过信号交回 GUI 线程
+
+    限速等待只推迟后台工作，不阻塞界面；守护线程不会阻止程序退出。
+    """
+
+    def __init__(self, func, signals: _TaskSignals):
+        self.func = func
+        self.signals = signals
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            result = self.func(self.signals.status.emit)
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+
+    def start(self):
+        self.thread.start()
 
 
 class SettingsDialog(QDialog):
@@ -140,68 +164,103 @@ class SettingsDialog(QDialog):
 class MainWindow(QMainWindow):
     """主窗口"""
 
-    def __init__(self):
+    def __init__(self, start_minimized: bool = False):
+        """
+        Args:
+            start_minimized: 只创建托盘图标和调度器，窗口在第一次显示时才构建
+        """
         super().__init__()
 
-        # 检查平台
-        if platform.system() != 'Windows':
+        self._ui_ready = False
+        self._pending_preview = None
+        self._preview_path = None
+        # 正在运行的后台任务（'change' / 'prefetch'），同类任务同时只运行一个
+        self._tasks = {}
+
+        self.init_components()
+
+        # 检查是否有可用的壁纸设置后端
+        if self.setter is None:
             QMessageBox.critical(
                 self,
                 "平台不支持",
-                "此应用仅支持 Windows 平台。"
+                "当前平台没有可用的壁纸设置方式。\n"
+                "支持 Windows，以及安装了 gsettings（GNOME）或 feh 的 Linux。"
             )
             sys.exit(1)
 
-        self.init_components()
-        self.init_ui()
         self.init_tray()
+        if not start_minimized:
+            self.ensure_ui()
 
     def init_components(self):
         """初始化组件"""
-        # 配置
-        self.config = Config()
-
-        # 下载器
-        cache_dir = Path(__file__).parent.parent.parent / "cache"
-        cache_dir.mkdir(parents=True, exist_ok=True)
-
-        self.downloader = WallpaperDownloader(
-            cache_dir=str(cache_dir),
-            max_size_mb=self.config.get_cache_max_size(),
-            max_images=self.config.get_cache_max_images()
-        )
-
-        # API
-        unsplash_key = self.config.get_api_key('unsplash')
-        wallhaven_key = self.config.get_api_key('wallhaven')
-
-        self.apis = {}
-
-        if unsplash_key:
-            self.apis['unsplash'] = UnsplashAPI(unsplash_key)
-
-        if wallhaven_key:
-            self.apis['wallhaven'] = WallhavenAPI(wallhaven_key)
-
-        # 设置器
-        self.setter = WallpaperSetter()
-
-        # 调度器
-        self.scheduler = WallpaperScheduler()
+        # 与界面无关的组件（配置、下载器、API、设置器、历史、更换流程、调度器）
+        self.components = AppComponents()
+        self.config = self.components.config
+        self.downloader = self.components.downloader
+        self.apis = self.components.apis
+        self.setter = self.components.setter
+        self.history = self.components.history
+        self.changer = self.components.changer
+        self.scheduler = self.components.scheduler
+
+        # 调度器由 GUI 事件循环驱动
         self.scheduler.set_update_callback(self.change_wallpaper)
-
-        # 配置调度
-        freq = self.config.get_update_frequency()
-        if freq == 'daily':
-            self.scheduler.schedule_daily(self.config.get_update_time())
-        else:
-            self.scheduler.schedule_hourly(self.config.get_interval_hours())
-
-        # 启动调度器
         self.scheduler.start()
-
-        # 当前壁纸历史
-        self.wallpaper_history = []
+        self.scheduler_timer = QTimer(self)
+        self.scheduler_timer.setInterval(1000)
+        self.scheduler_timer.timeout.connect(self.scheduler.run_pending)
+        self.scheduler_timer.start()
+
+        # 内存上限：与调度共用定时器（检查间隔由 MemoryManager 控制）
+        self.memory = self.components.memory
+        self.memory.register('ui', self.release_ui)
+        self.memory.register('pixmaps', QPixmapCache.clear)
+        self.scheduler_timer.timeout.connect(self.memory.poll)
+        self._apply_memory_budgets()
+
+        # 窗口隐藏一段时间后释放预览、界面和缓存，再次显示时重建
+        self.release_timer = QTimer(self)
+        self.release_timer.setSingleShot(True)
+        self.release_timer.timeout.connect(self.memory.release)
+
+        self.config.subscribe(['metrics'], self._on_metrics_config_changed)
+        self.config.subscribe(['memory'], self._on_memory_config_changed)
+
+        # 监视配置文件，外部修改时热加载（去抖，编辑器保存可能触发多次）
+        self.config_reload_timer = QTimer(self)
+        self.config_reload_timer.setSingleShot(True)
+        self.config_reload_timer.setInterval(200)
+        self.config_reload_timer.timeout.connect(self._reload_config)
+
+        self.config_watcher = QFileSystemWatcher(self)
+        if self.config.config_path.exists():
+            self.config_watcher.addPath(str(self.config.config_path))
+        self.config_watcher.fileChanged.connect(self._on_config_file_changed)
+
+    def _on_metrics_config_changed(self, changes: dict):
+        """指标配置变更"""
+        self._update_metrics_label()
+
+    def _on_memory_config_changed(self, changes: dict):
+        """内存配置变更"""
+        self._apply_memory_budgets()
+
+    def _apply_memory_budgets(self):
+        """设置 Qt 全局位图缓存上限"""
+        QPixmapCache.setCacheLimit(int(self.config.get_pixmap_cache_mb() * 1024))
+
+    def _on_config_file_changed(self, path: str):
+        """配置文件被修改"""
+        # 编辑器可能以替换文件的方式保存，需要重新加入监视
+        if path not in self.config_watcher.files() and Path(path).exists():
+            self.config_watcher.addPath(path)
+        self.config_reload_timer.start()
+
+    def _reload_config(self):
+        """热加载配置文件"""
+        self.config.reload()
 
     def init_ui(self):
         """初始化界面"""
@@ -236,10 +295,12 @@ class MainWindow(QMainWindow):
         self.prev_btn = QPushButton("上一张壁纸")
         self.settings_btn = QPushButton("设置")
         self.refresh_btn = QPushButton("刷新壁纸库")
+        self.gallery_btn = QPushButton("壁纸库")
 
         button_layout.addWidget(self.prev_btn)
         button_layout.addWidget(self.next_btn)
         button_layout.addWidget(self.refresh_btn)
+        button_layout.addWidget(self.gallery_btn)
         button_layout.addWidget(self.settings_btn)
 
         layout.addLayout(button_layout)
@@ -255,11 +316,79 @@ class MainWindow(QMainWindow):
         self.setStatusBar(self.statusBar)
         self.statusBar.showMessage("欢迎使用壁纸更换器！")
 
+        # 各阶段耗时摘要（启用指标时显示）
+        self.metrics_label = QLabel()
+        self.metrics_label.setStyleSheet("color: #666;")
+        self.statusBar.addPermanentWidget(self.metrics_label)
+
         # 连接信号
         self.next_btn.clicked.connect(self.on_next_wallpaper)
         self.prev_btn.clicked.connect(self.on_prev_wallpaper)
         self.settings_btn.clicked.connect(self.on_settings)
         self.refresh_btn.clicked.connect(self.on_refresh)
+        self.gallery_btn.clicked.connect(self.on_gallery)
+
+    def ensure_ui(self):
+        """构建窗口界面（只执行一次）"""
+        if self._ui_ready:
+            return
+        self.init_ui()
+        self._ui_ready = True
+        self._update_metrics_label()
+        if self._pending_preview is not None:
+            self._update_preview(self._pending_preview)
+            self._pending_preview = None
+
+    def release_ui(self):
+        """拆除隐藏窗口的界面和预览位图（再次显示时由 ensure_ui 重建）"""
+        if not self._ui_ready or self.isVisible():
+            return
+        self._ui_ready = False
+        self._pending_preview = self._preview_path
+        central = self.takeCentralWidget()
+        if central is not None:
+            central.deleteLater()
+        self.setStatusBar(None)
+
+    def showEvent(self, event):
+        """显示时取消待执行的释放，界面已被拆除时重建"""
+        self.release_timer.stop()
+        self.ensure_ui()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        """隐藏（包括关闭到托盘）一段时间后释放内存"""
+        super().hideEvent(event)
+        self.release_timer.start(int(self.config.get_release_after_hidden() * 1000))
+
+    def show_window(self):
+        """显示窗口（首次显示时构建界面）"""
+        self.ensure_ui()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def handle_command(self, command: str):
+        """处理重复启动转发来的命令（refresh 可带预下载数量）"""
+        name, _, argument = command.partition(' ')
+        if name == 'show':
+            self.show_window()
+        elif name == 'next':
+            self.on_next_wallpaper()
+        elif name == 'refresh':
+            try:
+                count = int(argument) if argument else PREFETCH_COUNT
+            except ValueError:
+                print(f"Ignoring invalid refresh count: {argument!r}")
+                return
+            self.refresh_library(count)
+
+    def _show_status(self, message: str):
+        """显示状态信息（界面未构建时显示在托盘提示中）"""
+        if self._ui_ready:
+            self.statusBar.showMessage(message)
+        else:
+            self.tray_icon.setToolTip(f"Wallpaper Changer - {message}")
 
     def _get_info_text(self):
         """获取信息文本"""
@@ -278,7 +407,7 @@ class MainWindow(QMainWindow):
         tray_menu = QMenu()
 
         show_action = QAction("显示窗口", self)
-        show_action.triggered.connect(self.show)
+        show_action.triggered.connect(self.show_window)
         tray_menu.addAction(show_action)
 
         next_action = QAction("下一张壁纸", self)
@@ -286,145 +415,184 @@ class MainWindow(QMainWindow):
         tray_menu.addAction(next_action)
 
         quit_action = QAction("退出", self)
-        quit_action.triggered.connect(self.close)
+        quit_action.triggered.connect(self.quit_app)
         tray_menu.addAction(quit_action)
 
         self.tray_icon.setContextMenu(tray_menu)
+        self.tray_icon.activated.connect(self._on_tray_activated)
 
         # 显示托盘图标
+        self.tray_icon.setToolTip("Wallpaper Changer")
         self.tray_icon.show()
+        profiler.mark('tray_visible')
+
+    def _on_tray_activated(self, reason):
+        """双击托盘图标显示窗口"""
+        if reason == QSystemTrayIcon.DoubleClick:
+            self.show_window()
+
+    def _run_task(self, kind: str, func, on_finished, on_failed) -> bool:
+        """
+        在后台线程中运行 func(status)，完成后在 GUI 线程中调用 on_finished/on_failed
+
+        Returns:
+            同类任务正在运行时返回 False
+        """
+        if kind in self._tasks:
+            return False
+        signals = _TaskSignals(self)
+        task = _BackgroundTask(func, signals)
+        signals.status.connect(self._show_status)
+        signals.finished.connect(lambda result: self._finish_task(kind, on_finished, result))
+        signals.failed.connect(lambda error: self._finish_task(kind, on_failed, error))
+        self._tasks[kind] = task
+        task.start()
+        return True
+
+    def _finish_task(self, kind: str, callback, value):
+        task = self._tasks.pop(kind, None)
+        if task is not None:
+            task.signals.deleteLater()
+        callback(value)
+
+    def _run_change(self, func, on_finished, on_failed=None):
+        """在后台线程中更换壁纸（同时只进行一次更换）"""
+        if not self._run_task('change', func, on_finished, on_failed or self._on_change_failed):
+            self._show_status("正在更换壁纸，请稍候...")
 
     def change_wallpaper(self):
-        """更换壁纸"""
-        if not self.apis:
-            self.statusBar.showMessage("请先配置 API 密钥")
-            QMessageBox.information(
-                self,
-                "配置提示",
-                "请先在设置中配置 API 密钥才能使用。\n\nUnsplash Access Key 可以在 https://unsplash.com/developers 获取。"
-            )
-            return
-
-        try:
-            # 随机选择一个 API
-            api_name = random.choice(list(self.apis.keys()))
-            api = self.apis[api_name]
-
-            # 获取分辨率
-            width, height = ScreenInfo.recommend_resolution(
-                mode=self.config.get_resolution_mode(),
-                prefer_higher=self.config.prefer_higher_resolution()
-            )
-
-            # 获取分类
-            categories = self.config.get_categories()
-            category = random.choice(categories)
-
-            # 获取图片
-            self.statusBar.showMessage(f"正在从 {api_name} 获取壁纸...")
-
-            if api_name == 'unsplash':
-                images = api.fetch_random(query=category, count=1)
-            else:
-                images = api.fetch_random(count=1)
-
-            if not images:
-                self.statusBar.showMessage("获取壁纸失败")
-                QMessageBox.warning(
-                    self,
-                    "获取失败",
-                    f"无法从 {api_name} 获取壁纸。\n请检查网络连接和 API 密钥。"
-                )
-                return
-
-            image = images[0]
-
-            # 🔥 关键修复：根据 Unsplash API 规范获取高分辨率 URL
-            # Unsplash API 返回多个尺寸：
-            # - regular: 1080px 宽度（我们之前用的，导致模糊）
-            # - full: 最大尺寸（应该使用这个）
-            # - 支持动态调整：w, h, dpr, q, fit, fm
-
-            # 使用 API 方法获取高分辨率 URL
-            width, height = ScreenInfo.recommend_resolution(
-                mode=self.config.get_resolution_mode(),
-                prefer_higher=self.config.prefer_higher_resolution()
-            )
-
-            high_res_url = api.get_high_resolution_url(
-                image,
-                target_width=width,
-                target_height=height
-            )
-
-            # 更新 image 字典中的 URL（使用高分辨率）
-            image['url'] = high_res_url
-            image['high_res_url'] = high_res_url
-
-            self.statusBar.showMessage(f"已获取高分辨率图片: {width}x{height}")
-
-            # 下载
-            local_path = self.downloader.download(high_res_url, image)
-            if not local_path:
-                self.statusBar.showMessage("下载壁纸失败")
-                QMessageBox.warning(self, "下载失败", "壁纸下载失败，请重试。")
-                return
-
-            # 设置壁纸
-            mode = self.config.get_wallpaper_mode()
-            style = getattr(WallpaperStyle, mode.upper(), WallpaperStyle.FILL)
-
-            if self.setter.set_wallpaper(str(local_path), style):
-                # 添加到历史
-                self.wallpaper_history.append(local_path)
-
-                # 更新预览
-                self._update_preview(local_path)
-
-                self.statusBar.showMessage(f"壁纸已更新: {image['description'][:50]}...")
+        """更换壁纸（在后台线程中获取和下载，界面保持响应）"""
+        def change(status):
+            with metrics.timer('wallpaper_change_seconds'):
+                return self.changer.change(status=status)
+
+        self._run_change(change, self._on_change_finished)
+
+    def _update_metrics_label(self):
+        """刷新状态栏中的指标摘要"""
+        if self._ui_ready:
+            self.metrics_label.setText(metrics.summary())
+
+    def _export_metrics(self):
+        if metrics.enabled:
+            metrics.export()
+            self._update_metrics_label()
+
+    def _on_change_finished(self, result):
+        """壁纸已更换（GUI 线程）"""
+        local_path, image = result
+
+        # 更新预览
+        self._update_preview(local_path)
+
+        self._show_status(f"壁纸已更新: {(image.get('description') or '')[:50]}...")
+        self._export_metrics()
+
+    def _on_change_failed(self, error: Exception):
+        """更换失败（GUI 线程）"""
+        self._export_metrics()
+        if isinstance(error, WallpaperChangeError):
+            self._show_status(error.status)
+            if not self.apis:
+                QMessageBox.information(self, error.title, str(error))
             else:
-                self.statusBar.showMessage("设置壁纸失败")
-                QMessageBox.warning(self, "设置失败", "壁纸设置失败。")
-
-        except Exception as e:
-            self.statusBar.showMessage(f"错误: {str(e)}")
-            QMessageBox.critical(self, "错误", f"发生错误:\n{str(e)}")
+                QMessageBox.warning(self, error.title, str(error))
+        else:
+            self._show_status(f"错误: {str(error)}")
+            QMessageBox.critical(self, "错误", f"发生错误:\n{str(error)}")
 
     def _update_preview(self, image_path: str):
-        """更新预览"""
+        """更新预览（界面未构建时记下，构建后再解码）"""
+        self._preview_path = image_path
+        if not self._ui_ready:
+            self._pending_preview = image_path
+            return
         try:
-            pixmap = QPixmap(str(image_path))
-            scaled_pixmap = pixmap.scaled(
-                self.preview_label.size(),
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            self.preview_label.setPixmap(scaled_pixmap)
+            # 直接按预览尺寸解码，不在内存中保留整张原图
+            dpr = self.preview_label.devicePixelRatioF()
+            target = self.preview_label.size() * dpr
+            with metrics.timer('preview_decode_seconds'):
+                reader = QImageReader(str(image_path))
+                reader.setAutoTransform(True)
+                source_size = reader.size()
+                if source_size.isValid():
+                    reader.setScaledSize(source_size.scaled(target, Qt.KeepAspectRatio))
+                image = reader.read()
+                if not source_size.isValid() and not image.isNull():
+                    image = image.scaled(target, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            pixmap = QPixmap.fromImage(image)
+            pixmap.setDevicePixelRatio(dpr)
+            self.preview_label.setPixmap(pixmap)
         except Exception as e:
             print(f"Error updating preview: {e}")
 
     def on_next_wallpaper(self):
-        """下一张壁纸"""
-        self.change_wallpaper()
+        """下一张壁纸（有前进记录时直接使用本地历史，不访问网络）"""
+        if self.history.peek_forward():
+            self._navigate_history(forward=True)
+        else:
+            self.change_wallpaper()
 
     def on_prev_wallpaper(self):
         """上一张壁纸"""
-        if len(self.wallpaper_history) >= 2:
-            # 切换到上一张
-            current = self.wallpaper_history.pop()
-            prev = self.wallpaper_history[-1]
-
-            mode = self.config.get_wallpaper_mode()
-            style = getattr(WallpaperStyle, mode.upper(), WallpaperStyle.FILL)
-
-            if self.setter.set_wallpaper(str(prev), style):
-                self._update_preview(prev)
-                self.statusBar.showMessage("已切换到上一张壁纸")
-            else:
-                self.wallpaper_history.append(current)
-                self.statusBar.showMessage("切换失败")
+        if self.history.peek_back():
+            self._navigate_history(forward=False)
         else:
-            self.statusBar.showMessage("没有历史壁纸")
+            self._show_status("没有历史壁纸")
+
+    def _navigate_history(self, forward: bool):
+        """
+        在历史中前进/后退一步并应用，失败时游标保持不动
+
+        文件已移入冷缓存的条目先还原；已被清理、无法还原的条目跳过，继续向同一方向查找。
+        还原、校验和设置壁纸都在后台线程中进行。
+        """
+        step = 1 if forward else -1
+
+        def navigate(status):
+            offset = step
+            while True:
+                path = self.history.peek(offset)
+                if path is None:
+                    return None, "没有可用的历史壁纸"
+                local_path = Path(path) if Path(path).exists() else self.downloader.restore(path)
+                if local_path is not None:
+                    break
+                offset += step
+
+            if not self.setter.set_wallpaper(str(local_path), self.changer.get_style(),
+                                             digest=self.downloader.content_digest(local_path)):
+                return None, "切换失败"
+            self.history.move(offset)
+            return local_path, "已切换到下一张壁纸" if forward else "已切换到上一张壁纸"
+
+        self._run_change(navigate, self._on_apply_finished)
+
+    def _on_apply_finished(self, result):
+        """历史/缓存壁纸已应用或失败（GUI 线程）"""
+        local_path, message = result
+        if local_path is not None:
+            self._update_preview(local_path)
+        self._show_status(message)
+
+    def on_gallery(self):
+        """打开缓存壁纸库"""
+        from ui.gallery import GalleryDialog
+
+        dialog = GalleryDialog(self.downloader, self,
+                               thumbnail_mb=self.config.get_thumbnail_cache_mb())
+        dialog.wallpaper_selected.connect(self.apply_cached_wallpaper)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
+
+    def apply_cached_wallpaper(self, path: str):
+        """应用缓存中的壁纸（不访问网络；冷缓存还原和设置在后台线程中进行）"""
+        def apply(status):
+            if self.changer.apply(path):
+                return path, "已应用缓存壁纸"
+            return None, "设置壁纸失败"
+
+        self._run_change(apply, self._on_apply_finished)
 
     def on_settings(self):
         """打开设置"""
@@ -432,28 +600,31 @@ class MainWindow(QMainWindow):
         if dialog.exec_() == QDialog.Accepted:
             settings = dialog.get_settings()
 
-            # 保存配置
-            self.config.set('update_frequency', settings['update_frequency'])
-            self.config.set('update_time', settings['update_time'])
-            self.config.set('interval_hours', settings['interval_hours'])
-            self.config.set('resolution.mode', settings['resolution_mode'])
-            self.config.set('resolution.custom_width', settings['custom_width'])
-            self.config.set('resolution.custom_height', settings['custom_height'])
-            self.config.set('resolution.prefer_higher', settings['prefer_higher'])
-            self.config.set('api_keys.unsplash', settings['unsplash_key'])
-            self.config.set('api_keys.wallhaven', settings['wallhaven_key'])
-
-            # 重新初始化组件
-            self.init_components()
-
-            QMessageBox.information(self, "设置", "设置已保存，将在下次更新时生效")
+            # 保存配置（订阅者会原地更新受影响的组件）
+            self.config.update({
+                'update_frequency': settings['update_frequency'],
+                'update_time': settings['update_time'],
+                'interval_hours': settings['interval_hours'],
+                'resolution.mode': settings['resolution_mode'],
+                'resolution.custom_width': settings['custom_width'],
+                'resolution.custom_height': settings['custom_height'],
+                'resolution.prefer_higher': settings['prefer_higher'],
+                'api_keys.unsplash': settings['unsplash_key'],
+                'api_keys.wallhaven': settings['wallhaven_key']
+            })
+
+            QMessageBox.information(self, "设置", "设置已保存并已生效")
 
     def on_refresh(self):
         """刷新壁纸库"""
-        self.statusBar.showMessage("正在刷新壁纸库...")
+        self.refresh_library(PREFETCH_COUNT)
+
+    def refresh_library(self, count: int):
+        """预下载 count 张壁纸到缓存"""
+        self._show_status("正在刷新壁纸库...")
 
         if not self.apis:
-            self.statusBar.showMessage("请先配置 API 密钥")
+            self._show_status("请先配置 API 密钥")
             QMessageBox.information(
                 self,
                 "配置提示",
@@ -461,34 +632,20 @@ class MainWindow(QMainWindow):
             )
             return
 
-        try:
-            # 预加载几张壁纸
-            api_name = random.choice(list(self.apis.keys()))
-            api = self.apis[api_name]
-
-            categories = self.config.get_categories()
-            category = random.choice(categories)
-
-            self.statusBar.showMessage(f"正在从 {api_name} 下载壁纸...")
-
-            if api_name == 'unsplash':
-                images = api.fetch_random(query=category, count=3)
-            else:
-                images = api.fetch_random(count=3)
+        # 预下载在后台线程中进行（限速时不阻塞界面，手动更换可随时抢占带宽）
+        if not self._run_task('prefetch',
+                              lambda status: self.changer.prefetch(count=count, status=status),
+                              self._on_prefetch_finished, self._on_prefetch_failed):
+            self._show_status("壁纸库正在刷新中...")
 
-            if images:
-                # 下载所有图片
-                downloaded = 0
-                for image in images:
-                    if self.downloader.download(image['url'], image):
-                        downloaded += 1
+    def _on_prefetch_finished(self, downloaded: int):
+        self._show_status(f"已下载 {downloaded} 张壁纸")
 
-                self.statusBar.showMessage(f"已下载 {downloaded} 张壁纸")
-            else:
-                self.statusBar.showMessage("获取壁纸失败")
-
-        except Exception as e:
-            self.statusBar.showMessage(f"错误: {str(e)}")
+    def _on_prefetch_failed(self, error: Exception):
+        if isinstance(error, WallpaperChangeError):
+            self._show_status(error.status)
+        else:
+            self._show_status(f"错误: {str(error)}")
 
     def closeEvent(self, event):
         """关闭事件"""
@@ -496,5 +653,13 @@ class MainWindow(QMainWindow):
             self.hide()
             event.ignore()
         else:
-            self.scheduler.stop()
+            self.components.close()
+            metrics.export()
             event.accept()
+
+    def quit_app(self):
+        """退出程序"""
+        self.components.close()
+        metrics.export()
+        self.tray_icon.hide()
+        QApplication.quit()
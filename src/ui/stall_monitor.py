@@ -0,0 +1,40 @@
+"""
+界面卡顿监测
+GUI 线程上的 QTimer 定时心跳，由 StallWatchdog 的后台线程检查
+"""
+
+from PyQt5.QtCore import QObject, QTimer
+
+from utils.stall_watchdog import StallWatchdog
+
+
+class StallMonitor(QObject):
+    """GUI 线程心跳"""
+
+    def __init__(self, threshold_ms: int = 500, interval_ms: int = 100,
+                 log_path=None, parent=None):
+        """
+        Args:
+            threshold_ms: 卡顿阈值（毫秒）
+            interval_ms: 心跳间隔（毫秒）
+            log_path: 滚动日志路径
+            parent: 父对象
+        """
+        super().__init__(parent)
+        # 在 GUI 线程上创建，默认监测的就是 GUI 线程
+        self.watchdog = StallWatchdog(threshold=threshold_ms / 1000.0,
+                                      poll_interval=interval_ms / 1000.0,
+                                      log_path=log_path)
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.watchdog.beat)
+
+    def start(self):
+        """开始监测"""
+        self.timer.start()
+        self.watchdog.start()
+
+    def stop(self):
+        """停止监测"""
+        self.timer.stop()
+        self.watchdog.stop()
@@ -0,0 +1,101 @@
+"""
+网络连通性检测
+对 API 主机做一次 TCP 连接探测并缓存结果，实际请求的成败也会更新缓存
+"""
+
+import socket
+import threading
+import time
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlparse
+
+from utils.metrics import metrics
+
+
+def warm_connection(session, url: str, timeout: float = 5.0,
+                    strip_headers: Iterable[str] = ()) -> bool:
+    """
+    预热到 url 所在主机的连接：对站点根路径发一个 HEAD 请求，
+    DNS 解析、TCP 和 TLS 握手在此完成，连接留在会话的连接池中供随后的请求复用
+
+    Args:
+        session: requests.Session
+        url: 目标地址（只使用协议和主机）
+        timeout: 超时（秒）
+        strip_headers: 不随预热请求发送的会话请求头（如 API 密钥，避免消耗配额）
+
+    Returns:
+        是否成功建立连接（任何 HTTP 状态码都算成功）
+    """
+    parsed = urlparse(url)
+    if not parsed.hostname:
+        return False
+    origin = f"{parsed.scheme}://{parsed.netloc}/"
+    try:
+        with metrics.timer('prewarm_connect_seconds', host=parsed.hostname):
+            response = session.head(origin, timeout=timeout, allow_redirects=False,
+                                    headers={name: None for name in strip_headers})
+        response.close()
+        return True
+    except Exception as e:
+        metrics.inc('prewarm_errors_total', host=parsed.hostname)
+        print(f"Prewarm failed for {parsed.hostname}: {e}")
+        return False
+
+
+class ConnectivityChecker:
+    """连通性检测（结果在 ttl 秒内有效）"""
+
+    def __init__(self, ttl: float = 30.0, timeout: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            ttl: 结果有效期（秒）
+            timeout: TCP 连接超时（秒）
+            clock: 时钟（测试和模拟时可替换）
+        """
+        self.ttl = ttl
+        self.timeout = timeout
+        self.clock = clock
+        self._online: Optional[bool] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _probe(self, urls: Iterable[str]) -> bool:
+        """任一主机可以建立 TCP 连接即视为在线"""
+        for url in urls:
+            parsed = urlparse(url)
+            if not parsed.hostname:
+                continue
+            port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+            try:
+                with socket.create_connection((parsed.hostname, port), timeout=self.timeout):
+                    return True
+            except OSError:
+                continue
+        return False
+
+    def is_online(self, urls: Iterable[str]) -> bool:
+        """
+        是否在线
+
+        Args:
+            urls: 探测的地址（通常是各 API 的 base_url）
+        """
+        with self._lock:
+            if self._online is not None and self.clock() - self._checked < self.ttl:
+                return self._online
+        online = self._probe(urls)
+        self.report(online)
+        return online
+
+    def report(self, online: bool):
+        """用实际请求的结果更新状态"""
+        with self._lock:
+            self._online = online
+            self._checked = self.clock()
+
+    def invalidate(self):
+        """丢弃缓存的结果，下次重新探测"""
+        with self._lock:
+            self._online = None
@@ -0,0 +1,97 @@
+"""
+文件锁
+跨进程的建议锁（POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking）
+
+锁随文件描述符释放，进程崩溃后由操作系统自动解除，不会残留。
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    跨进程文件锁
+
+    用法:
+        with FileLock(cache_dir / '.lock'):
+            ...
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+
+    @property
+    def locked(self) -> bool:
+        """当前进程是否持有锁"""
+        return self._fd is not None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self, blocking: bool = True, timeout: float = None) -> bool:
+        """
+        获取锁
+
+        Args:
+            blocking: 是否等待
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            是否获得锁
+        """
+        if self._fd is not None:
+            return True
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.01
+
+        while not self._try_lock(fd):
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                os.close(fd)
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+        self._fd = fd
+        return True
+
+    def release(self):
+        """释放锁"""
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
@@ -0,0 +1,16 @@
+"""
+文件写入工具
+"""
+
+import json
+import os
+from pathlib import Path
+
+
+def write_json_atomic(path: Path, data):
+    """写入临时文件后原子替换（读取方不会读到写了一半的文件）"""
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
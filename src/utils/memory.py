@@ -0,0 +1,210 @@
+"""
+内存上限
+托盘常驻时定期检查进程常驻内存（RSS；Windows 上为私有提交内存），超过上限时依次释放
+已登记的缓存，并把释放的堆内存归还给操作系统；可选用 tracemalloc 采样定位 Python 对象的分配位置
+
+不依赖 Qt：界面和守护进程都在各自的循环中调用 poll()。
+"""
+
+import ctypes
+import gc
+import os
+import platform
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Tuple
+
+from utils.metrics import metrics, MEMORY_BUCKETS
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    当前进程的常驻内存（字节），无法获取时返回 None
+
+    Windows 上取私有提交内存（PrivateUsage）而不是工作集：工作集可以通过换出页面缩小，
+    但内存并没有被释放，下次访问时还会换回来。
+    """
+    system = platform.system()
+    try:
+        if system == 'Linux':
+            with open('/proc/self/statm', 'rb') as f:
+                pages = int(f.read().split()[1])
+            return pages * os.sysconf('SC_PAGE_SIZE')
+        if system == 'Windows':
+            return _windows_private_bytes()
+        import resource
+        # macOS 只能取到峰值（字节）
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (OSError, ValueError, ImportError, AttributeError):
+        return None
+
+
+class _ProcessMemoryCountersEx(ctypes.Structure):
+    _fields_ = [
+        ('cb', ctypes.c_ulong),
+        ('PageFaultCount', ctypes.c_ulong),
+        ('PeakWorkingSetSize', ctypes.c_size_t),
+        ('WorkingSetSize', ctypes.c_size_t),
+        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+        ('PagefileUsage', ctypes.c_size_t),
+        ('PeakPagefileUsage', ctypes.c_size_t),
+        ('PrivateUsage', ctypes.c_size_t),
+    ]
+
+
+def _windows_private_bytes() -> Optional[int]:
+    counters = _ProcessMemoryCountersEx()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters),
+                                                    counters.cb):
+        return None
+    return counters.PrivateUsage
+
+
+def return_free_memory():
+    """
+    回收循环引用，并把空闲的堆内存归还给操作系统
+
+    Windows 的堆会自行归还空闲段，这里不调用 SetProcessWorkingSetSize 清空工作集：
+    那只会把仍在使用的页面换出，并不释放内存。
+    """
+    gc.collect()
+    system = platform.system()
+    try:
+        if system == 'Linux':
+            # glibc 不会主动归还堆中间的空闲页
+            ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class MemoryManager:
+    """内存上限管理"""
+
+    def __init__(self, ceiling_mb: float = 150, interval: float = 60.0,
+                 trace_frames: int = 0, clock: Callable[[], float] = time.monotonic,
+                 rss: Callable[[], Optional[int]] = rss_bytes):
+        """
+        Args:
+            ceiling_mb: 常驻内存上限（MB），0 表示不限制（仍会记录 RSS）
+            interval: poll() 的最短检查间隔（秒）
+            trace_frames: tracemalloc 保存的栈帧数，0 表示不启用（启用后分配变慢）
+            clock: 时钟
+            rss: 读取常驻内存的函数（测试时可替换）
+        """
+        self.ceiling_mb = ceiling_mb
+        self.interval = interval
+        self.clock = clock
+        self.rss = rss
+        self.last_rss: Optional[int] = None
+        self._releasers: List[Tuple[str, Callable[[], None]]] = []
+        self._checked: Optional[float] = None
+        self.set_tracing(trace_frames)
+
+    @property
+    def ceiling_bytes(self) -> int:
+        return int(self.ceiling_mb * 1024 * 1024)
+
+    def set_tracing(self, frames: int):
+        """启用或停止 tracemalloc 采样"""
+        self.trace_frames = frames
+        if frames and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        elif not frames and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def register(self, name: str, release: Callable[[], None]):
+        """
+        登记一个可释放的缓存
+
+        超过上限时按登记顺序调用，release 应丢弃可以重新加载的内容（下次使用时再加载）。
+        """
+        self._releasers.append((name, release))
+
+    def unregister(self, name: str):
+        self._releasers = [(n, r) for n, r in self._releasers if n != name]
+
+    def release(self, names: List[str] = None):
+        """
+        释放缓存并归还内存（如窗口隐藏后）
+
+        Args:
+            names: 只释放这些缓存，None 表示全部
+        """
+        for name, release in list(self._releasers):
+            if names is None or name in names:
+                self._call(name, release)
+        return_free_memory()
+
+    @staticmethod
+    def _call(name: str, release: Callable[[], None]):
+        try:
+            release()
+            metrics.inc('memory_releases_total', cache=name)
+        except Exception as e:
+            print(f"Error releasing {name}: {e}")
+
+    def poll(self) -> Optional[int]:
+        """距上次检查超过 interval 时检查一次（可频繁调用）"""
+        now = self.clock()
+        if self._checked is not None and now - self._checked < self.interval:
+            return None
+        return self.check()
+
+    def check(self) -> Optional[int]:
+        """
+        检查常驻内存，超过上限时逐个释放缓存直到回到上限以下
+
+        Returns:
+            检查结束时的常驻内存（字节），无法获取时返回 None
+        """
+        self._checked = self.clock()
+        rss = self.rss()
+        if rss is None:
+            return None
+        metrics.observe('process_rss_bytes', rss, MEMORY_BUCKETS)
+
+        if tracemalloc.is_tracing():
+            metrics.observe('python_traced_bytes', tracemalloc.get_traced_memory()[0],
+                            MEMORY_BUCKETS)
+
+        if self.ceiling_mb and rss > self.ceiling_bytes:
+            print(f"Resident memory {rss / (1024 * 1024):.0f} MB over the "
+                  f"{self.ceiling_mb} MB ceiling, releasing caches")
+            if tracemalloc.is_tracing():
+                print(self.top_allocations())
+            # 先只做垃圾回收，仍超出时再按登记顺序释放缓存
+            return_free_memory()
+            rss = self.rss() or rss
+            for name, release in list(self._releasers):
+                if rss <= self.ceiling_bytes:
+                    break
+                self._call(name, release)
+                return_free_memory()
+                rss = self.rss() or rss
+            if rss > self.ceiling_bytes:
+                metrics.inc('memory_over_ceiling_total')
+                print(f"Resident memory still {rss / (1024 * 1024):.0f} MB after releasing caches")
+
+        self.last_rss = rss
+        return rss
+
+    def top_allocations(self, limit: int = 10) -> str:
+        """tracemalloc 快照中分配最多的位置（未启用时返回空字符串）"""
+        if not tracemalloc.is_tracing():
+            return ''
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        stats = snapshot.statistics('lineno')[:limit]
+        lines = [f"Top {len(stats)} Python allocations:"]
+        for stat in stats:
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size / 1024:8.1f} KB  {stat.count:6d} blocks  "
+                         f"{frame.filename}:{frame.lineno}")
+        return '\n'.join(lines)
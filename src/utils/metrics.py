@@ -0,0 +1,276 @@
+"""
+性能指标
+计时器、直方图和计数器，可导出为 Prometheus 文本格式或 JSON
+
+禁用时所有记录调用都在第一行返回，计时器返回共享的空上下文，开销可忽略。
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# 默认直方图分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 吞吐量分桶（字节/秒）
+THROUGHPUT_BUCKETS = (64e3, 256e3, 1e6, 4e6, 16e6, 64e6)
+# 字节数分桶
+SIZE_BUCKETS = (256e3, 1e6, 4e6, 16e6, 64e6)
+# 进程内存分桶（字节）
+MEMORY_BUCKETS = (32e6, 64e6, 128e6, 256e6, 512e6, 1e9)
+
+
+class Histogram:
+    """累积分桶直方图"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.last = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.last = value
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """按分桶估算分位数（取桶上界）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts[:-1]):
+            seen += n
+            if seen >= target:
+                return self.buckets[i]
+        return float('inf')
+
+
+class _NullTimer:
+    """禁用时使用的空计时器"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """计时上下文，退出时写入直方图"""
+
+    def __init__(self, metrics: 'Metrics', key: Tuple):
+        self.metrics = metrics
+        self.key = key
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.metrics._observe(self.key, self.elapsed, LATENCY_BUCKETS)
+        return False
+
+
+class Metrics:
+    """指标注册表"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.export_path: Optional[Path] = None
+        self._counters: Dict[Tuple, float] = {}
+        self._histograms: Dict[Tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, export_path: str = None):
+        """启用/禁用并设置导出路径"""
+        self.enabled = enabled
+        self.export_path = Path(export_path) if export_path else None
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Tuple:
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """计数器累加"""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+                **labels):
+        """记录一次直方图观测值"""
+        if not self.enabled:
+            return
+        self._observe(self._key(name, labels), value, buckets)
+
+    def _observe(self, key: Tuple, value: float, buckets: Tuple[float, ...]):
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def timer(self, name: str, **labels):
+        """
+        计时上下文管理器
+
+        用法:
+            with metrics.timer('set_wallpaper_seconds'):
+                ...
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, self._key(name, labels))
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        """获取直方图"""
+        return self._histograms.get(self._key(name, labels))
+
+    def counter(self, name: str, **labels) -> float:
+        """获取计数器值"""
+        return self._counters.get(self._key(name, labels), 0)
+
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ---------- 导出 ----------
+
+    @staticmethod
+    def _format_labels(labels: Tuple, extra: Tuple = ()) -> str:
+        items = list(labels) + list(extra)
+        if not items:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+            for (name, labels), h in sorted(self._histograms.items(), key=lambda kv: kv[0]):
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    le = self._format_labels(labels, (('le', bound),))
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                le = self._format_labels(labels, (('le', '+Inf'),))
+                lines.append(f"{name}_bucket{le} {h.count}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {h.sum}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {h.count}")
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self) -> Dict:
+        """JSON 可序列化的快照"""
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in self._counters.items()
+                ],
+                'histograms': [
+                    {'name': name, 'labels': dict(labels), 'count': h.count,
+                     'sum': h.sum, 'mean': h.mean, 'last': h.last,
+                     'p50': h.quantile(0.5), 'p99': h.quantile(0.99),
+                     'buckets': dict(zip([str(b) for b in h.buckets] + ['+Inf'], h.counts))}
+                    for (name, labels), h in self._histograms.items()
+                ]
+            }
+
+    def export(self, path: str = None) -> bool:
+        """
+        导出到本地文件（.json 为 JSON，其它为 Prometheus 文本格式）
+
+        写入临时文件后原子替换，便于 node_exporter textfile 收集器读取。
+        """
+        if not self.enabled:
+            return False
+        path = Path(path) if path else self.export_path
+        if path is None:
+            return False
+
+        try:
+            if path.suffix.lower() == '.json':
+                content = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+            else:
+                content = self.to_prometheus()
+            tmp_path = path.with_suffix(path.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"Error exporting metrics: {e}")
+            return False
+
+    def summary(self) -> str:
+        """单行摘要（用于状态栏）"""
+        if not self.enabled:
+            return ''
+
+        parts = []
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+
+        def last_of(name):
+            hs = [h for (n, _), h in histograms if n == name and h.count]
+            return max(hs, key=lambda h: h.count).last if hs else None
+
+        api = last_of('api_request_seconds')
+        if api is not None:
+            parts.append(f"API {api:.2f}s")
+        download = last_of('download_seconds')
+        if download is not None:
+            throughput = last_of('download_throughput_bytes_per_second') or 0
+            parts.append(f"下载 {download:.2f}s {throughput / 1e6:.1f}MB/s")
+        apply = last_of('set_wallpaper_seconds')
+        if apply is not None:
+            parts.append(f"设置 {apply:.2f}s")
+
+        hits = sum(v for (n, _), v in counters if n == 'cache_hits_total')
+        misses = sum(v for (n, _), v in counters if n == 'cache_misses_total')
+        if hits + misses:
+            parts.append(f"缓存命中 {hits / (hits + misses):.0%}")
+
+        stall = last_of('gui_stall_seconds')
+        if stall is not None:
+            stalls = sum(v for (n, _), v in counters if n == 'gui_stalls_total')
+            parts.append(f"卡顿 {stalls:.0f} 次（最近 {stall:.2f}s）")
+
+        rss = last_of('process_rss_bytes')
+        if rss is not None:
+            parts.append(f"内存 {rss / (1024 * 1024):.0f}MB")
+
+        return ' | '.join(parts)
+
+
+# 全局指标注册表
+metrics = Metrics()
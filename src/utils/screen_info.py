@@ -1,71 +1,240 @@
 """
 屏幕信息工具
 使用 PyQt5 获取屏幕信息（避免 tkinter 依赖）
+
+屏幕拓扑只查询一次并缓存为不可变快照，显示器增删、几何或 DPI 变化时
+由 QGuiApplication 的信号触发重建。快照可在任意线程读取，不会触碰 Qt 控件。
 """
 
+import sys
 import platform
+import threading
+from dataclasses import dataclass
 from typing import List, Tuple, Optional
 
 
+@dataclass(frozen=True)
+class ScreenGeometry:
+    """单个屏幕的几何信息（逻辑像素）"""
+    name: str
+    x: int
+    y: int
+    width: int
+    height: int
+    device_pixel_ratio: float = 1.0
+    logical_dpi: float = 96.0
+    primary: bool = False
+
+    @property
+    def offset(self) -> Tuple[int, int]:
+        """屏幕在虚拟桌面中的偏移"""
+        return self.x, self.y
+
+    @property
+    def dpi(self) -> int:
+        """系统 DPI（逻辑 DPI × 设备像素比）"""
+        return int(round(self.logical_dpi * self.device_pixel_ratio))
+
+    @property
+    def physical_size(self) -> Tuple[int, int]:
+        """物理像素尺寸"""
+        return (int(self.width * self.device_pixel_ratio),
+                int(self.height * self.device_pixel_ratio))
+
+
+@dataclass(frozen=True)
+class ScreenSnapshot:
+    """屏幕拓扑快照（不可变，线程安全）"""
+    screens: Tuple[ScreenGeometry, ...]
+
+    @property
+    def primary(self) -> ScreenGeometry:
+        """主屏幕"""
+        for screen in self.screens:
+            if screen.primary:
+                return screen
+        return self.screens[0]
+
+
+# 默认快照：无法查询屏幕时使用
+_DEFAULT_SNAPSHOT = ScreenSnapshot(
+    screens=(ScreenGeometry(name="default", x=0, y=0, width=1920, height=1080, primary=True),)
+)
+
+_snapshot: Optional[ScreenSnapshot] = None
+_snapshot_lock = threading.Lock()
+_hooked_screens = set()
+
+
+def _qt_gui_app():
+    """返回当前线程可用的 QGuiApplication（仅在 GUI 线程），否则返回 None"""
+    # 未加载 PyQt5 时不主动导入（无界面模式）
+    if 'PyQt5.QtGui' not in sys.modules:
+        return None
+
+    from PyQt5.QtCore import QThread
+    from PyQt5.QtGui import QGuiApplication
+
+    app = QGuiApplication.instance()
+    if app is None or QThread.currentThread() != app.thread():
+        return None
+    return app
+
+
+def _query_qt_screens(app) -> ScreenSnapshot:
+    """通过 QGuiApplication 查询所有屏幕"""
+    primary = app.primaryScreen()
+    screens = []
+    for screen in app.screens():
+        geometry = screen.geometry()
+        screens.append(ScreenGeometry(
+            name=screen.name(),
+            x=geometry.x(),
+            y=geometry.y(),
+            width=geometry.width(),
+            height=geometry.height(),
+            device_pixel_ratio=float(screen.devicePixelRatio()),
+            logical_dpi=float(screen.logicalDotsPerInch()),
+            primary=screen == primary
+        ))
+    if not screens:
+        return _DEFAULT_SNAPSHOT
+    return ScreenSnapshot(screens=tuple(screens))
+
+
+def _query_system_screens() -> ScreenSnapshot:
+    """不依赖 Qt 查询主屏幕（Windows 使用 user32，其它平台返回默认值）"""
+    if platform.system() != 'Windows':
+        return _DEFAULT_SNAPSHOT
+
+    try:
+        import ctypes
+        user32 = ctypes.windll.user32
+        width = user32.GetSystemMetrics(0)   # SM_CXSCREEN
+        height = user32.GetSystemMetrics(1)  # SM_CYSCREEN
+        hdc = user32.GetDC(0)
+        dpi = ctypes.windll.gdi32.GetDeviceCaps(hdc, 88)  # LOGPIXELSX
+        user32.ReleaseDC(0, hdc)
+        return ScreenSnapshot(screens=(ScreenGeometry(
+            name="primary", x=0, y=0, width=width, height=height,
+            logical_dpi=float(dpi or 96), primary=True
+        ),))
+    except Exception as e:
+        print(f"Error querying screens: {e}")
+        return _DEFAULT_SNAPSHOT
+
+
+def _on_screens_changed(*args):
+    """屏幕拓扑变化：在 GUI 线程立即重建快照"""
+    ScreenInfo.invalidate()
+    app = _qt_gui_app()
+    if app is not None:
+        _hook_screens(app)
+        ScreenInfo.snapshot()
+
+
+def _on_screen_removed(screen):
+    """屏幕被移除"""
+    _hooked_screens.discard(id(screen))
+    _on_screens_changed()
+
+
+def _hook_screens(app):
+    """为尚未连接的屏幕连接几何/DPI 变化信号"""
+    for screen in app.screens():
+        if id(screen) in _hooked_screens:
+            continue
+        _hooked_screens.add(id(screen))
+        screen.geometryChanged.connect(_on_screens_changed)
+        screen.logicalDotsPerInchChanged.connect(_on_screens_changed)
+
+
 class ScreenInfo:
     """屏幕信息获取器"""
 
     @staticmethod
-    def get_screen_resolution() -> Tuple[int, int]:
+    def install_change_hooks() -> bool:
         """
-        获取主屏幕分辨率
+        监听显示器变化信号，并在 GUI 线程预先填充快照
+
+        需在 QApplication 创建后于 GUI 线程调用。
 
         Returns:
-            (宽度, 高度)
+            是否成功安装
         """
-        try:
-            from PyQt5.QtWidgets import QApplication, QDesktopWidget
-
-            # 创建 QApplication 实例（如果不存在）
-            app = QApplication.instance()
-            if app is None:
-                app = QApplication([])
+        app = _qt_gui_app()
+        if app is None:
+            return False
 
-            screen = QDesktopWidget().screenGeometry()
-            width = screen.width()
-            height = screen.height()
+        app.screenAdded.connect(_on_screens_changed)
+        app.screenRemoved.connect(_on_screen_removed)
+        app.primaryScreenChanged.connect(_on_screens_changed)
+        _hook_screens(app)
 
-            return width, height
+        ScreenInfo.invalidate()
+        ScreenInfo.snapshot()
+        return True
 
-        except Exception as e:
-            print(f"Error getting screen resolution: {e}")
-            # 默认返回 1920x1080
-            return 1920, 1080
+    @staticmethod
+    def invalidate():
+        """使缓存的屏幕快照失效"""
+        global _snapshot
+        with _snapshot_lock:
+            _snapshot = None
 
     @staticmethod
-    def get_all_screens() -> List[Tuple[int, int]]:
+    def snapshot() -> ScreenSnapshot:
         """
-        获取所有屏幕分辨率
+        获取屏幕拓扑快照
+
+        已缓存时直接返回（任意线程安全）；未缓存时在 GUI 线程通过 Qt 查询，
+        其它线程或无界面时使用系统 API/默认值。
 
         Returns:
-            屏幕分辨率列表 [(宽度, 高度), ...]
+            屏幕快照
         """
-        try:
-            from PyQt5.QtWidgets import QApplication, QDesktopWidget
+        global _snapshot
+        snapshot = _snapshot
+        if snapshot is not None:
+            return snapshot
 
-            app = QApplication.instance()
-            if app is None:
-                app = QApplication([])
+        with _snapshot_lock:
+            if _snapshot is not None:
+                return _snapshot
+
+            app = _qt_gui_app()
+            try:
+                if app is not None:
+                    snapshot = _query_qt_screens(app)
+                else:
+                    snapshot = _query_system_screens()
+            except Exception as e:
+                print(f"Error getting screen info: {e}")
+                snapshot = _DEFAULT_SNAPSHOT
 
-            desktop = QDesktopWidget()
-            screen_count = desktop.screenCount()
+            _snapshot = snapshot
+            return snapshot
+
+    @staticmethod
+    def get_screen_resolution() -> Tuple[int, int]:
+        """
+        获取主屏幕分辨率
 
-            screens = []
-            for i in range(screen_count):
-                screen = desktop.screenGeometry(i)
-                screens.append((screen.width(), screen.height()))
+        Returns:
+            (宽度, 高度)
+        """
+        primary = ScreenInfo.snapshot().primary
+        return primary.width, primary.height
 
-            return screens
+    @staticmethod
+    def get_all_screens() -> List[Tuple[int, int]]:
+        """
+        获取所有屏幕分辨率
 
-        except Exception as e:
-            print(f"Error getting all screens: {e}")
-            # 默认返回一个屏幕
-            return [(1920, 1080)]
+        Returns:
+            屏幕分辨率列表 [(宽度, 高度), ...]
+        """
+        return [(screen.width, screen.height) for screen in ScreenInfo.snapshot().screens]
 
     @staticmethod
     def get_dpi() -> int:
@@ -75,18 +244,7 @@ class ScreenInfo:
         Returns:
             DPI 值
         """
-        if platform.system() == 'Windows':
-            try:
-                import ctypes
-                user32 = ctypes.windll.user32
-                hdc = user32.GetDC(0)
-                dpi = user32.GetDeviceCaps(hdc, 88)  # LOGPIXELSX
-                user32.ReleaseDC(0, hdc)
-                return dpi
-            except:
-                return 96  # 默认 DPI
-        else:
-            return 96  # 非 Windows 平台默认 DPI
+        return ScreenInfo.snapshot().primary.dpi
 
     @staticmethod
     def get_scale_factor() -> float:
@@ -112,8 +270,9 @@ class ScreenInfo:
         Returns:
             (宽度, 高度)
         """
-        width, height = ScreenInfo.get_screen_resolution()
-        scale_factor = ScreenInfo.get_scale_factor()
+        primary = ScreenInfo.snapshot().primary
+        width, height = primary.width, primary.height
+        scale_factor = primary.dpi / 96.0
 
         if mode == "auto":
             # 考虑 DPI 缩放
@@ -153,9 +312,10 @@ def get_screen_info() -> str:
     Returns:
         屏幕信息描述
     """
-    width, height = ScreenInfo.get_screen_resolution()
-    dpi = ScreenInfo.get_dpi()
-    scale = ScreenInfo.get_scale_factor()
+    primary = ScreenInfo.snapshot().primary
+    width, height = primary.width, primary.height
+    dpi = primary.dpi
+    scale = dpi / 96.0
     formatted = ScreenInfo.format_resolution(width, height)
 
     return f"Resolution: {formatted} | DPI: {dpi} | Scale: {scale*100:.0f}%"
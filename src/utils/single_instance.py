@@ -0,0 +1,66 @@
+"""
+单实例
+运行中的界面实例通过本地套接字（QLocalServer）接收命令，重复启动时把命令转发过去后立即退出
+
+客户端不依赖 Qt：POSIX 上 QLocalServer 监听的是 Unix 域套接字，Windows 上是命名管道，
+都可以直接用标准库连接，转发只需几毫秒。
+"""
+
+import getpass
+import hashlib
+import os
+import platform
+import socket
+import tempfile
+from pathlib import Path
+
+# 可转发给运行中实例的命令（命令名后可跟空格分隔的参数，如 "refresh 5"）
+INSTANCE_COMMANDS = ('show', 'next', 'refresh', 'ping')
+
+
+def server_name(base_dir) -> str:
+    """
+    本地服务器名称（传给 QLocalServer.listen）
+
+    按用户和数据目录区分，不同数据目录的实例互不影响。
+    """
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = 'user'
+    digest = hashlib.sha1(str(Path(base_dir).resolve()).encode('utf-8')).hexdigest()[:12]
+    name = f"wallpaper-changer-{user}-{digest}"
+    if platform.system() == 'Windows':
+        return name
+    # POSIX 上使用完整路径，客户端可以直接连接
+    return str(Path(tempfile.gettempdir()) / f"{name}.sock")
+
+
+def send_command(base_dir, command: str, timeout: float = 0.5) -> bool:
+    """
+    把命令发送给运行中的实例
+
+    Returns:
+        是否有实例接收了命令
+    """
+    name = server_name(base_dir)
+    data = (command + '\n').encode('utf-8')
+
+    if platform.system() == 'Windows':
+        try:
+            with open(rf'\\.\pipe\{name}', 'r+b', buffering=0) as pipe:
+                pipe.write(data)
+                return pipe.read(1) == b'+'
+        except OSError:
+            return False
+
+    if not os.path.exists(name):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(name)
+            sock.sendall(data)
+            return sock.recv(1) == b'+'
+    except OSError:
+        return False
@@ -0,0 +1,123 @@
+"""
+事件循环卡顿监测
+被监测线程定期调用 beat()，后台线程发现心跳间隔超过阈值时抓取该线程的 Python 调用栈，
+写入滚动日志并记录到性能指标
+
+不依赖 Qt：界面中由 QTimer 在 GUI 线程上调用 beat()（见 ui.stall_monitor）。
+"""
+
+import logging
+import sys
+import threading
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Optional
+
+from utils.metrics import metrics
+
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+
+def _create_logger(log_path) -> logging.Logger:
+    logger = logging.getLogger('wallpaper_changer.stalls')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        if log_path:
+            handler = RotatingFileHandler(str(log_path), maxBytes=LOG_MAX_BYTES,
+                                          backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        else:
+            handler = logging.NullHandler()
+        logger.addHandler(handler)
+    return logger
+
+
+class StallWatchdog:
+    """卡顿监测"""
+
+    def __init__(self, threshold: float = 0.5, poll_interval: float = 0.1,
+                 log_path=None, thread_id: int = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            threshold: 心跳间隔超过该值视为卡顿（秒）
+            poll_interval: 后台线程检查间隔（秒）
+            log_path: 滚动日志路径，None 表示只记录指标
+            thread_id: 被监测线程，默认为创建者所在线程
+            clock: 时钟
+        """
+        self.threshold = threshold
+        self.poll_interval = poll_interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.clock = clock
+        self.logger = _create_logger(log_path)
+        self.stall_count = 0
+        self.last_stack: Optional[str] = None
+        self._last_beat = clock()
+        self._stall_started: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def beat(self):
+        """心跳（在被监测线程上调用）"""
+        now = self.clock()
+        if self._stall_started is not None:
+            self._stall_started = None
+            self._finish_stall(now - self._last_beat)
+        self._last_beat = now
+
+    def start(self):
+        """启动后台监测线程"""
+        if self._thread is not None:
+            return
+        self._last_beat = self.clock()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='stall-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止监测"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self):
+        expected = self.clock() + self.poll_interval
+        while not self._stop.wait(self.poll_interval):
+            now = self.clock()
+            if now - expected > self.threshold:
+                # 监测线程自身也迟到了：系统休眠或整个进程被挂起，不算界面卡顿
+                self._last_beat = now
+                self._stall_started = None
+            expected = now + self.poll_interval
+            self.check(now)
+
+    def check(self, now: float = None):
+        """检查一次（后台线程调用；测试时可直接调用）"""
+        now = self.clock() if now is None else now
+        lag = now - self._last_beat
+        if lag <= self.threshold or self._stall_started is not None:
+            return
+        self._stall_started = now
+        self.stall_count += 1
+        self.last_stack = self.capture_stack()
+        metrics.inc('gui_stalls_total')
+        message = f"GUI thread stalled for {lag * 1000:.0f} ms, stack:\n{self.last_stack}"
+        self.logger.warning(message)
+        print(f"GUI thread stalled for {lag * 1000:.0f} ms (see stall log)")
+
+    def _finish_stall(self, duration: float):
+        """卡顿结束：记录总时长"""
+        metrics.observe('gui_stall_seconds', duration)
+        self.logger.warning(f"GUI thread stall ended after {duration * 1000:.0f} ms")
+
+    def capture_stack(self) -> str:
+        """被监测线程当前的 Python 调用栈"""
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return '(thread not running)\n'
+        return ''.join(traceback.format_stack(frame))
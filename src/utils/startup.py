@@ -0,0 +1,73 @@
+"""
+启动计时
+记录各模块导入耗时和关键时间点（托盘图标可见、事件循环开始），
+用于控制开机自启动对登录的影响
+"""
+
+import importlib
+import sys
+import time
+from typing import List, Optional, Tuple
+
+
+class StartupProfiler:
+    """启动计时器（时间点均相对于创建时刻）"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.imports: List[Tuple[str, float]] = []
+        self.marks: List[Tuple[str, float]] = []
+
+    def import_module(self, name: str):
+        """
+        导入模块并记录耗时
+
+        按依赖顺序依次导入时，已被前面模块带入的子模块不再计入，
+        因此每项近似于该模块自身新增的导入开销。
+        """
+        already = name in sys.modules
+        begin = time.perf_counter()
+        module = importlib.import_module(name)
+        if not already:
+            self.imports.append((name, time.perf_counter() - begin))
+        return module
+
+    def mark(self, name: str):
+        """记录时间点"""
+        self.marks.append((name, time.perf_counter() - self.start))
+
+    def elapsed(self, name: str) -> Optional[float]:
+        """获取时间点，未记录时返回 None"""
+        for mark, seconds in self.marks:
+            if mark == name:
+                return seconds
+        return None
+
+    def report(self, budget_ms: int = None) -> str:
+        """文本报告"""
+        lines = ["Startup timing:"]
+        for name, seconds in self.imports:
+            lines.append(f"  import {name:<28} {seconds * 1000:8.1f} ms")
+        for name, seconds in self.marks:
+            lines.append(f"  {name:<35} {seconds * 1000:8.1f} ms")
+        tray = self.elapsed('tray_visible')
+        if budget_ms is not None and tray is not None:
+            verdict = "OK" if tray * 1000 <= budget_ms else "OVER BUDGET"
+            lines.append(f"  tray visible {tray * 1000:.1f} ms / budget {budget_ms} ms: {verdict}")
+        return '\n'.join(lines)
+
+    def within_budget(self, budget_ms: int) -> bool:
+        """托盘图标是否在预算时间内可见"""
+        tray = self.elapsed('tray_visible')
+        return tray is None or tray * 1000 <= budget_ms
+
+    def record_metrics(self, metrics):
+        """写入性能指标"""
+        for name, seconds in self.imports:
+            metrics.observe('startup_import_seconds', seconds, module=name)
+        for name, seconds in self.marks:
+            metrics.observe('startup_seconds', seconds, stage=name)
+
+
+# 全局启动计时器（main 导入时创建）
+profiler = StartupProfiler()
@@ -0,0 +1,6 @@
+"""
+无界面入口
+python -m wallpaper_changer daemon|next|prefetch|stats|gc
+"""
+
+__all__ = []
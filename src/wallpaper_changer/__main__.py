@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Wallpaper Changer - headless entry point (python -m wallpaper_changer)
+"""
+
+import sys
+from pathlib import Path
+
+# Make the top-level src modules (core, models, utils) importable
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wallpaper_changer.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
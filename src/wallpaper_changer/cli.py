@@ -0,0 +1,182 @@
+"""
+Headless command line interface
+
+Drives the scheduler, API clients, downloader and setter without importing
+PyQt5, so a background daemon only pays for the work it actually does.
+
+When the UI is running, ``next`` and ``prefetch`` are forwarded to it instead
+of touching the cache from a second process. ``daemon`` holds the same cache
+lock as the UI, so the two never run side by side.
+"""
+
+import argparse
+import signal
+import sys
+from typing import List, Optional
+
+COMMANDS = ('daemon', 'next', 'prefetch', 'stats', 'gc', 'search')
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='wallpaper_changer',
+        description='Wallpaper Changer headless mode'
+    )
+    parser.add_argument('--config', default='config.json', help='config file path')
+    parser.add_argument('--data-dir', default=None,
+                        help='directory holding cache/ and history (default: project root)')
+
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('daemon', help='run the scheduler in the foreground')
+    sub.add_parser('next', help='change the wallpaper once')
+    prefetch = sub.add_parser('prefetch', help='download wallpapers into the cache')
+    prefetch.add_argument('-n', '--count', type=int, default=3)
+    sub.add_parser('stats', help='print cache and history statistics')
+    sub.add_parser('gc', help='trim the cache to its limits')
+    search = sub.add_parser('search', help='search cached wallpapers by description, author, '
+                                           'source, category or tags (offline)')
+    search.add_argument('query', nargs='+')
+    search.add_argument('-n', '--limit', type=int, default=20)
+    return parser
+
+
+def _cmd_daemon(components) -> int:
+    from utils.file_lock import FileLock
+
+    scheduler = components.scheduler
+    config = components.config
+
+    cache_lock = FileLock(components.downloader.cache_dir / '.lock')
+    if not cache_lock.acquire(blocking=False):
+        print("Another Wallpaper Changer instance is using the cache", file=sys.stderr)
+        return 1
+
+    def update():
+        try:
+            path, image = components.changer.change(status=print)
+            print(f"Wallpaper changed: {path}")
+        except Exception as e:
+            print(f"Scheduled change failed: {e}")
+
+    def stop(signum, frame):
+        scheduler.stop()
+
+    signal.signal(signal.SIGINT, stop)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, stop)
+
+    scheduler.set_update_callback(update)
+    next_run = scheduler.get_next_run_time()
+    print(f"Daemon started, next change at {next_run}")
+
+    # No Qt file watcher here: poll config.json's mtime for hot reload.
+    # The memory ceiling is checked on the same tick (rate limited by the manager)
+    def tick():
+        config.reload_if_changed()
+        components.memory.poll()
+
+    try:
+        scheduler.run(on_tick=tick, max_sleep=5.0)
+    finally:
+        cache_lock.release()
+    return 0
+
+
+def _cmd_next(components) -> int:
+    from core.changer import WallpaperChangeError
+
+    try:
+        path, image = components.changer.change(status=print)
+    except WallpaperChangeError as e:
+        print(f"{e.status}: {e}", file=sys.stderr)
+        return 1
+    print(f"Wallpaper changed: {path}")
+    return 0
+
+
+def _cmd_prefetch(components, count: int) -> int:
+    from core.changer import WallpaperChangeError
+
+    try:
+        downloaded = components.changer.prefetch(count=count, status=print)
+    except WallpaperChangeError as e:
+        print(f"{e.status}: {e}", file=sys.stderr)
+        return 1
+    print(f"Downloaded {downloaded} wallpaper(s)")
+    return 0 if downloaded else 1
+
+
+def _cmd_stats(components) -> int:
+    downloader = components.downloader
+    print(f"Cache dir:     {downloader.cache_dir}")
+    tiers = downloader.get_tier_sizes()
+    hot, cold = tiers['hot'], tiers['cold']
+    print(f"Cached images: {hot['count']} / {downloader.max_images}")
+    print(f"Cache size:    {hot['bytes'] / (1024 * 1024):.2f} / {hot['max_mb']} MB")
+    print(f"Cold tier:     {cold['count']} image(s), "
+          f"{cold['bytes'] / (1024 * 1024):.2f} / {cold['max_mb']} MB")
+    print(f"History:       {len(components.history)} entries")
+    print(f"Current:       {components.history.current() or '-'}")
+    print(f"Sources:       {', '.join(components.apis) or '(no API keys configured)'}")
+    print(f"Next change:   {components.scheduler.get_next_run_time()}")
+    return 0
+
+
+def _cmd_gc(components) -> int:
+    removed = components.downloader.gc()
+    print(f"Removed {removed} file(s), cache size {components.downloader.get_cache_size()}")
+    return 0
+
+
+def _cmd_search(components, query: str, limit: int) -> int:
+    downloader = components.downloader
+    paths = downloader.search(query, limit=limit)
+    for path in paths:
+        info = downloader.get_metadata(path) or {}
+        description = (info.get('description') or '')[:60]
+        print(f"{path}  [{info.get('source', '?')}] {info.get('author', '')}  {description}")
+    if not paths:
+        print("No matches", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Headless entry point"""
+    args = _build_parser().parse_args(argv)
+
+    from core.components import AppComponents, default_base_dir
+    from utils.single_instance import send_command
+
+    # Let a running UI instance do the work so only one process writes the cache
+    forward = None
+    if args.command == 'next':
+        forward = 'next'
+    elif args.command == 'prefetch':
+        forward = f"refresh {args.count}"
+    if forward and send_command(args.data_dir or default_base_dir(), forward):
+        print(f"Forwarded '{forward}' to the running instance")
+        return 0
+
+    components = AppComponents(config_path=args.config, base_dir=args.data_dir)
+    try:
+        return _dispatch(components, args)
+    finally:
+        # Don't hold the exit for a background cold-tier recompression pass
+        components.close()
+
+
+def _dispatch(components, args) -> int:
+    if args.command == 'daemon':
+        return _cmd_daemon(components)
+    if args.command == 'next':
+        return _cmd_next(components)
+    if args.command == 'prefetch':
+        return _cmd_prefetch(components, args.count)
+    if args.command == 'stats':
+        return _cmd_stats(components)
+    if args.command == 'gc':
+        return _cmd_gc(components)
+    if args.command == 'search':
+        return _cmd_search(components, ' '.join(args.query), args.limit)
+    return 2